@@ -3,78 +3,285 @@
 API router for employee search endpoints.
 Handles rate limiting, multi-tenant safety, and search logic.
 """
-from fastapi import APIRouter, Depends, HTTPException, Request
-from app.schemas.search import EmployeeSearchRequest, EmployeeSearchResponse
+import re
+from typing import Any, Dict, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from app.schemas.search import (
+    EmployeeSearchRequest, EmployeeSearchResponse, EmployeeSearchColumnarResponse, EmployeeBatchSearchRequest,
+    EmployeeBatchSearchResponse, EmployeeFacetRequest, EmployeeFacetResponse
+)
 from app.services.employee_service import employee_service
+from app.services.employee_search import CountMode, FACET_DEFAULT_LIMIT
+from app.services.employee_import import iter_csv, iter_ndjson
+from app.services.employee_export import ExportFormat, MEDIA_TYPES
+from app.services.response_encoder import ResponseFormat, encode_batch, encode_facets, encode_search
+from app.schemas.employee import EmployeeImportResponse
 from app.services.tenant_service import tenant_service
-from app.core.config import logger
+from app.core.config import logger, settings
+from app.core.metrics import RATE_LIMIT_REJECTIONS, bind_request, org_label, stage
 
 from app.core.rate_limit import rate_limiter
 from app.models.employee import EmployeeStatus
-from app.core.db import get_db_conn
 from fastapi import Depends
 
 router = APIRouter()
+# Per-request info logs; rate-capped by default (LOG_RATE_LIMITS).
+api_logger = logger.getChild("api")
 
-async def check_rate_limit(request: Request) -> str:
+
+def search_filters(req: EmployeeSearchRequest) -> Dict[str, Any]:
+    """
+    Filter dict passed to the search service from a search request body.
     """
-    Dependency to enforce rate limiting per organization.
+    return {
+        "firstname": req.firstname,
+        "lastname": req.lastname,
+        "contact": req.contact,
+        "department": req.department,
+        "position": req.position,
+        "location": req.location,
+        "status": req.status,
+    }
+
+async def enforce_rate_limit(request: Request, cost: int = 1) -> str:
+    """
+    Validate the organization and charge its rate limit for a request.
+    Unknown organizations are rejected first, so they never reach the rate
+    limiter or a search connection (see tenant_service).
     :param request: FastAPI request
+    :param cost: Requests this call counts as
     :return: org_id if allowed
-    :raises HTTPException: if missing org_id or rate limit exceeded
+    :raises HTTPException: if missing or unknown org_id or rate limit exceeded
     """
     org_id = request.headers.get("X-Org-Id")
     if not org_id:
         logger.error("Missing X-Org-Id header")
         raise HTTPException(status_code=400, detail="Missing organization header")
-    if not rate_limiter.is_allowed(org_id):
+    if await tenant_service.resolve(org_id) is None:
+        logger.error(f"Invalid organization: {org_id}")
+        raise HTTPException(status_code=403, detail="Invalid organization")
+    bind_request(getattr(request.scope.get("route"), "path", request.url.path), org_id)
+    with stage("rate_limit"):
+        allowed = rate_limiter.is_allowed(org_id, cost)
+    if not allowed:
+        RATE_LIMIT_REJECTIONS.inc((org_label(org_id),))
         raise HTTPException(status_code=429, detail="Rate limit exceeded")
     return org_id
 
+async def check_rate_limit(request: Request) -> str:
+    """
+    Dependency to enforce tenant validation and rate limiting per organization.
+    :param request: FastAPI request
+    :return: org_id if allowed
+    :raises HTTPException: if missing or unknown org_id or rate limit exceeded
+    """
+    return await enforce_rate_limit(request)
+
 
-@router.post("/search", response_model=EmployeeSearchResponse, tags=["Employee"])
+@router.post("/search", response_model=Union[EmployeeSearchResponse, EmployeeSearchColumnarResponse], tags=["Employee"])
 async def search_employees(
     req: EmployeeSearchRequest,
     org_id: str = Depends(check_rate_limit),
-    db_conn=Depends(get_db_conn),
     page: int = 1,
     page_size: int = 20,
     sort_by: str = "id",
-    sort_order: str = "asc"
-) -> EmployeeSearchResponse:
+    sort_order: str = "asc",
+    cursor: Optional[str] = None,
+    count: CountMode = CountMode.EXACT,
+    format: ResponseFormat = ResponseFormat.OBJECTS
+) -> Response:
     """
     Search employees with filters, dynamic columns, pagination, and sorting.
     Multi-tenant safety enforced by org_id.
+    Queries run on a non-blocking pooled connection, so they never block the event loop.
+    Repeated searches are answered from the per-org result cache without touching the pool.
     Status filter uses EmployeeStatus enum: Active, Not Started, Terminated.
+    The response is encoded straight from the result rows, without re-validation.
     :param req: Search request body
     :param org_id: Organization ID from header
     :param page: Page number (default 1)
     :param page_size: Results per page (default 20)
-    :param sort_by: Column to sort by (default id)
+    :param sort_by: Column to sort by (default id), or "relevance" to rank `q`/fuzzy matches
     :param sort_order: asc or desc (default asc)
+    :param cursor: next_cursor from the previous response; replaces page (keyset pagination)
+    :param count: Total count mode: exact, estimated (planner), none, or cached (per org and filters)
+    :param format: objects (default, a dict per row) or columnar (`columns` once, `rows` as arrays)
     :return: Search response
     """
-    # Validate organization
-    if not tenant_service.validate_org(org_id):
-        logger.error(f"Invalid organization: {org_id}")
-        raise HTTPException(status_code=403, detail="Invalid organization")
-
-    # Prepare filters
-    filters = {
-        "firstname": req.firstname,
-        "lastname": req.lastname,
-        "contact": req.contact,
-        "department": req.department,
-        "position": req.position,
-        "location": req.location,
-        "status": req.status,
-    }
+    filters = search_filters(req)
     columns = req.columns
 
     # Search employees with pagination and sorting
-    results, total = employee_service.search_employees(
-        org_id, filters, columns, page, page_size, sort_by, sort_order, db_conn=db_conn
+    try:
+        result = await employee_service.search_employees_async(
+            org_id, filters, columns, page, page_size, sort_by, sort_order, cursor=cursor,
+            count_mode=count, match_modes=req.match, text_query=req.q
+        )
+    except ValueError as e:  # invalid cursor or match mode
+        raise HTTPException(status_code=400, detail=str(e))
+    api_logger.info("Search returned %d results for org %s, page %d", len(result.rows), org_id, page)
+    with stage("serialize"):
+        body = encode_search(result, format)
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/search/batch", response_model=EmployeeBatchSearchResponse, tags=["Employee"])
+async def search_employees_batch(
+    req: EmployeeBatchSearchRequest,
+    request: Request,
+    format: ResponseFormat = ResponseFormat.OBJECTS
+) -> Response:
+    """
+    Run several searches for one organization in a single call.
+    Each item takes the /search body plus its own page, page_size, sort_by,
+    sort_order, cursor and count. The tenant is validated once and the rate limit
+    is charged once, weighted by the number of searches. Searches run concurrently
+    (BATCH_SEARCH_CONCURRENCY at a time), so the call takes about as long as the
+    slowest one. Results are in request order; a failed search carries `error`
+    instead of failing the batch.
+    :param req: Batch of up to BATCH_SEARCH_MAX_ITEMS searches
+    :param request: FastAPI request (X-Org-Id header)
+    :param format: objects or columnar, as for /search
+    :return: One result or error per search
+    """
+    if not req.searches or len(req.searches) > settings.BATCH_SEARCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"searches must contain 1 to {settings.BATCH_SEARCH_MAX_ITEMS} items")
+    org_id = await enforce_rate_limit(request, cost=len(req.searches))
+    searches = [
+        {
+            "filters": search_filters(item),
+            "columns": item.columns,
+            "page": item.page,
+            "page_size": item.page_size,
+            "sort_by": item.sort_by,
+            "sort_order": item.sort_order,
+            "cursor": item.cursor,
+            "count_mode": item.count,
+            "match_modes": item.match,
+            "text_query": item.q,
+        }
+        for item in req.searches
+    ]
+    outcomes = await employee_service.search_batch_async(org_id, searches)
+    api_logger.info("Batch search of %d for org %s: %d failed", len(searches), org_id, sum(isinstance(o, str) for o in outcomes))
+    with stage("serialize"):
+        body = encode_batch(outcomes, format)
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/search/facets", response_model=EmployeeFacetResponse, tags=["Employee"])
+async def search_facets(
+    req: EmployeeFacetRequest,
+    org_id: str = Depends(check_rate_limit),
+    limit: int = FACET_DEFAULT_LIMIT
+) -> Response:
+    """
+    Count employees per department, location, position and status for the
+    current filters, e.g. for a directory sidebar.
+    Takes the /search body (filters, match, q) plus the fields to count, with the
+    same tenant scoping. All fields are counted in a single query, and results are
+    cached per org and filter set until the TTL or the org's next write.
+    :param req: Search filters and `facets` (default all fields)
+    :param org_id: Organization ID from header
+    :param limit: Most frequent values returned per field (1-100, default 10)
+    :return: Total matches and value counts per field
+    """
+    try:
+        result = await employee_service.facets_async(org_id, search_filters(req), req.facets, limit, req.match, req.q)
+    except ValueError as e:  # invalid or hidden field, or invalid match mode
+        raise HTTPException(status_code=400, detail=str(e))
+    if result.failed:
+        raise HTTPException(status_code=500, detail="Facet counts failed")
+    with stage("serialize"):
+        body = encode_facets(result)
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("/employees/import", response_model=EmployeeImportResponse, tags=["Employee"])
+async def import_employees(
+    request: Request,
+    org_id: str = Depends(check_rate_limit),
+    batch_size: int = settings.IMPORT_BATCH_SIZE
+) -> EmployeeImportResponse:
+    """
+    Bulk-import employees for the organization from a streamed request body.
+    Send NDJSON (one employee object per line) or CSV with a header row
+    (Content-Type: text/csv). Unknown fields are stored in `extra`.
+    The body is parsed and inserted incrementally in batches (COPY, one
+    transaction per batch); invalid rows are reported and skipped.
+    :param request: FastAPI request (body is streamed)
+    :param org_id: Organization ID from header; all rows are imported into it
+    :param batch_size: Rows per transaction (1-10000)
+    :return: Import summary with per-row errors and rows/sec
+    """
+    if batch_size < 1 or batch_size > 10000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 10000")
+    content_type = request.headers.get("content-type", "")
+    parse = iter_csv if content_type.startswith("text/csv") else iter_ndjson
+    result = await employee_service.import_employees(org_id, parse(request.stream()), batch_size)
+    return EmployeeImportResponse(**result.as_dict())
+
+
+@router.post("/employees/export", tags=["Employee"])
+async def export_employees(
+    req: EmployeeSearchRequest,
+    org_id: str = Depends(check_rate_limit),
+    format: ExportFormat = ExportFormat.NDJSON,
+    sort_by: str = "id",
+    sort_order: str = "asc"
+) -> StreamingResponse:
+    """
+    Stream every employee matching the search as NDJSON or CSV.
+    Same body (filters, columns, match, q) and tenant scoping as /search, but
+    unpaginated: rows are read through a server-side cursor in batches of
+    EXPORT_FETCH_SIZE as the client consumes them, and the query is cancelled
+    if the client disconnects.
+    :param req: Search request body
+    :param org_id: Organization ID from header
+    :param format: ndjson (default) or csv (with a header row; `extra` values as JSON)
+    :param sort_by: Column to sort by (default id)
+    :param sort_order: asc or desc (default asc)
+    :return: Streaming response
+    """
+    try:
+        stream = employee_service.export_employees(
+            org_id, search_filters(req), req.columns, sort_by, sort_order, req.match, req.q, format
+        )
+    except ValueError as e:  # invalid match mode
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = re.sub(r"[^A-Za-z0-9_.-]", "_", f"employees-{org_id}.{format.value}")
+    return StreamingResponse(
+        stream, media_type=MEDIA_TYPES[format], headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
-    logger.info(f"Search returned {len(results)} results for org {org_id}, page {page}")
-    db_conn.close()
-    return EmployeeSearchResponse(results=results, total=total)
+
+
+@router.get("/changes", tags=["Employee"])
+async def employee_changes(
+    org_id: str = Depends(check_rate_limit),
+    since: Optional[str] = None,
+    columns: Optional[List[str]] = Query(None),
+    limit: int = settings.CHANGES_PAGE_SIZE
+) -> StreamingResponse:
+    """
+    Stream the employees inserted, updated or deleted since a change token, as NDJSON.
+    One line per changed employee, oldest change first:
+    {"op": "inserted"|"updated"|"deleted", "id": ..., "row": {...}|null}, with the
+    employee's current values of the requested columns (null for deletions).
+    The last line is {"next_token": ..., "has_more": ...}: pass next_token as `since`
+    on the next call, immediately while has_more is true. A {"op": "reset"} first
+    line means the client's copy must be dropped and rebuilt from this feed.
+    Without `since`, every employee is streamed, so a first sync needs no export.
+    :param org_id: Organization ID from header
+    :param since: Token from a previous response; omit to start from the beginning
+    :param columns: Columns of each row (repeat the parameter); default as for /search
+    :param limit: Maximum changes in this response (1-100000)
+    :return: Streaming response
+    """
+    if limit < 1 or limit > 100000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100000")
+    try:
+        stream = employee_service.stream_changes(org_id, since, columns, limit)
+    except ValueError as e:  # forged, malformed or another org's token
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(stream, media_type=MEDIA_TYPES[ExportFormat.NDJSON])
@@ -0,0 +1,99 @@
+
+"""
+Shared helpers for the benchmark suite: latency summaries, run metadata,
+JSON result files and discovery of the seeded benchmark organizations.
+Results are plain JSON so runs can be diffed with `python -m app.benchmarks.compare`.
+"""
+import json
+import math
+import platform
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.core.sharding import shard_router
+
+# Organization ids written by app.benchmarks.data start with this prefix.
+DEFAULT_PREFIX = "bench_"
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """
+    Nearest-rank percentile of an ascending sequence (q in 0-100).
+    """
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, Any]:
+    """
+    Summarize one scenario.
+    :param latencies: Seconds per successful operation
+    :param elapsed: Wall-clock seconds the scenario ran
+    :param errors: Failed operations (not included in the latencies)
+    :return: Counts, throughput (ops/sec) and latency percentiles in milliseconds
+    """
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 4)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput": round(len(ordered) / elapsed, 1) if elapsed > 0 else 0.0,
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]) if ordered else 0.0,
+    }
+
+
+def run_info(suite: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Metadata identifying a run: suite, time, code revision, interpreter and options.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "suite": suite,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "options": options,
+        "db_shards": len(shard_router.pools),
+    }
+
+
+def write_results(results: Dict[str, Any], output: Optional[str]) -> None:
+    """
+    Print the results as JSON, and also write them to `output` if given.
+    """
+    text = json.dumps(results, indent=2, default=str)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def bench_orgs(prefix: str = DEFAULT_PREFIX) -> List[Tuple[str, int]]:
+    """
+    Seeded benchmark organizations and their sizes, largest first, across all shards.
+    :raises RuntimeError: if no organization with the prefix exists (run app.benchmarks.data first)
+    """
+    pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    sizes: Dict[str, int] = {}
+    for pool in shard_router.pools:
+        with pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT org_id, COUNT(*) FROM employees WHERE org_id LIKE %s GROUP BY org_id", (pattern,))
+            for org_id, count in cur.fetchall():
+                sizes[org_id] = sizes.get(org_id, 0) + count
+            conn.rollback()
+    if not sizes:
+        raise RuntimeError(f"No organizations starting with '{prefix}'; seed them with python -m app.benchmarks.data")
+    return sorted(sizes.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,64 @@
+
+"""
+Compare two benchmark result files.
+Usage: python -m app.benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 10]
+Prints throughput and latency percentiles per scenario with the change in percent,
+and exits with status 1 if any scenario's p95 regressed by more than `threshold` percent.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+METRICS = ("throughput", "p50_ms", "p95_ms", "p99_ms")
+
+
+def change(before: float, after: float) -> Optional[float]:
+    """
+    Relative change in percent, or None when the baseline is zero.
+    """
+    return round((after - before) / before * 100, 1) if before else None
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    :return: (one row per scenario present in both runs, scenarios whose p95 regressed beyond threshold)
+    """
+    rows: List[Dict[str, Any]] = []
+    regressions: List[str] = []
+    for name, before in baseline["scenarios"].items():
+        after = candidate["scenarios"].get(name)
+        if after is None:
+            continue
+        row: Dict[str, Any] = {"scenario": name}
+        for metric in METRICS:
+            row[metric] = (before[metric], after[metric], change(before[metric], after[metric]))
+        rows.append(row)
+        p95_change = row["p95_ms"][2]
+        if p95_change is not None and p95_change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p95 regression (percent) that fails the comparison")
+    args = parser.parse_args()
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    print(f"baseline {baseline['run'].get('git_commit')} vs candidate {candidate['run'].get('git_commit')}")
+    print(f"{'scenario':45s}" + "".join(f"{metric:>26s}" for metric in METRICS))
+    for row in rows:
+        cells = []
+        for metric in METRICS:
+            before, after, pct = row[metric]
+            cells.append(f"{before:>9} -> {after:<9}" + (f"{pct:+6.1f}%" if pct is not None else "      -"))
+        print(f"{row['scenario']:45s}" + "".join(f"{cell:>26s}" for cell in cells))
+    if regressions:
+        print(f"p95 regressed by more than {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
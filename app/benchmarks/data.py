@@ -0,0 +1,130 @@
+
+"""
+Seeded synthetic employees for benchmarks.
+Usage: python -m app.benchmarks.data [--orgs 20] [--employees 5000] [--extra-width 8] [--skew 1.0] [--seed 42]
+The same options always produce the same rows. Organization sizes follow a
+Zipf-like distribution (`skew` 0 makes them equal; larger values make the first
+organization the hot tenant), and so do last names within an organization.
+Existing organizations with the prefix are deleted first, on whatever shard holds them;
+the seeded ones are registered in the organizations table.
+"""
+import argparse
+import random
+from typing import Any, Dict, Iterator, List
+from app.benchmarks.common import DEFAULT_PREFIX, bench_orgs
+from app.core.config import logger
+from app.core.sharding import shard_router
+from app.models.employee import Employee, EmployeeStatus
+from app.services.employee_service import employee_service
+from app.services.shard_rebalance import delete_org
+from app.services.tenant_service import tenant_service
+
+FIRSTNAMES = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+              "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen"]
+LASTNAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+             "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin"]
+DEPARTMENTS = ["Engineering", "Sales", "Marketing", "Finance", "Support", "Operations", "Legal", "HR"]
+POSITIONS = ["Engineer", "Senior Engineer", "Manager", "Analyst", "Director", "Associate", "Specialist", "Intern"]
+LOCATIONS = ["New York", "London", "Berlin", "Singapore", "Toronto", "Sydney", "Bangalore", None]
+STATUSES = [EmployeeStatus.ACTIVE] * 8 + [EmployeeStatus.NOT_STARTED, EmployeeStatus.TERMINATED]
+# Every table column plus generated extra keys, for wide-row scenarios.
+WIDE_COLUMNS = ["id", "firstname", "lastname", "contact", "department", "position", "location", "status", "extra",
+                "badge", "attr_1", "attr_2", "attr_3", "address.city"]
+
+
+def org_sizes(orgs: int, employees: int, skew: float) -> List[int]:
+    """
+    Split orgs * employees rows over the orgs with weights 1 / rank**skew (at least one row each).
+    """
+    weights = [1 / (rank ** skew) for rank in range(1, orgs + 1)]
+    total = orgs * employees
+    return [max(1, round(total * w / sum(weights))) for w in weights]
+
+
+def extra_fields(rng: random.Random, width: int) -> Dict[str, Any]:
+    """
+    `width` extra attributes; one nested object so JSONB paths are exercised.
+    """
+    nested = width >= 4
+    extra: Dict[str, Any] = {"badge": rng.randint(1000, 99999)}
+    for i in range(1, width - 1 if nested else width):
+        extra[f"attr_{i}"] = rng.choice([rng.randint(0, 1000), f"value-{rng.randint(0, 50)}", rng.random() < 0.5])
+    if nested:
+        extra["address"] = {"city": rng.choice(LOCATIONS[:-1]), "zip": f"{rng.randint(10000, 99999)}"}
+    return extra
+
+
+def generate(
+    orgs: int = 20,
+    employees: int = 5000,
+    extra_width: int = 8,
+    skew: float = 1.0,
+    seed: int = 42,
+    prefix: str = DEFAULT_PREFIX
+) -> Iterator[Employee]:
+    """
+    Yield the benchmark employees, organization by organization.
+    :param orgs: Number of organizations
+    :param employees: Average employees per organization
+    :param extra_width: Keys per `extra` object (0 for none)
+    :param skew: Zipf exponent for organization sizes and last name frequency
+    :param seed: Random seed; the same arguments always yield the same rows
+    :param prefix: Organization id prefix
+    """
+    rng = random.Random(seed)
+    name_weights = [1 / (rank ** skew) for rank in range(1, len(LASTNAMES) + 1)]
+    for index, size in enumerate(org_sizes(orgs, employees, skew)):
+        org_id = f"{prefix}{index:03d}"
+        lastnames = rng.choices(LASTNAMES, weights=name_weights, k=size)
+        for n in range(size):
+            firstname = rng.choice(FIRSTNAMES)
+            yield Employee(
+                id=0,
+                org_id=org_id,
+                firstname=firstname,
+                lastname=lastnames[n],
+                contact=f"{firstname.lower()}.{n}@{org_id}.example.com",
+                department=rng.choice(DEPARTMENTS),
+                position=rng.choice(POSITIONS),
+                location=rng.choice(LOCATIONS),
+                status=rng.choice(STATUSES),
+                extra=extra_fields(rng, extra_width) if extra_width else {},
+            )
+
+
+def clear(prefix: str = DEFAULT_PREFIX) -> int:
+    """
+    Delete every organization with the prefix.
+    :return: Rows deleted
+    """
+    try:
+        existing = bench_orgs(prefix)
+    except RuntimeError:
+        return 0
+    deleted = 0
+    for org_id, _ in existing:
+        with shard_router.connection(org_id, write=True) as conn:
+            deleted += delete_org(conn, org_id)
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed synthetic employees for benchmarks.")
+    parser.add_argument("--orgs", type=int, default=20)
+    parser.add_argument("--employees", type=int, default=5000, help="average employees per org")
+    parser.add_argument("--extra-width", type=int, default=8, help="keys per extra object")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent; 0 for equal org sizes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    args = parser.parse_args()
+    logger.info(f"Deleted {clear(args.prefix)} existing benchmark rows")
+    result = employee_service.add_employees(
+        generate(args.orgs, args.employees, args.extra_width, args.skew, args.seed, args.prefix), batch_size=5000
+    )
+    logger.info(f"Seeded benchmark data: {result.inserted} rows, {result.failed} failed")
+    for org_id, _ in bench_orgs(args.prefix):
+        tenant_service.register(org_id, org_id)
+    for pool in shard_router.pools:
+        with pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("ANALYZE employees")
+            conn.commit()
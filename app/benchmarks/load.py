@@ -0,0 +1,176 @@
+
+"""
+HTTP load driver for the search API.
+Usage: python -m app.benchmarks.load [--url http://localhost:8000] [--concurrency 16] [--duration 10]
+       [--scenarios first_page,deep_pages,...] [--output FILE]
+Each scenario runs `concurrency` keep-alive clients for `duration` seconds against a
+running server and reports throughput and p50/p95/p99 latency. Start the server with
+a RATE_LIMIT high enough for the load (429s are reported as errors) and with
+SEARCH_CACHE_ENABLED=0 to measure the database path. Requires app.benchmarks.data.
+Run the driver on another machine or CPU set than the server for stable numbers.
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+from app.benchmarks.common import DEFAULT_PREFIX, bench_orgs, run_info, summarize, write_results
+from app.benchmarks.data import DEPARTMENTS, LASTNAMES, WIDE_COLUMNS
+
+FILTERS = dict(firstname=None, lastname=None, contact=None, department=None, position=None, location=None, status=None)
+# (path with query string, JSON body, org id) for one request
+Request = Tuple[str, Dict[str, Any], str]
+
+
+def _body(**fields: Any) -> Dict[str, Any]:
+    return {**FILTERS, "columns": None, **fields}
+
+
+def scenarios(orgs: List[Tuple[str, int]], hot_share: float = 0.9) -> Dict[str, Callable[[random.Random, Dict[str, Any]], Request]]:
+    """
+    Request generators per scenario. Each takes the client's RNG and per-client state
+    (used to follow cursors) and returns the next request.
+    """
+    names = [org for org, _ in orgs]
+    sizes = dict(orgs)
+    hot = names[0]
+
+    def first_page(rng: random.Random, state: Dict[str, Any]) -> Request:
+        org = rng.choice(names)
+        return "/search?page_size=20", _body(lastname=rng.choice(LASTNAMES)), org
+
+    def deep_pages(rng: random.Random, state: Dict[str, Any]) -> Request:
+        org = rng.choice(names)
+        page = rng.randint(1, max(1, sizes[org] // 20))
+        return f"/search?page={page}&page_size=20&sort_by=lastname&count=none", _body(), org
+
+    def cursor_walk(rng: random.Random, state: Dict[str, Any]) -> Request:
+        # Follows next_cursor page after page; starts over at the end or every 50 pages
+        state["follow"] = True
+        cursor = state.get("next_cursor")
+        if not cursor or state.get("pages", 0) >= 50:
+            state["org"], state["pages"], cursor = rng.choice(names), 0, None
+        state["pages"] += 1
+        path = "/search?page_size=20&sort_by=lastname&count=none" + (f"&cursor={quote(cursor)}" if cursor else "")
+        return path, _body(), state["org"]
+
+    def wide_columns(rng: random.Random, state: Dict[str, Any]) -> Request:
+        org = rng.choice(names)
+        return "/search?page_size=100", _body(department=rng.choice(DEPARTMENTS), columns=WIDE_COLUMNS), org
+
+    def hot_tenant(rng: random.Random, state: Dict[str, Any]) -> Request:
+        org = hot if rng.random() < hot_share else rng.choice(names[1:] or names)
+        return "/search?page_size=20", _body(lastname=rng.choice(LASTNAMES), department=rng.choice(DEPARTMENTS)), org
+
+    return {
+        "first_page": first_page,
+        "deep_pages": deep_pages,
+        "cursor_walk": cursor_walk,
+        "wide_columns": wide_columns,
+        "hot_tenant": hot_tenant,
+    }
+
+
+def server_health(url: str) -> Optional[Dict[str, Any]]:
+    """
+    The server's /health report (pools, caches, query shapes), or None if unavailable.
+    """
+    target = urlsplit(url)
+    conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=10)
+    try:
+        conn.request("GET", "/health")
+        response = conn.getresponse()
+        return json.loads(response.read()) if response.status == 200 else None
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+    finally:
+        conn.close()
+
+
+def run_scenario(
+    url: str,
+    make_request: Callable[[random.Random, Dict[str, Any]], Request],
+    concurrency: int,
+    duration: float,
+    seed: int
+) -> Dict[str, Any]:
+    """
+    Drive one scenario with `concurrency` threads, each on its own keep-alive connection.
+    :return: Summary plus status code counts
+    """
+    target = urlsplit(url)
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    statuses: List[Counter] = [Counter() for _ in range(concurrency)]
+    deadline = time.perf_counter() + duration
+
+    def client(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        state: Dict[str, Any] = {}
+        conn: Optional[http.client.HTTPConnection] = None
+        while time.perf_counter() < deadline:
+            path, body, org = make_request(rng, state)
+            payload = json.dumps(body).encode("utf-8")
+            headers = {"Content-Type": "application/json", "X-Org-Id": org}
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+                conn.request("POST", path, payload, headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                statuses[index]["connection_error"] += 1
+                if conn is not None:
+                    conn.close()
+                conn = None
+                continue
+            elapsed = time.perf_counter() - started
+            statuses[index][str(response.status)] += 1
+            if response.status == 200:
+                latencies[index].append(elapsed)
+                if state.get("follow"):
+                    state["next_cursor"] = json.loads(data).get("next_cursor")
+            else:
+                state.pop("next_cursor", None)
+        if conn is not None:
+            conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    status_counts = sum(statuses, Counter())
+    ok = [latency for client_latencies in latencies for latency in client_latencies]
+    summary = summarize(ok, elapsed, errors=sum(n for status, n in status_counts.items() if status != "200"))
+    summary["statuses"] = dict(status_counts)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run HTTP load scenarios against a running server; prints JSON results.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--scenarios", default="first_page,deep_pages,cursor_walk,wide_columns,hot_tenant")
+    parser.add_argument("--hot-share", type=float, default=0.9, help="share of hot_tenant requests sent to the largest org")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+    available = scenarios(bench_orgs(args.prefix), args.hot_share)
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(selected) - set(available)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    results: Dict[str, Any] = {"run": run_info("load", vars(args)), "scenarios": {}}
+    for name in selected:
+        results["scenarios"][f"http.{name}"] = run_scenario(args.url, available[name], args.concurrency, args.duration, args.seed)
+    results["stats"] = {"server_health": server_health(args.url)}
+    write_results(results, args.output)
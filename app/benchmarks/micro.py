@@ -0,0 +1,206 @@
+
+"""
+Microbenchmarks for the search service, the rate limiter and response serialization.
+Usage: python -m app.benchmarks.micro [--iterations 500] [--suites search,rate_limit,serialization] [--output FILE]
+Search scenarios run EmployeeSearchService directly on one pooled connection to
+each organization's shard, so they measure query building, the database and
+row handling without HTTP or the result cache. Requires app.benchmarks.data.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from fastapi.routing import serialize_response
+from app.apis.employee_api import router
+from app.benchmarks.common import DEFAULT_PREFIX, bench_orgs, run_info, summarize, write_results
+from app.benchmarks.data import WIDE_COLUMNS, extra_fields, generate
+from app.core.rate_limit import MemoryBucketStore, RateLimiter, SharedMemoryBucketStore
+from app.core.sharding import shard_router
+from app.schemas.search import EmployeeSearchResponse
+from app.services.employee_search import CountMode, EmployeeSearchService, SearchResult
+from app.services.memory_engine import memory_engine
+from app.services.query_shapes import prepared_statements, shape_cache
+from app.services.response_encoder import ResponseFormat, encode_search
+
+FILTERS = dict(firstname=None, lastname=None, contact=None, department=None, position=None, location=None, status=None)
+
+
+def measure(fn: Callable[[int], Any], iterations: int, warmup: int = 20) -> Dict[str, Any]:
+    """
+    Call fn(i) `warmup` times untimed, then `iterations` times timed.
+    An exception counts as an error and is not timed.
+    """
+    for i in range(warmup):
+        fn(i)
+    latencies: List[float] = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        try:
+            fn(i)
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def search_scenarios(orgs: List[Tuple[str, int]]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """
+    Search scenarios as (org, EmployeeSearchService.search keyword arguments).
+    The hot tenant is the largest organization; deep pages start half way through it.
+    """
+    hot, hot_size = orgs[0]
+    small = orgs[-1][0]
+    deep_page = max(1, hot_size // 2 // 20)
+    return {
+        "first_page": (small, {"page_size": 20}),
+        "hot_tenant_first_page": (hot, {"page_size": 20}),
+        "filtered_exact": (hot, {"filters": {"lastname": "Smith", "department": "Engineering"}, "page_size": 20}),
+        "filtered_no_count": (hot, {"filters": {"lastname": "Smith"}, "page_size": 20, "count_mode": CountMode.NONE}),
+        "deep_offset_page": (hot, {"page": deep_page, "page_size": 20, "sort_by": "lastname"}),
+        "deep_cursor_page": (hot, {"page": deep_page, "page_size": 20, "sort_by": "lastname", "cursor": True}),
+        "wide_columns_100": (hot, {"columns": WIDE_COLUMNS, "page_size": 100}),
+        "full_text_ranked": (hot, {"text_query": "eng", "sort_by": "relevance", "page_size": 20}),
+        "fuzzy_name": (hot, {"filters": {"lastname": "Smyth"}, "match_modes": {"lastname": "fuzzy"}, "page_size": 20}),
+    }
+
+
+def _cursor_at(service: EmployeeSearchService, org_id: str, kwargs: Dict[str, Any]) -> Optional[str]:
+    """
+    The keyset cursor of the page before kwargs["page"], found by an offset search.
+    """
+    previous = {**kwargs, "page": kwargs["page"] - 1, "cursor": None, "count_mode": CountMode.NONE}
+    return service.search(org_id, **previous).next_cursor if previous["page"] >= 1 else None
+
+
+def bench_search(orgs: List[Tuple[str, int]], iterations: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for name, (org_id, kwargs) in search_scenarios(orgs).items():
+        with shard_router.connection(org_id) as conn:
+            service = EmployeeSearchService(conn)
+            kwargs = {**kwargs, "filters": {**FILTERS, **kwargs.get("filters", {})}}
+            if kwargs.get("cursor"):
+                kwargs["cursor"] = _cursor_at(service, org_id, kwargs)
+
+            def run(_: int) -> None:
+                if service.search(org_id, **kwargs).failed:
+                    raise RuntimeError("search failed")
+
+            results[name] = measure(run, iterations)
+            conn.rollback()
+    return results
+
+
+def bench_memory_engine(iterations: int, employees: int = 50000) -> Dict[str, Any]:
+    """
+    The search scenarios served by the in-process engine from generated data, without
+    a database. Ranked scenarios are skipped: they always run on Postgres.
+    """
+    org_id = "membench_000"
+    rows = [
+        (i, e.firstname, e.lastname, e.contact, e.department, e.position, e.location, e.status.value, e.extra)
+        for i, e in enumerate(generate(orgs=1, employees=employees, prefix="membench_"), start=1)
+    ]
+    results: Dict[str, Any] = {}
+    enabled = memory_engine.enabled
+    memory_engine.enabled = True
+    try:
+        started = time.perf_counter()
+        memory_engine.load(org_id, rows)
+        results["load"] = summarize([time.perf_counter() - started], time.perf_counter() - started)
+        service = EmployeeSearchService(None)
+        for name, (_, kwargs) in search_scenarios([(org_id, len(rows))]).items():
+            if kwargs.get("sort_by") == "relevance" or kwargs.get("match_modes"):
+                continue
+            kwargs = {**kwargs, "filters": {**FILTERS, **kwargs.get("filters", {})}}
+            if kwargs.get("cursor"):
+                kwargs["cursor"] = _cursor_at(service, org_id, kwargs)
+            results[name] = measure(lambda _: service.search(org_id, **kwargs), iterations)
+    finally:
+        memory_engine.enabled = enabled
+        memory_engine.unload(org_id)
+    return results
+
+
+def bench_rate_limit(iterations: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    limiter = RateLimiter(limit=10 ** 9, overrides={}, store=MemoryBucketStore())
+    results["memory_one_org"] = measure(lambda i: limiter.is_allowed("bench_hot"), iterations)
+    results["memory_10k_orgs"] = measure(lambda i: limiter.is_allowed(f"bench_{i % 10000}"), iterations)
+    path = os.path.join(tempfile.mkdtemp(prefix="hr_bench_"), "rate_limit")
+    shared = RateLimiter(limit=10 ** 9, overrides={}, store=SharedMemoryBucketStore(path=path, slots=16384))
+    try:
+        results["shared_one_org"] = measure(lambda i: shared.is_allowed("bench_hot"), iterations)
+        results["shared_10k_orgs"] = measure(lambda i: shared.is_allowed(f"bench_{i % 10000}"), iterations)
+    finally:
+        os.unlink(path)
+    return results
+
+
+def _search_route_field() -> Any:
+    return next(route.response_field for route in router.routes if getattr(route, "path", None) == "/search")
+
+
+def bench_serialization(iterations: int, extra_width: int = 8) -> Dict[str, Any]:
+    """
+    Encode a /search response from a page of tuple rows the way the route does
+    (objects and columnar), and, for reference, through the response model the
+    way FastAPI would (response_model validation, then JSON).
+    """
+    rng = random.Random(42)
+    field = _search_route_field()
+    results: Dict[str, Any] = {}
+    loop = asyncio.new_event_loop()
+    columns = ("id", "firstname", "lastname", "contact", "department", "position", "location", "status", "extra")
+    try:
+        for page_size in (20, 100):
+            rows = [
+                (i, "Mary", "Smith", f"mary.{i}@example.com", "Engineering", "Engineer", "Berlin", "Active",
+                 extra_fields(rng, extra_width))
+                for i in range(page_size)
+            ]
+            result = SearchResult(columns, rows, 12345, "cursor")
+
+            def run_pydantic(_: int) -> None:
+                model = EmployeeSearchResponse(results=result.results, total=result.total, next_cursor=result.next_cursor)
+                loop.run_until_complete(serialize_response(field=field, response_content=model, dump_json=True))
+
+            name = f"search_response_{page_size}_rows"
+            results[name] = measure(lambda i: encode_search(result), iterations)
+            results[f"{name}_columnar"] = measure(lambda i: encode_search(result, ResponseFormat.COLUMNAR), iterations)
+            results[f"{name}_pydantic"] = measure(run_pydantic, iterations)
+    finally:
+        loop.close()
+    return results
+
+
+SUITES = {
+    "search": lambda args: bench_search(bench_orgs(args.prefix), args.iterations),
+    "rate_limit": lambda args: bench_rate_limit(args.iterations * 20),
+    "serialization": lambda args: bench_serialization(args.iterations),
+    "memory_engine": lambda args: bench_memory_engine(args.iterations),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run microbenchmarks; prints JSON results.")
+    parser.add_argument("--iterations", type=int, default=500, help="timed calls per scenario (x20 for rate_limit)")
+    parser.add_argument("--suites", default=",".join(SUITES), help="comma-separated: " + ", ".join(SUITES))
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    results: Dict[str, Any] = {"run": run_info("micro", vars(args)), "scenarios": {}}
+    for suite in suites:
+        for name, summary in SUITES[suite](args).items():
+            results["scenarios"][f"{suite}.{name}"] = summary
+    results["stats"] = {"query_shapes": {**shape_cache.stats(), "prepared": prepared_statements.stats()}}
+    write_results(results, args.output)
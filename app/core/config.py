@@ -1,11 +1,23 @@
-
 """
 Configuration and logging setup for HR Employee Search API.
 Reads environment variables (supports .env) and sets up logging.
+Log records are handed to a background writer thread through a bounded queue
+and formatted there (text or JSON lines), so the request path never waits on
+stderr. High-volume info records can be sampled and rate-capped per logger;
+warnings and errors are always written.
 """
+import atexit
+import json
 import logging
 import os
-from typing import Optional
+import queue
+import random
+import secrets
+import tempfile
+import time
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
     from dotenv import load_dotenv
@@ -15,24 +27,226 @@ except ImportError:
 
 # Logging setup
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text or json (one object per line)
+LOG_ASYNC = os.getenv("LOG_ASYNC", "1").lower() in ("1", "true", "yes")  # write logs from a background thread
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # records waiting for the writer; info and below are dropped when full
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")  # share of info records kept per logger, e.g. "hr_search_api.search=0.1"
+# Info records per second per logger, e.g. "hr_search_api.search=100"; rules also cover child loggers
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "hr_search_api.search=100,hr_search_api.api=100,hr_search_api.writes=100")
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# Attributes of every LogRecord; any other attribute came from `extra=` and becomes a JSON field.
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def parse_log_rules(spec: str) -> Dict[str, float]:
+    """
+    Parse per-logger values from "hr_search_api.search=0.1,hr_search_api.api=50".
+    :raises ValueError: on a malformed entry
+    """
+    rules: Dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, value = item.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Invalid logging rule '{item}', expected logger=value.")
+        rules[name.strip()] = float(value)
+    return rules
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, message, `extra=` fields and the traceback if any.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Thin out info and debug records per logger: keep a share of them (`sampling`)
+    and at most `rate_limits` per second. A rule applies to its logger and the
+    logger's children; the most specific rule wins. Warnings and errors always pass.
+    """
+    def __init__(self, sampling: Dict[str, float], rate_limits: Dict[str, float]) -> None:
+        super().__init__()
+        self.sampling = sampling
+        self.rate_limits = rate_limits
+        self._rules: Dict[str, Tuple[Optional[float], Optional[str]]] = {}  # logger -> (share, rate rule)
+        self._windows: Dict[str, List[float]] = {}  # rate rule -> [window start, records in window]
+        self._lock = Lock()
+        self.sampled_out = 0
+        self.rate_limited = 0
+
+    @staticmethod
+    def _match(rules: Dict[str, float], name: str) -> Optional[str]:
+        while name:
+            if name in rules:
+                return name
+            name = name.rpartition(".")[0]
+        return None
+
+    def _rule(self, name: str) -> Tuple[Optional[float], Optional[str]]:
+        rule = self._rules.get(name)
+        if rule is None:
+            share = self._match(self.sampling, name)
+            rule = self._rules[name] = (None if share is None else self.sampling[share], self._match(self.rate_limits, name))
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        share, rate_rule = self._rule(record.name)
+        if share is not None and random.random() >= share:
+            self.sampled_out += 1
+            return False
+        if rate_rule is not None:
+            now = time.monotonic()
+            with self._lock:
+                window = self._windows.setdefault(rate_rule, [now, 0])
+                if now - window[0] >= 1.0:
+                    window[0], window[1] = now, 0
+                if window[1] >= self.rate_limits[rate_rule]:
+                    self.rate_limited += 1
+                    return False
+                window[1] += 1
+        return True
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread unformatted: message arguments are only
+    formatted if and when the record is written. When the queue is full, info and
+    debug records are dropped (and counted); warnings and errors wait for room.
+    """
+    def __init__(self, records: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if record.levelno >= logging.WARNING:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging() -> Tuple[logging.Handler, SamplingFilter]:
+    """
+    Install the root handler: a queue drained by a background writer (LOG_ASYNC,
+    flushed at exit) or a plain stderr handler, with the sampling filter.
+    :return: (root handler, sampling filter), for log_stats()
+    """
+    writer = logging.StreamHandler()
+    writer.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    handler: logging.Handler = writer
+    if LOG_ASYNC:
+        handler = BackgroundQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        listener = QueueListener(handler.queue, writer)
+        listener.start()
+        atexit.register(listener.stop)
+    sampler = SamplingFilter(parse_log_rules(LOG_SAMPLING), parse_log_rules(LOG_RATE_LIMITS))
+    handler.addFilter(sampler)
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(handler)
+    return handler, sampler
+
+
+_log_handler, _log_sampler = setup_logging()
 logger = logging.getLogger("hr_search_api")
 
+
+def log_stats() -> Dict[str, Any]:
+    """
+    Records waiting for the writer and records dropped by the full queue, sampling and rate caps.
+    """
+    return {
+        "queued": _log_handler.queue.qsize() if isinstance(_log_handler, QueueHandler) else 0,
+        "dropped": getattr(_log_handler, "dropped", 0),
+        "sampled_out": _log_sampler.sampled_out,
+        "rate_limited": _log_sampler.rate_limited,
+    }
+
 class Settings:
     """
     Application settings loaded from environment variables.
     """
-    DB_SHARDS: int = int(os.getenv("DB_SHARDS", 4))
+    # Sharding: shard 0 is the POSTGRES_* database (it also holds the org_shards directory);
+    # DB_SHARD_DSNS lists shards 1..n as ';'-separated libpq DSNs. Append new shards at the end.
+    DB_SHARD_DSNS: List[str] = [dsn.strip() for dsn in os.getenv("DB_SHARD_DSNS", "").split(";") if dsn.strip()]
+    DB_SHARDS: int = int(os.getenv("DB_SHARDS", 1 + len(DB_SHARD_DSNS)))  # shards on the hash ring; later ones take pinned orgs only
+    DB_SHARD_OVERRIDES: str = os.getenv("DB_SHARD_OVERRIDES", "")  # pinned orgs, e.g. "org_big=2,org_x=1"
+    DB_SHARD_DIRECTORY_TTL: float = float(os.getenv("DB_SHARD_DIRECTORY_TTL", 5.0))  # seconds org_shards is cached
+    TENANT_REGISTRY_ENABLED: bool = os.getenv("TENANT_REGISTRY_ENABLED", "1").lower() in ("1", "true", "yes")  # only orgs in the organizations table; 0 accepts any X-Org-Id
+    TENANT_CACHE_TTL: float = float(os.getenv("TENANT_CACHE_TTL", 60.0))  # seconds between background reloads of the organizations table
+    TENANT_NEGATIVE_TTL: float = float(os.getenv("TENANT_NEGATIVE_TTL", 30.0))  # seconds an unknown org id is rejected without a lookup
+    TENANT_NEGATIVE_MAX_ENTRIES: int = int(os.getenv("TENANT_NEGATIVE_MAX_ENTRIES", 10000))  # unknown org ids remembered
+    TENANT_LOOKUP_RATE: int = int(os.getenv("TENANT_LOOKUP_RATE", 60))  # uncached org id lookups per minute per worker; 0 rejects every uncached id
+    TENANT_LOOKUP_CONCURRENCY: int = int(os.getenv("TENANT_LOOKUP_CONCURRENCY", 2))  # uncached org id lookups in flight per worker
     RATE_LIMIT: int = int(os.getenv("RATE_LIMIT", 100))  # requests per minute per org
-    COLUMN_CONFIG_PATH: str = os.getenv("COLUMN_CONFIG_PATH", "app/core/column_config.json")
+    RATE_LIMIT_OVERRIDES: str = os.getenv("RATE_LIMIT_OVERRIDES", "")  # per-org limits, e.g. "org_big=5000,org_x=1000"
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory (per process) or shared (all workers on the host)
+    RATE_LIMIT_STRIPES: int = int(os.getenv("RATE_LIMIT_STRIPES", 64))  # lock stripes
+    RATE_LIMIT_SHM_PATH: str = os.getenv("RATE_LIMIT_SHM_PATH", "/dev/shm/hr_search_rate_limit" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "hr_search_rate_limit"))
+    RATE_LIMIT_SHM_SLOTS: int = int(os.getenv("RATE_LIMIT_SHM_SLOTS", 65536))  # max active orgs in shared mode
+    COUNT_CACHE_TTL: float = float(os.getenv("COUNT_CACHE_TTL", 60.0))  # seconds a cached search total is reused
+    COUNT_CACHE_MAX_ENTRIES: int = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", 10000))
+    SEARCH_CACHE_ENABLED: bool = os.getenv("SEARCH_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+    SEARCH_CACHE_TTL: float = float(os.getenv("SEARCH_CACHE_TTL", 10.0))  # seconds a cached result page is reused
+    SEARCH_CACHE_MAX_BYTES: int = int(os.getenv("SEARCH_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # approximate memory budget
+    SEARCH_COALESCE_ENABLED: bool = os.getenv("SEARCH_COALESCE_ENABLED", "1").lower() in ("1", "true", "yes")  # identical concurrent searches share one query
+    SEARCH_COALESCE_WAIT: float = float(os.getenv("SEARCH_COALESCE_WAIT", 2.0))  # seconds a request waits for an identical in-flight search before querying itself
+    SEARCH_SHAPE_CACHE_SIZE: int = int(os.getenv("SEARCH_SHAPE_CACHE_SIZE", 1024))  # compiled search SQL shapes kept
+    SEARCH_PREPARED_STATEMENTS: bool = os.getenv("SEARCH_PREPARED_STATEMENTS", "1").lower() in ("1", "true", "yes")  # off behind transaction-pooling proxies
+    SEARCH_PREPARED_MAX_PER_CONNECTION: int = int(os.getenv("SEARCH_PREPARED_MAX_PER_CONNECTION", 256))
+    METRICS_ORG_LABEL: str = os.getenv("METRICS_ORG_LABEL", "none")  # org label on stage timings: none, bucket or org
+    METRICS_ORG_BUCKETS: int = int(os.getenv("METRICS_ORG_BUCKETS", 16))  # hash buckets when METRICS_ORG_LABEL=bucket
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", 0))  # log search queries slower than this with their plan; 0 disables
+    SLOW_QUERY_LOG_INTERVAL: float = float(os.getenv("SLOW_QUERY_LOG_INTERVAL", 60.0))  # seconds between logs of the same query shape
+    MEMORY_ENGINE_ENABLED: bool = os.getenv("MEMORY_ENGINE_ENABLED", "0").lower() in ("1", "true", "yes")  # serve searches of loaded orgs in-process
+    MEMORY_ENGINE_ORGS: str = os.getenv("MEMORY_ENGINE_ORGS", "")  # comma-separated org ids loaded at startup and kept loaded
+    MEMORY_ENGINE_MAX_ROWS: int = int(os.getenv("MEMORY_ENGINE_MAX_ROWS", 500000))  # larger orgs stay on Postgres
+    MEMORY_ENGINE_MAX_AGE: float = float(os.getenv("MEMORY_ENGINE_MAX_AGE", 300.0))  # seconds before a loaded org is reloaded (other workers' writes); 0 = only on writes
+    BATCH_SEARCH_MAX_ITEMS: int = int(os.getenv("BATCH_SEARCH_MAX_ITEMS", 50))  # sub-searches per /search/batch call
+    BATCH_SEARCH_CONCURRENCY: int = int(os.getenv("BATCH_SEARCH_CONCURRENCY", 8))  # sub-searches run at once per batch
+    EXPORT_FETCH_SIZE: int = int(os.getenv("EXPORT_FETCH_SIZE", 1000))  # rows per server-side cursor FETCH in exports
+    CHANGES_PAGE_SIZE: int = int(os.getenv("CHANGES_PAGE_SIZE", 10000))  # default changes per /changes response
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", 1000))  # rows per COPY transaction in bulk imports
+    CURSOR_SECRET: str = os.getenv("CURSOR_SECRET") or secrets.token_hex(32)  # HMAC key for cursors and change tokens; random per process when unset
+    COLUMN_CONFIG_PATH: str = os.getenv("COLUMN_CONFIG_PATH", "app/core/column_config.json")  # per-org allowed/default columns
+    COLUMN_CONFIG_RELOAD_INTERVAL: float = float(os.getenv("COLUMN_CONFIG_RELOAD_INTERVAL", 2.0))  # seconds between file change checks
     # PostgreSQL config
     DB_HOST: str = os.getenv("POSTGRES_HOST", "db")
     DB_PORT: int = int(os.getenv("POSTGRES_PORT", 5432))
     DB_NAME: str = os.getenv("POSTGRES_DB", "hrdb")
     DB_USER: str = os.getenv("POSTGRES_USER", "hruser")
     DB_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "hrpass")
+    DB_AUTO_MIGRATE: bool = os.getenv("DB_AUTO_MIGRATE", "1").lower() in ("1", "true", "yes")  # apply schema migrations on startup
+    # Connection pool config
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 5.0))  # seconds to wait for a free connection
+    DB_POOL_HEALTH_CHECK_INTERVAL: float = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", 30.0))  # idle seconds before ping
+    DB_ASYNC_POOL_MAX_SIZE: int = int(os.getenv("DB_ASYNC_POOL_MAX_SIZE", 20))  # non-blocking connections per worker
+    # Postgres plan_cache_mode for prepared searches: auto, force_generic_plan (skips planning) or force_custom_plan
+    DB_PLAN_CACHE_MODE: str = os.getenv("DB_PLAN_CACHE_MODE", "auto")
 
 settings = Settings()
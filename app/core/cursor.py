@@ -0,0 +1,143 @@
+
+"""
+Opaque keyset pagination cursors and change feed tokens for HR Employee Search API.
+A cursor records the (sort value, id) of the last row served, the sort it was
+issued for and a fingerprint of the filters. It is HMAC-signed and bound to the
+organization, so it cannot be forged, edited, or replayed by another tenant.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+from typing import Any, Dict, NamedTuple
+
+from app.core.config import logger, settings
+
+# Sort columns a cursor may carry; they are pasted into ORDER BY, so nothing else may decode.
+CURSOR_SORT_COLUMNS = frozenset(("id", "firstname", "lastname", "department", "position", "location", "status", "relevance"))
+CURSOR_SORT_ORDERS = frozenset(("asc", "desc"))
+# Published secrets (the former default); signing with them lets anyone forge tokens.
+INSECURE_SECRETS = frozenset(("", "change-me-in-production"))
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor is malformed, tampered with, or issued for another org or query."""
+
+
+class Cursor(NamedTuple):
+    """Decoded continuation point: rows strictly after (value, id) in the given sort."""
+    sort_by: str
+    sort_order: str
+    value: Any
+    id: int
+    filters_key: str
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def check_secret() -> None:
+    """
+    Startup check of CURSOR_SECRET.
+    :raises RuntimeError: if it is set to a published value
+    """
+    configured = os.getenv("CURSOR_SECRET")
+    if configured is not None and configured in INSECURE_SECRETS:
+        raise RuntimeError("CURSOR_SECRET is set to a published default; set a random value.")
+    if configured is None:
+        logger.warning("CURSOR_SECRET is not set: using a random per-process key, so cursors and change tokens "
+                       "stop verifying on restart and across workers.")
+
+
+def _sign(org_id: str, payload: bytes) -> bytes:
+    key = settings.CURSOR_SECRET.encode("utf-8")
+    return hmac.new(key, org_id.encode("utf-8") + b"\x00" + payload, hashlib.sha256).digest()[:16]
+
+
+def filters_fingerprint(filters: Dict[str, Any]) -> str:
+    """
+    Stable short fingerprint of the active (non-None) filters.
+    :param filters: Filter dict as passed to the search service
+    :return: Hex digest
+    """
+    active = sorted((k, getattr(v, "value", v)) for k, v in filters.items() if v is not None)
+    return hashlib.sha256(json.dumps(active, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(org_id: str, cursor: Cursor) -> str:
+    """
+    Serialize and sign a cursor for the given organization.
+    :return: Opaque URL-safe token
+    """
+    payload = json.dumps(
+        [cursor.sort_by, cursor.sort_order, cursor.value, cursor.id, cursor.filters_key],
+        separators=(",", ":"),
+        default=str,
+    ).encode("utf-8")
+    return f"{_b64encode(payload)}.{_b64encode(_sign(org_id, payload))}"
+
+
+def decode_cursor(org_id: str, token: str) -> Cursor:
+    """
+    Verify and deserialize a cursor issued to the given organization.
+    :raises InvalidCursorError: if the token is malformed, forged, or from another org
+    """
+    try:
+        payload_part, sig_part = token.split(".", 1)
+        payload = _b64decode(payload_part)
+        signature = _b64decode(sig_part)
+    except (ValueError, AttributeError):
+        raise InvalidCursorError("Malformed cursor.")
+    if not hmac.compare_digest(signature, _sign(org_id, payload)):
+        raise InvalidCursorError("Cursor is not valid for this organization.")
+    try:
+        sort_by, sort_order, value, last_id, filters_key = json.loads(payload)
+        cursor = Cursor(sort_by, sort_order, value, int(last_id), filters_key)
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Malformed cursor.")
+    if cursor.sort_by not in CURSOR_SORT_COLUMNS or cursor.sort_order not in CURSOR_SORT_ORDERS:
+        raise InvalidCursorError("Malformed cursor.")
+    return cursor
+
+
+class ChangeToken(NamedTuple):
+    """Change feed position: changes of the org with a higher version than `version` in `epoch`."""
+    epoch: str
+    version: int
+
+
+def encode_change_token(org_id: str, token: ChangeToken) -> str:
+    """
+    Serialize and sign a change feed token for the given organization.
+    :return: Opaque URL-safe token
+    """
+    payload = json.dumps(["changes", token.epoch, token.version], separators=(",", ":")).encode("utf-8")
+    return f"{_b64encode(payload)}.{_b64encode(_sign(org_id, payload))}"
+
+
+def decode_change_token(org_id: str, token: str) -> ChangeToken:
+    """
+    Verify and deserialize a change feed token issued to the given organization.
+    :raises InvalidCursorError: if the token is malformed, forged, or from another org
+    """
+    try:
+        payload_part, sig_part = token.split(".", 1)
+        payload = _b64decode(payload_part)
+        signature = _b64decode(sig_part)
+    except (ValueError, AttributeError):
+        raise InvalidCursorError("Malformed change token.")
+    if not hmac.compare_digest(signature, _sign(org_id, payload)):
+        raise InvalidCursorError("Change token is not valid for this organization.")
+    try:
+        kind, epoch, version = json.loads(payload)
+        if kind != "changes":
+            raise ValueError(kind)
+        return ChangeToken(str(epoch), int(version))
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Malformed change token.")
@@ -2,25 +2,530 @@
 """
 Database connection provider for HR Employee Search API.
 No business logic or models here. Use as dependency in services/APIs.
+Connections are handed out from bounded, health-checked pools: a thread-safe
+pool for sync code and an asyncio pool of non-blocking psycopg2 connections.
 """
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from threading import Condition
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple
+
 import psycopg2
+from psycopg2.extensions import POLL_OK, POLL_READ, POLL_WRITE, TRANSACTION_STATUS_IDLE
 from app.core.config import settings, logger
+from app.core.metrics import stage
+
+
+class PoolError(Exception):
+    """Raised when the connection pool cannot be used (e.g. it is closed)."""
+
+
+class PoolTimeout(PoolError):
+    """Raised when no connection became available within the acquire timeout."""
+
+
+class _PoolBase:
+    """
+    Sizing, counters and stats shared by the sync and async pools.
+    """
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = settings.DB_POOL_MIN_SIZE,
+        max_size: int = settings.DB_POOL_MAX_SIZE,
+        timeout: float = settings.DB_POOL_TIMEOUT,
+        health_check_interval: float = settings.DB_POOL_HEALTH_CHECK_INTERVAL,
+    ) -> None:
+        """
+        Initialize the pool. No connections are opened until `open()` or the first acquire.
+        :param connect: Callable returning a new DB connection (awaitable for the async pool)
+        :param min_size: Connections opened eagerly by `open()`
+        :param max_size: Hard cap on open connections
+        :param timeout: Default seconds to wait for a free connection
+        :param health_check_interval: Idle seconds after which a connection is pinged before reuse
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size and max_size >= 1.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._acquired = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _record_wait(self, waited: float) -> None:
+        self._in_use += 1
+        self._acquired += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self._size,
+            "in_use": self._in_use,
+            "idle": len(self._idle),
+            "waiting": self._waiting,
+            "acquired": self._acquired,
+            "timeouts": self._timeouts,
+            "created": self._created,
+            "discarded": self._discarded,
+            "wait_time_total": self._wait_total,
+            "wait_time_max": self._wait_max,
+            "wait_time_avg": self._wait_total / self._acquired if self._acquired else 0.0,
+        }
+
+
+class ConnectionPool(_PoolBase):
+    """
+    Thread-safe pool of PostgreSQL connections.
+    Keeps between min_size and max_size connections, blocks up to `timeout`
+    seconds when all are in use, and validates idle connections before reuse.
+    """
+    def __init__(self, connect: Callable[[], Any], **kwargs: Any) -> None:
+        super().__init__(connect, **kwargs)
+        self._cond = Condition()
+
+    def open(self) -> None:
+        """
+        Eagerly open min_size connections. Reopens a pool that was closed.
+        """
+        with self._cond:
+            self._closed = False
+        while True:
+            # Reserve one slot at a time so a failed connect gives back only its own slot
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._new_conn()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """
+        Check out a connection, waiting up to `timeout` seconds if the pool is exhausted.
+        :param timeout: Override of the pool's default acquire timeout
+        :return: A healthy DB connection
+        :raises PoolTimeout: if no connection became available in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolError("Connection pool is closed.")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        conn, last_used = None, start
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        logger.warning(f"ConnectionPool: acquire timed out after {timeout}s ({self._in_use} in use).")
+                        raise PoolTimeout(f"No database connection available within {timeout}s.")
+                    self._cond.wait(remaining)
+                self._record_wait(time.monotonic() - start)
+            finally:
+                self._waiting -= 1
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._new_conn()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn: Any) -> None:
+        """
+        Return a connection to the pool, rolling back any open transaction.
+        Broken connections are closed and their slot freed.
+        :param conn: Connection previously returned by acquire()
+        """
+        healthy = not conn.closed
+        if healthy and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"ConnectionPool: rollback on release failed, discarding connection: {e}")
+                healthy = False
+        with self._cond:
+            self._in_use -= 1
+            keep = healthy and not self._closed
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+            self._cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Context manager that acquires a connection and always releases it.
+        """
+        with stage("db_acquire"):
+            conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """
+        Close all idle connections; in-use connections are closed when released.
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of pool usage for monitoring and sizing.
+        :return: Dict of sizes, counters and wait times (seconds)
+        """
+        with self._cond:
+            return self._snapshot()
+
+    def _new_conn(self) -> Any:
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _is_healthy(self, conn: Any, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"ConnectionPool: health check failed, replacing connection: {e}")
+            return False
+
+    def _discard(self, conn: Any) -> None:
+        with self._cond:
+            self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class AsyncConnectionPool(_PoolBase):
+    """
+    asyncio pool of non-blocking (async_=1) psycopg2 connections.
+    Waiting for a connection or a query result yields to the event loop
+    instead of blocking the worker. Connections run in autocommit mode.
+    """
+    def __init__(self, connect: Callable[[], Awaitable[Any]], **kwargs: Any) -> None:
+        super().__init__(connect, **kwargs)
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _condition(self) -> asyncio.Condition:
+        # asyncio primitives are bound to one loop; rebuild if the app restarted on a new one.
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+        return self._cond
+
+    async def open(self) -> None:
+        """
+        Eagerly open min_size connections. Reopens a pool that was closed.
+        """
+        self._closed = False
+        while self._size < self.min_size:
+            self._size += 1
+            try:
+                conn = await self._new_conn()
+            except Exception:
+                self._size -= 1
+                raise
+            self._idle.append((conn, time.monotonic()))
+
+    async def acquire(self, timeout: Optional[float] = None) -> Any:
+        """
+        Check out a connection, waiting up to `timeout` seconds if the pool is exhausted.
+        :raises PoolTimeout: if no connection became available in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        cond = self._condition()
+        async with cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise PoolError("Connection pool is closed.")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        conn, last_used = None, start
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError
+                        await asyncio.wait_for(cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        self._timeouts += 1
+                        logger.warning(f"AsyncConnectionPool: acquire timed out after {timeout}s ({self._in_use} in use).")
+                        raise PoolTimeout(f"No database connection available within {timeout}s.")
+                self._record_wait(time.monotonic() - start)
+            finally:
+                self._waiting -= 1
+        try:
+            if conn is not None and not await self._is_healthy(conn, last_used):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = await self._new_conn()
+        except BaseException:
+            async with cond:
+                self._size -= 1
+                self._in_use -= 1
+                cond.notify()
+            raise
+        return conn
+
+    async def release(self, conn: Any) -> None:
+        """
+        Return a connection to the pool. A connection still executing
+        (e.g. the request was cancelled mid-query) is cancelled and discarded.
+        """
+        healthy = not conn.closed
+        if healthy and conn.isexecuting():
+            try:
+                conn.cancel()
+            except Exception as e:
+                logger.warning(f"AsyncConnectionPool: cancelling in-flight query failed: {e}")
+            healthy = False
+        cond = self._condition()
+        async with cond:
+            self._in_use -= 1
+            keep = healthy and not self._closed
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+            cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    @asynccontextmanager
+    async def connection(self, timeout: Optional[float] = None) -> AsyncIterator[Any]:
+        """
+        Async context manager that acquires a connection and always releases it.
+        """
+        with stage("db_acquire"):
+            conn = await self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def close(self) -> None:
+        """
+        Close all idle connections; in-use connections are closed when released.
+        """
+        self._closed = True
+        idle = list(self._idle)
+        self._idle.clear()
+        self._size -= len(idle)
+        if self._cond is not None and self._loop is asyncio.get_running_loop():
+            async with self._cond:
+                self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of pool usage for monitoring and sizing.
+        """
+        return self._snapshot()
 
-def get_db_conn():
+    async def _new_conn(self) -> Any:
+        conn = await self._connect()
+        self._created += 1
+        return conn
+
+    async def _is_healthy(self, conn: Any, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                await execute_async(cur, "SELECT 1")
+            return True
+        except Exception as e:
+            logger.warning(f"AsyncConnectionPool: health check failed, replacing connection: {e}")
+            return False
+
+    def _discard(self, conn: Any) -> None:
+        self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+async def wait_async(conn: Any) -> None:
+    """
+    Drive a non-blocking psycopg2 connection until its current operation completes,
+    yielding to the event loop while the socket is not ready.
+    :param conn: psycopg2 connection created with async_=1
+    """
+    loop = asyncio.get_running_loop()
+    fd = conn.fileno()
+    while True:
+        state = conn.poll()
+        if state == POLL_OK:
+            return
+        ready = loop.create_future()
+        def wake() -> None:
+            if not ready.done():
+                ready.set_result(None)
+        if state == POLL_READ:
+            loop.add_reader(fd, wake)
+            try:
+                await ready
+            finally:
+                loop.remove_reader(fd)
+        elif state == POLL_WRITE:
+            loop.add_writer(fd, wake)
+            try:
+                await ready
+            finally:
+                loop.remove_writer(fd)
+        else:
+            raise psycopg2.OperationalError(f"Unexpected poll state: {state}")
+
+
+async def execute_async(cur: Any, query: str, params: Optional[Any] = None) -> None:
+    """
+    Execute a query on a cursor of a non-blocking connection without blocking the loop.
+    """
+    cur.execute(query, params)
+    await wait_async(cur.connection)
+
+
+def _connect_args(dsn: Optional[str]) -> Tuple[Tuple[Any, ...], Dict[str, Any]]:
+    # plan_cache_mode only affects prepared statements, i.e. searches (see query_shapes)
+    session = {} if settings.DB_PLAN_CACHE_MODE == "auto" else {"options": f"-c plan_cache_mode={settings.DB_PLAN_CACHE_MODE}"}
+    if dsn:
+        return (dsn,), session
+    return (), {
+        "host": settings.DB_HOST,
+        "port": settings.DB_PORT,
+        "dbname": settings.DB_NAME,
+        "user": settings.DB_USER,
+        "password": settings.DB_PASSWORD,
+        **session,
+    }
+
+
+def connect(dsn: Optional[str] = None) -> Any:
     """
     Create and return a new PostgreSQL database connection.
-    Usage: Use as a dependency in services/APIs.
+    Used by the pool; prefer `get_db_conn` or `db_pool.connection()` elsewhere.
+    :param dsn: libpq connection string of another shard; defaults to the POSTGRES_* settings
     """
+    args, kwargs = _connect_args(dsn)
     try:
-        conn = psycopg2.connect(
-            host=settings.DB_HOST,
-            port=settings.DB_PORT,
-            dbname=settings.DB_NAME,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD
-        )
+        conn = psycopg2.connect(*args, **kwargs)
         logger.info("Database connection established.")
         return conn
     except Exception as e:
         logger.error(f"Failed to connect to database: {e}")
         raise
+
+
+# Singleton pool for global use
+db_pool = ConnectionPool(connect)
+
+
+def get_db_conn() -> Iterator[Any]:
+    """
+    Yield a pooled PostgreSQL connection and return it to the pool afterwards.
+    Usage: Use as a dependency in services/APIs.
+    """
+    with db_pool.connection() as conn:
+        yield conn
+
+
+async def connect_async(dsn: Optional[str] = None) -> Any:
+    """
+    Create and return a new non-blocking PostgreSQL connection.
+    Used by the async pool; prefer `get_async_db_conn` elsewhere.
+    :param dsn: libpq connection string of another shard; defaults to the POSTGRES_* settings
+    """
+    args, kwargs = _connect_args(dsn)
+    try:
+        conn = psycopg2.connect(*args, async_=1, **kwargs)
+        await wait_async(conn)
+        logger.info("Async database connection established.")
+        return conn
+    except Exception as e:
+        logger.error(f"Failed to connect to database: {e}")
+        raise
+
+
+# Singleton async pool for the request path
+async_db_pool = AsyncConnectionPool(connect_async, max_size=settings.DB_ASYNC_POOL_MAX_SIZE)
+
+
+async def get_async_db_conn() -> AsyncIterator[Any]:
+    """
+    Yield a pooled non-blocking PostgreSQL connection and return it to the pool afterwards.
+    Usage: Use as a dependency in async APIs.
+    """
+    async with async_db_pool.connection() as conn:
+        yield conn
@@ -0,0 +1,301 @@
+
+"""
+In-process metrics in the Prometheus text format, without extra dependencies.
+Histograms and counters are updated on the request path (one lock and a bisect
+per observation); gauges such as pool and cache sizes are read from the
+components' stats() only when /metrics is scraped.
+Per-stage timings are labeled with the endpoint and, depending on
+METRICS_ORG_LABEL, nothing, a stable hash bucket or the org id itself.
+"""
+import time
+import zlib
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from app.core.config import logger, settings
+
+# Latency buckets in seconds, from sub-millisecond index lookups to slow exports.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# A sample from a collector: (metric name, help, type, labels, value)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_labels(self.label_names, key)} {value}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, labels: Tuple[str, ...]) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Register a callable returning samples read at scrape time (e.g. pool sizes).
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        A failing collector is logged and skipped.
+        """
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        grouped: Dict[str, Tuple[str, str, List[Tuple[Dict[str, str], float]]]] = {}
+        for collector in self._collectors:
+            try:
+                for name, help, kind, labels, value in collector():
+                    grouped.setdefault(name, (help, kind, []))[2].append((labels, value))
+            except Exception as e:
+                logger.warning(f"metrics: collector {getattr(collector, '__name__', collector)} failed: {e}")
+        for name, (help, kind, samples) in grouped.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_labels(list(labels), list(labels.values()))} {value}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+# Fields of component stats() that only ever grow; exported as counters.
+COUNTER_FIELDS = frozenset({
+    "hits", "misses", "evictions", "expirations", "invalidations", "acquired", "timeouts", "created", "discarded",
+    "allowed", "rejected", "prepares", "prepared_executions", "unprepared_executions", "reloads", "wait_time_total",
+    "served", "fallbacks", "loads", "load_seconds", "lookups",
+    "dropped", "sampled_out", "rate_limited", "executions", "coalesced",
+})
+
+
+def stats_samples(prefix: str, stats: Dict[str, Any], labels: Optional[Dict[str, str]] = None) -> List[Sample]:
+    """
+    Turn a component's stats() dict into samples: numeric fields become
+    `<prefix>_<field>` gauges, or `<prefix>_<field>_total` counters for COUNTER_FIELDS.
+    Nested dicts and non-numeric fields are skipped.
+    """
+    samples: List[Sample] = []
+    for field, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if not isinstance(value, (int, float)):
+            continue
+        if field in COUNTER_FIELDS:
+            name = f"{prefix}_{field}" if field.endswith("_total") else f"{prefix}_{field}_total"
+            samples.append((name, f"{prefix} {field}", "counter", labels or {}, value))
+        else:
+            samples.append((f"{prefix}_{field}", f"{prefix} {field}", "gauge", labels or {}, value))
+    return samples
+
+
+def org_label(org_id: str) -> str:
+    """
+    Org label value per METRICS_ORG_LABEL: "" (none), a stable bucket "b07" (bucket) or the org id (org).
+    Buckets keep the series count bounded with many tenants.
+    """
+    mode = settings.METRICS_ORG_LABEL
+    if mode == "org":
+        return org_id
+    if mode == "bucket":
+        return f"b{zlib.crc32(org_id.encode('utf-8')) % settings.METRICS_ORG_BUCKETS:02d}"
+    return ""
+
+
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.histogram(
+    "hr_stage_duration_seconds", "Time spent per request stage", ("endpoint", "stage", "org")
+)
+REQUEST_SECONDS = metrics.histogram(
+    "hr_http_request_duration_seconds", "HTTP request duration, including streamed bodies", ("endpoint", "method")
+)
+REQUESTS = metrics.counter("hr_http_requests_total", "HTTP requests by status", ("endpoint", "method", "status"))
+RATE_LIMIT_REJECTIONS = metrics.counter("hr_rate_limit_rejections_total", "Requests rejected by the rate limiter", ("org",))
+SLOW_QUERIES = metrics.counter("hr_slow_queries_total", "Search queries slower than SLOW_QUERY_MS", ("endpoint",))
+
+# (endpoint, org label) of the request being handled; unset outside requests, so scripts record nothing.
+_request: ContextVar[Optional[Tuple[str, str]]] = ContextVar("metrics_request", default=None)
+
+
+def bind_request(endpoint: str, org_id: str) -> None:
+    """
+    Label the current request's stage timings. Call from the request's own task
+    (e.g. an async dependency); tasks it starts inherit the labels.
+    """
+    _request.set((endpoint, org_label(org_id)))
+
+
+class StageTimer:
+    """
+    Context manager timing one stage of the current request into hr_stage_duration_seconds.
+    `elapsed` is set on exit, also outside requests.
+    """
+    __slots__ = ("name", "started", "elapsed")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "StageTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.elapsed = time.perf_counter() - self.started
+        labels = _request.get()
+        if labels is not None:
+            STAGE_SECONDS.observe((labels[0], self.name, labels[1]), self.elapsed)
+
+
+def stage(name: str) -> StageTimer:
+    """
+    Time a stage: `with stage("page_query"): ...`
+    """
+    return StageTimer(name)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count and duration per route template
+    (e.g. "/search", never the raw URL, so label cardinality stays bounded).
+    """
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = ["500"]
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe((endpoint, scope["method"]), time.perf_counter() - started)
+            REQUESTS.inc((endpoint, scope["method"], status[0]))
+
+
+class SlowQueryLog:
+    """
+    Opt-in log of slow search queries with their plan (SLOW_QUERY_MS > 0).
+    Each query shape is logged at most once per `interval` seconds, so a slow
+    shape under load does not turn into an EXPLAIN per request.
+    """
+    def __init__(self, threshold_ms: float = settings.SLOW_QUERY_MS, interval: float = settings.SLOW_QUERY_LOG_INTERVAL) -> None:
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self._logged: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def should_explain(self, shape_id: str, elapsed: float) -> bool:
+        """
+        Count a slow query and decide whether to capture its plan now.
+        """
+        if self.threshold <= 0 or elapsed < self.threshold:
+            return False
+        labels = _request.get()
+        SLOW_QUERIES.inc((labels[0] if labels else "",))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._logged.get(shape_id, float("-inf")) < self.interval:
+                return False
+            self._logged[shape_id] = now
+            if len(self._logged) > 10000:
+                self._logged = {k: t for k, t in self._logged.items() if now - t < self.interval}
+        return True
+
+    @staticmethod
+    def log(shape_id: str, org_id: str, elapsed: float, query: str, plan: Optional[List[str]]) -> None:
+        """
+        Log the shape's SQL (placeholders, no values) and its plan. The plan shows the
+        values of this execution, like any EXPLAIN.
+        """
+        plan_text = "\n".join(plan) if plan else "(plan unavailable)"
+        logger.warning(f"Slow search {elapsed * 1000:.1f}ms (shape {shape_id}, org {org_id}): {query}\n{plan_text}")
+
+# Singleton instance for global use
+slow_query_log = SlowQueryLog()
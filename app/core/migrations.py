@@ -0,0 +1,314 @@
+
+"""
+Versioned schema migrations for HR Employee Search API.
+Owns the `employees` DDL and the indexes that back every search filter and sort.
+Applied versions are recorded in `schema_migrations`; run on startup when
+DB_AUTO_MIGRATE is set, or manually with `python -m app.core.migrations`.
+"""
+from typing import Any, Dict, List, NamedTuple, Tuple
+from app.core.config import settings, logger
+
+# pg_advisory_lock key so only one worker migrates at a time
+MIGRATION_LOCK_KEY = 727_001
+# Employee ids generated on shard k lie in [k * ID_RANGE, (k + 1) * ID_RANGE), so moved rows keep their ids.
+ID_RANGE = 1 << 48
+
+
+class Migration(NamedTuple):
+    """One schema version. Non-transactional migrations may use CREATE INDEX CONCURRENTLY."""
+    version: int
+    description: str
+    statements: Tuple[str, ...]
+    transactional: bool = True
+
+
+# Columns that can be filtered by equality; each also backs ORDER BY <col>, id within an org.
+INDEXED_COLUMNS = ("firstname", "lastname", "contact", "department", "position", "location", "status")
+# Columns that support prefix, contains and fuzzy matching.
+TEXT_MATCH_COLUMNS = ("firstname", "lastname", "contact")
+# Full-text document over name, position and department. Queries must use this exact
+# expression to hit ix_employees_org_fulltext; never edit it, add a migration instead.
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(firstname, '') || ' ' || coalesce(lastname, '') || ' ' "
+    "|| coalesce(position, '') || ' ' || coalesce(department, ''))"
+)
+
+# Indexes the search path relies on, per migration: name -> definition fragment.
+SEARCH_INDEXES: Dict[str, str] = {
+    "ix_employees_org_id": "employees (org_id, id)",
+    **{f"ix_employees_org_{col}": f"employees (org_id, {col}, id)" for col in INDEXED_COLUMNS},
+    "ix_employees_extra_gin": "employees USING GIN (extra)",
+}
+TEXT_SEARCH_INDEXES: Dict[str, str] = {
+    **{f"ix_employees_org_{col}_prefix": f"employees (org_id, lower({col}) text_pattern_ops)" for col in TEXT_MATCH_COLUMNS},
+    **{f"ix_employees_org_{col}_trgm": f"employees USING GIN (org_id, {col} gin_trgm_ops)" for col in TEXT_MATCH_COLUMNS},
+    "ix_employees_org_fulltext": f"employees USING GIN (org_id, ({SEARCH_DOCUMENT}))",
+}
+EXPECTED_INDEXES: Dict[str, str] = {**SEARCH_INDEXES, **TEXT_SEARCH_INDEXES}
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, "create employees table", (
+        """
+        CREATE TABLE IF NOT EXISTS employees (
+            id BIGSERIAL PRIMARY KEY,
+            org_id TEXT NOT NULL,
+            firstname TEXT NOT NULL,
+            lastname TEXT NOT NULL,
+            contact TEXT,
+            department TEXT,
+            position TEXT,
+            location TEXT,
+            status TEXT NOT NULL CHECK (status IN ('Active', 'Not Started', 'Terminated')),
+            extra JSONB NOT NULL DEFAULT '{}'::jsonb
+        )
+        """,
+    )),
+    Migration(2, "tenant-leading composite indexes for search filters and sorts", tuple(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"
+        for name, definition in SEARCH_INDEXES.items()
+    ), transactional=False),
+    Migration(3, "prefix, trigram and full-text indexes for name search", (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    ) + tuple(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"
+        for name, definition in TEXT_SEARCH_INDEXES.items()
+    ), transactional=False),
+    Migration(4, "org-to-shard directory", (
+        # Read from shard 0 only; created everywhere so every shard has the same schema.
+        """
+        CREATE TABLE IF NOT EXISTS org_shards (
+            org_id TEXT PRIMARY KEY,
+            shard INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'active' CHECK (state IN ('active', 'moving')),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+    )),
+    Migration(5, "organizations registry", (
+        # Read from shard 0 only, like org_shards. NULL rate_limit / columns fall back to
+        # RATE_LIMIT(_OVERRIDES) and the column config file.
+        """
+        CREATE TABLE IF NOT EXISTS organizations (
+            org_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            active BOOLEAN NOT NULL DEFAULT true,
+            rate_limit INTEGER CHECK (rate_limit > 0),
+            columns JSONB,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        # Register the orgs that already have employees on this shard, so enabling validation rejects none of them.
+        "INSERT INTO organizations (org_id, name) SELECT DISTINCT org_id, org_id FROM employees ON CONFLICT (org_id) DO NOTHING",
+    )),
+    Migration(6, "per-org change versions for the change feed", (
+        # One counter per org and shard. Writers bump it in the same transaction as their rows,
+        # so its row lock orders an org's writes and versions become visible in commit order.
+        # epoch changes when the org's history starts over (e.g. on another shard after a move).
+        """
+        CREATE TABLE IF NOT EXISTS org_change_versions (
+            org_id TEXT PRIMARY KEY,
+            epoch TEXT NOT NULL DEFAULT substr(md5(random()::text || clock_timestamp()::text), 1, 12),
+            version BIGINT NOT NULL
+        )
+        """,
+        # Latest change per employee; deleted employees stay as tombstones (op 'D').
+        """
+        CREATE TABLE IF NOT EXISTS employee_versions (
+            org_id TEXT NOT NULL,
+            employee_id BIGINT NOT NULL,
+            version BIGINT NOT NULL,
+            op CHAR(1) NOT NULL CHECK (op IN ('I', 'U', 'D')),
+            PRIMARY KEY (org_id, employee_id)
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_employee_versions_org_version ON employee_versions (org_id, version)",
+        # Statement-level, so a COPY batch costs one counter update per org rather than one per row.
+        """
+        CREATE OR REPLACE FUNCTION employees_record_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+        DECLARE
+            change_op CHAR(1) := left(TG_OP, 1);
+            org RECORD;
+            last_version BIGINT;
+        BEGIN
+            FOR org IN SELECT org_id, count(*) AS n FROM changed_rows GROUP BY org_id ORDER BY org_id LOOP
+                INSERT INTO org_change_versions AS c (org_id, version) VALUES (org.org_id, org.n)
+                ON CONFLICT (org_id) DO UPDATE SET version = c.version + EXCLUDED.version
+                RETURNING c.version INTO last_version;
+                INSERT INTO employee_versions AS v (org_id, employee_id, version, op)
+                SELECT org_id, id, last_version - org.n + row_number() OVER (ORDER BY id), change_op
+                FROM changed_rows WHERE org_id = org.org_id
+                ON CONFLICT (org_id, employee_id) DO UPDATE SET version = EXCLUDED.version, op = EXCLUDED.op;
+            END LOOP;
+            RETURN NULL;
+        END
+        $$
+        """,
+        "DROP TRIGGER IF EXISTS employees_changes_insert ON employees",
+        "DROP TRIGGER IF EXISTS employees_changes_update ON employees",
+        "DROP TRIGGER IF EXISTS employees_changes_delete ON employees",
+        """
+        CREATE TRIGGER employees_changes_insert AFTER INSERT ON employees
+        REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION employees_record_changes()
+        """,
+        """
+        CREATE TRIGGER employees_changes_update AFTER UPDATE ON employees
+        REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION employees_record_changes()
+        """,
+        """
+        CREATE TRIGGER employees_changes_delete AFTER DELETE ON employees
+        REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION employees_record_changes()
+        """,
+        # Existing employees become the first changes, so a feed read from the start is a full snapshot.
+        """
+        INSERT INTO org_change_versions (org_id, version)
+        SELECT org_id, count(*) FROM employees GROUP BY org_id ON CONFLICT (org_id) DO NOTHING
+        """,
+        """
+        INSERT INTO employee_versions (org_id, employee_id, version, op)
+        SELECT org_id, id, row_number() OVER (PARTITION BY org_id ORDER BY id), 'I' FROM employees
+        ON CONFLICT (org_id, employee_id) DO NOTHING
+        """,
+    )),
+    Migration(7, "source shard of an unfinished org move", (
+        # Set while the source shard of a switched move still holds the org's rows.
+        "ALTER TABLE org_shards ADD COLUMN IF NOT EXISTS source INTEGER",
+    )),
+)
+
+
+def _ensure_version_table(cur: Any) -> None:
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def reserve_id_range(conn: Any, shard: int) -> None:
+    """
+    Confine the shard's employee id sequence to its ID_RANGE block, so ids never
+    collide across shards. Idempotent; ids already issued are not changed.
+    :param conn: Sync psycopg2 connection to the shard (committed)
+    """
+    low, high = max(shard * ID_RANGE, 1), (shard + 1) * ID_RANGE - 1
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_get_serial_sequence('employees', 'id')")
+        sequence = cur.fetchone()[0]
+        cur.execute("SELECT seqmin, seqmax FROM pg_sequence WHERE seqrelid = %s::regclass", (sequence,))
+        bounds = cur.fetchone()
+        cur.execute(f"SELECT last_value, is_called FROM {sequence}")
+        last_value, is_called = cur.fetchone()
+        if bounds != (low, high):
+            restart = last_value + 1 if is_called and low <= last_value < high else low
+            cur.execute(f"ALTER SEQUENCE {sequence} MINVALUE {low} MAXVALUE {high} START WITH {low} RESTART WITH {restart}")
+            logger.info(f"Shard {shard}: employee ids reserved from {low}, next {restart}")
+    conn.commit()
+
+
+def current_version(conn: Any) -> int:
+    """
+    Highest applied migration version, or 0 for an unmanaged database.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations')")
+        if cur.fetchone()[0] is None:
+            return 0
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        return cur.fetchone()[0]
+
+
+def migrate(conn: Any, shard: int = 0) -> List[int]:
+    """
+    Apply all pending migrations in order under an advisory lock, then reserve the
+    shard's id range.
+    Transactional migrations are applied atomically with their version row;
+    the others run statement by statement (required for CONCURRENTLY) and are
+    safe to re-run because every statement is idempotent.
+    :param conn: Sync psycopg2 connection; its autocommit setting is restored afterwards
+    :param shard: Index of the shard conn belongs to
+    :return: Versions applied by this call
+    """
+    applied: List[int] = []
+    autocommit = conn.autocommit
+    conn.rollback()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+            try:
+                _ensure_version_table(cur)
+                version = current_version(conn)
+                for migration in MIGRATIONS:
+                    if migration.version <= version:
+                        continue
+                    logger.info(f"Applying migration {migration.version}: {migration.description}")
+                    if migration.transactional:
+                        cur.execute("BEGIN")
+                    try:
+                        for statement in migration.statements:
+                            cur.execute(statement)
+                        cur.execute(
+                            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                            (migration.version, migration.description),
+                        )
+                        if migration.transactional:
+                            cur.execute("COMMIT")
+                    except Exception:
+                        if migration.transactional:
+                            cur.execute("ROLLBACK")
+                        raise
+                    applied.append(migration.version)
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    finally:
+        conn.autocommit = autocommit
+    reserve_id_range(conn, shard)
+    return applied
+
+
+def missing_indexes(conn: Any) -> List[str]:
+    """
+    Names of expected search indexes that are absent or invalid (e.g. an interrupted
+    CREATE INDEX CONCURRENTLY).
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = to_regclass('employees') AND i.indisvalid
+        """)
+        present = {row[0] for row in cur.fetchall()}
+    conn.rollback()
+    return [name for name in EXPECTED_INDEXES if name not in present]
+
+
+def check_schema(conn: Any, shard: int = 0) -> Dict[str, Any]:
+    """
+    Startup check: apply migrations if DB_AUTO_MIGRATE is set, then report the
+    schema version and any missing search indexes (logged as warnings).
+    :return: {"version": int, "latest": int, "missing_indexes": [...]}
+    """
+    if settings.DB_AUTO_MIGRATE:
+        migrate(conn, shard)
+    version = current_version(conn)
+    missing = missing_indexes(conn)
+    conn.rollback()
+    latest = MIGRATIONS[-1].version
+    if version < latest:
+        logger.warning(f"Database schema is at version {version}, latest is {latest}; run migrations.")
+    if missing:
+        logger.warning(f"Missing search indexes (queries may sequentially scan): {', '.join(missing)}")
+    return {"version": version, "latest": latest, "missing_indexes": missing}
+
+
+if __name__ == "__main__":
+    from app.core.sharding import shard_router
+    for shard, pool in enumerate(shard_router.pools):
+        with pool.connection() as conn:
+            done = migrate(conn, shard)
+            logger.info(f"Shard {shard}: applied migrations: {done or 'none'}; missing indexes: {missing_indexes(conn) or 'none'}")
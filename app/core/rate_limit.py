@@ -1,43 +1,263 @@
 
 """
-Naive in-memory rate limiter for per-organization request limiting.
-Thread-safe, resets every minute window. No persistence or distributed support.
+Per-organization rate limiting for HR Employee Search API.
+Token bucket per org: capacity RATE_LIMIT (or the org's override) refilled at
+that many tokens per minute, so memory is O(1) per active org. Buckets live in
+one of two stores:
+- memory: per-process dict, lock-striped; idle orgs are evicted.
+- shared: fixed-size table in a memory-mapped file shared by every worker on the
+  host, with per-stripe file locks, so the limit holds across uvicorn workers.
 """
+import hashlib
+import mmap
+import os
+import struct
 import time
 from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
 from app.core.config import logger, settings
-from typing import Dict
+
+# Seconds for a bucket to refill completely; an org idle this long has a full
+# bucket, so forgetting it is indistinguishable from keeping it.
+WINDOW_SECONDS = 60.0
+
+
+def parse_overrides(spec: str) -> Dict[str, int]:
+    """
+    Parse per-org limits from "org_a=5000,org_b=1000".
+    :raises ValueError: on a malformed entry
+    """
+    overrides: Dict[str, int] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        org_id, sep, limit = item.partition("=")
+        if not sep or not org_id.strip():
+            raise ValueError(f"Invalid rate limit override '{item}', expected org=limit.")
+        overrides[org_id.strip()] = int(limit)
+    return overrides
+
+
+def _refill(tokens: float, last: float, now: float, capacity: float) -> float:
+    return min(capacity, tokens + max(0.0, now - last) * capacity / WINDOW_SECONDS)
+
+
+class MemoryBucketStore:
+    """
+    In-process bucket store. Orgs are spread over `stripes` locks so concurrent
+    requests for different orgs rarely contend; each stripe drops its idle buckets
+    at most once per window.
+    """
+    def __init__(self, stripes: int = settings.RATE_LIMIT_STRIPES) -> None:
+        self._stripes: List[Tuple[Lock, Dict[str, List[float]]]] = [(Lock(), {}) for _ in range(stripes)]
+        self._swept = [time.monotonic()] * stripes
+        self.evictions = 0
+
+    def take(self, org_id: str, cost: int, capacity: int, now: float) -> bool:
+        """
+        Refill the org's bucket and take `cost` tokens if available.
+        :return: True if the tokens were taken
+        """
+        index = hash(org_id) % len(self._stripes)
+        lock, buckets = self._stripes[index]
+        with lock:
+            if now - self._swept[index] >= WINDOW_SECONDS:
+                self._sweep(buckets, now)
+                self._swept[index] = now
+            bucket = buckets.get(org_id)
+            if bucket is None:
+                bucket = buckets[org_id] = [float(capacity), now]
+            tokens = _refill(bucket[0], bucket[1], now, capacity)
+            allowed = tokens >= cost
+            bucket[0] = tokens - cost if allowed else tokens
+            bucket[1] = now
+            return allowed
+
+    def _sweep(self, buckets: Dict[str, List[float]], now: float) -> None:
+        idle = [org_id for org_id, (_, last) in buckets.items() if now - last >= WINDOW_SECONDS]
+        for org_id in idle:
+            del buckets[org_id]
+        self.evictions += len(idle)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "orgs": sum(len(buckets) for _, buckets in self._stripes),
+            "stripes": len(self._stripes),
+            "evictions": self.evictions,
+        }
+
+
+class SharedMemoryBucketStore:
+    """
+    Bucket store in a memory-mapped file, shared by all processes that open the same path.
+    Layout: a header (magic, slots, stripes) then `slots` records of
+    (org key, tokens, last refill). Each stripe is a contiguous, open-addressed
+    range of slots guarded by a thread lock plus an fcntl lock on its byte range.
+    Slots of idle orgs are reused; if a stripe is full, its least recently used
+    org is evicted (that org starts again from a full bucket).
+    Times are CLOCK_MONOTONIC, which is system-wide on Linux, so this works per host only.
+    """
+    _HEADER = struct.Struct("<8sII")
+    _SLOT = struct.Struct("<Qdd")
+    _MAGIC = b"HRRATE01"
+
+    def __init__(
+        self,
+        path: str = settings.RATE_LIMIT_SHM_PATH,
+        slots: int = settings.RATE_LIMIT_SHM_SLOTS,
+        stripes: int = settings.RATE_LIMIT_STRIPES
+    ) -> None:
+        """
+        Open (creating if needed) the shared table.
+        :raises ValueError: if the file was created with a different layout
+        """
+        import fcntl  # Unix only; the memory store has no such requirement
+        self._fcntl = fcntl
+        self.path = path
+        self.stripes = stripes
+        self.stripe_slots = max(1, slots // stripes)
+        self.slots = self.stripe_slots * stripes
+        size = self._HEADER.size + self.slots * self._SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, self._HEADER.pack(self._MAGIC, self.slots, self.stripes), 0)
+            magic, file_slots, file_stripes = self._HEADER.unpack(os.pread(self._fd, self._HEADER.size, 0))
+            if (magic, file_slots, file_stripes) != (self._MAGIC, self.slots, self.stripes):
+                raise ValueError(f"Rate limit table {path} has a different layout; remove it or fix the settings.")
+            self._mm = mmap.mmap(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._locks = [Lock() for _ in range(stripes)]
+        self.evictions = 0
+
+    @staticmethod
+    def _key(org_id: str) -> int:
+        # Stable across processes (unlike hash()); 0 marks a never-used slot.
+        return int.from_bytes(hashlib.blake2b(org_id.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+    def _offset(self, slot: int) -> int:
+        return self._HEADER.size + slot * self._SLOT.size
+
+    def take(self, org_id: str, cost: int, capacity: int, now: float) -> bool:
+        """
+        Refill the org's bucket and take `cost` tokens if available, atomically across processes.
+        :return: True if the tokens were taken
+        """
+        key = self._key(org_id)
+        stripe = key % self.stripes
+        base = stripe * self.stripe_slots
+        stripe_bytes = self.stripe_slots * self._SLOT.size
+        with self._locks[stripe]:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX, stripe_bytes, self._offset(base))
+            try:
+                offset = self._offset(self._find(key, base, (key // self.stripes) % self.stripe_slots, now))
+                slot_key, tokens, last = self._SLOT.unpack_from(self._mm, offset)
+                if slot_key != key:
+                    tokens, last = float(capacity), now
+                tokens = _refill(tokens, last, now, capacity)
+                allowed = tokens >= cost
+                self._SLOT.pack_into(self._mm, offset, key, tokens - cost if allowed else tokens, now)
+                return allowed
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, stripe_bytes, self._offset(base))
+
+    def _find(self, key: int, base: int, start: int, now: float) -> int:
+        """
+        Slot holding `key`, else the first reusable slot on its probe path.
+        Slots are never cleared, so the probe ends at the first never-used slot.
+        """
+        reusable = None
+        oldest, oldest_last = None, None
+        for i in range(self.stripe_slots):
+            slot = base + (start + i) % self.stripe_slots
+            slot_key, _, last = self._SLOT.unpack_from(self._mm, self._offset(slot))
+            if slot_key == key:
+                return slot
+            if slot_key == 0:
+                return slot if reusable is None else reusable
+            if reusable is None and now - last >= WINDOW_SECONDS:
+                reusable = slot
+            if oldest_last is None or last < oldest_last:
+                oldest, oldest_last = slot, last
+        if reusable is not None:
+            return reusable
+        self.evictions += 1
+        return oldest
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "shared",
+            "path": self.path,
+            "slots": self.slots,
+            "stripes": self.stripes,
+            "evictions": self.evictions,
+        }
+
+
+def create_store(backend: str = settings.RATE_LIMIT_BACKEND) -> Any:
+    """
+    Build the bucket store selected by RATE_LIMIT_BACKEND ("memory" or "shared").
+    """
+    if backend == "shared":
+        return SharedMemoryBucketStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{backend}'.")
+    return MemoryBucketStore()
+
 
 class RateLimiter:
-    def __init__(self, limit: int = settings.RATE_LIMIT) -> None:
+    def __init__(
+        self,
+        limit: int = settings.RATE_LIMIT,
+        overrides: Optional[Dict[str, int]] = None,
+        store: Any = None
+    ) -> None:
         """
         Initialize the rate limiter.
-        :param limit: Max requests per org per minute.
+        :param limit: Max requests per org per minute (also the burst size).
+        :param overrides: Per-org limits; defaults to RATE_LIMIT_OVERRIDES
+        :param store: MemoryBucketStore or SharedMemoryBucketStore (default: in-process)
         """
         self.limit = limit
-        self.requests: Dict[str, Dict[int, int]] = {}
-        self.lock = Lock()
+        self.overrides = dict(overrides) if overrides is not None else parse_overrides(settings.RATE_LIMIT_OVERRIDES)
+        self.store = store if store is not None else MemoryBucketStore()
+        self.allowed = 0
+        self.rejected = 0
+
+    def limit_for(self, org_id: str) -> int:
+        return self.overrides.get(org_id, self.limit)
+
+    def set_limit(self, org_id: str, limit: Optional[int]) -> None:
+        """
+        Set (or with None, remove) an org's override; applies from its next request.
+        """
+        if limit is None:
+            self.overrides.pop(org_id, None)
+        else:
+            self.overrides[org_id] = limit
 
-    def is_allowed(self, org_id: str) -> bool:
+    def is_allowed(self, org_id: str, cost: int = 1) -> bool:
         """
-        Check if a request is allowed for the given org in the current minute window.
+        Check if a request is allowed for the given org and charge it.
         :param org_id: Organization ID
+        :param cost: Tokens the request consumes (e.g. per sub-request of a batch)
         :return: True if allowed, False if rate limit exceeded
         """
         if not org_id:
             logger.error("RateLimiter: org_id is required.")
             return False
-        now = int(time.time())
-        window = now // 60  # minute window
-        with self.lock:
-            org_data = self.requests.setdefault(org_id, {})
-            count = org_data.get(window, 0)
-            if count >= self.limit:
-                logger.warning(f"Rate limit exceeded for org {org_id}")
-                return False
-            org_data[window] = count + 1
-            self.requests[org_id] = org_data
+        if not self.store.take(org_id, cost, self.limit_for(org_id), time.monotonic()):
+            self.rejected += 1
+            logger.warning(f"Rate limit exceeded for org {org_id}")
+            return False
+        self.allowed += 1
         return True
 
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "overrides": len(self.overrides), "allowed": self.allowed,
+                "rejected": self.rejected, **self.store.stats()}
+
 # Singleton instance for global use
-rate_limiter = RateLimiter()
+rate_limiter = RateLimiter(store=create_store())
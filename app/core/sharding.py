@@ -0,0 +1,251 @@
+
+"""
+Org-based shard routing for HR Employee Search API.
+Every organization lives on exactly one shard (a PostgreSQL database). The shard
+is, in order of precedence: its row in the `org_shards` directory on shard 0
+(written by the rebalancer, cached for DB_SHARD_DIRECTORY_TTL seconds), a pin in
+DB_SHARD_OVERRIDES, or its position on a consistent-hash ring over the first
+DB_SHARDS shards. Each shard has its own sync and async connection pools.
+"""
+import bisect
+import functools
+import hashlib
+import time
+from contextlib import asynccontextmanager, contextmanager
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+from app.core.config import logger, settings
+from app.core.db import (
+    AsyncConnectionPool, ConnectionPool, async_db_pool, connect, connect_async, db_pool, execute_async
+)
+
+# Ring points per shard; more points give a more even spread of orgs.
+VNODES = 64
+DIRECTORY_QUERY = "SELECT org_id, shard, state FROM org_shards"
+
+
+class OrgMovingError(Exception):
+    """Raised for writes to an org that is being moved between shards; retry shortly."""
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+def parse_shard_overrides(spec: str) -> Dict[str, int]:
+    """
+    Parse pinned orgs from "org_a=2,org_b=1".
+    :raises ValueError: on a malformed entry
+    """
+    overrides: Dict[str, int] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        org_id, sep, shard = item.partition("=")
+        if not sep or not org_id.strip():
+            raise ValueError(f"Invalid shard override '{item}', expected org=shard.")
+        overrides[org_id.strip()] = int(shard)
+    return overrides
+
+
+class HashRing:
+    """
+    Consistent-hash ring over shards 0..shards-1. Adding shard n only moves
+    the orgs that land on its points (about 1/(n+1) of them).
+    """
+    def __init__(self, shards: int, vnodes: int = VNODES) -> None:
+        points = sorted((_point(f"shard-{shard}#{v}"), shard) for shard in range(shards) for v in range(vnodes))
+        self._points = [p for p, _ in points]
+        self._shards = [s for _, s in points]
+
+    def shard_for(self, key: str) -> int:
+        index = bisect.bisect(self._points, _point(key)) % len(self._points)
+        return self._shards[index]
+
+
+class ShardRouter:
+    """
+    Maps org_id to a shard and hands out connections from that shard's pools.
+    """
+    def __init__(
+        self,
+        pools: Sequence[ConnectionPool],
+        async_pools: Sequence[AsyncConnectionPool],
+        ring_size: int = settings.DB_SHARDS,
+        overrides: Optional[Dict[str, int]] = None,
+        directory_ttl: Optional[float] = settings.DB_SHARD_DIRECTORY_TTL
+    ) -> None:
+        """
+        Initialize the router.
+        :param pools: Sync pool per shard; shard 0 holds the org_shards directory
+        :param async_pools: Async pool per shard, same order
+        :param ring_size: Shards placed on the hash ring (the rest only take pinned or moved orgs)
+        :param overrides: Pinned orgs; defaults to DB_SHARD_OVERRIDES
+        :param directory_ttl: Seconds the directory is cached, or None to not use a directory
+        :raises ValueError: if the shard configuration is inconsistent
+        """
+        if len(pools) != len(async_pools) or not 1 <= ring_size <= len(pools):
+            raise ValueError(f"DB_SHARDS={ring_size} needs between 1 and {len(pools)} configured shards.")
+        self.pools = list(pools)
+        self.async_pools = list(async_pools)
+        self.ring_size = ring_size
+        self.ring = HashRing(ring_size)
+        self.overrides = dict(overrides) if overrides is not None else parse_shard_overrides(settings.DB_SHARD_OVERRIDES)
+        for org_id, shard in self.overrides.items():
+            self._check_shard(shard, f"override for {org_id}")
+        self.directory_ttl = directory_ttl
+        self._directory: Dict[str, Tuple[int, str]] = {}
+        self._loaded_at = float("-inf")
+        self._refreshing = False
+        self._lock = Lock()
+
+    def _check_shard(self, shard: int, what: str) -> None:
+        if not 0 <= shard < len(self.pools):
+            raise ValueError(f"Shard {shard} in {what} is not configured.")
+
+    def home_shard(self, org_id: str) -> int:
+        """
+        Shard of an org ignoring the directory (pin, else hash ring).
+        """
+        return self.overrides.get(org_id, self.ring.shard_for(org_id))
+
+    def lookup(self, org_id: str) -> Tuple[int, str]:
+        """
+        Current (shard, state) of an org from the cached directory; state is "active" or "moving".
+        """
+        entry = self._directory.get(org_id)
+        if entry is not None and 0 <= entry[0] < len(self.pools):
+            return entry
+        return self.home_shard(org_id), "active"
+
+    def shard_for(self, org_id: str, write: bool = False) -> int:
+        """
+        Shard holding an org's data.
+        :param write: Refuse while the org is being moved
+        :raises OrgMovingError: for writes during a move
+        """
+        shard, state = self.lookup(org_id)
+        if write and state == "moving":
+            raise OrgMovingError(f"Organization {org_id} is being moved between shards; retry shortly.")
+        return shard
+
+    def _directory_stale(self) -> bool:
+        if self.directory_ttl is None:
+            return False
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._loaded_at < self.directory_ttl:
+                return False
+            self._refreshing = True
+            return True
+
+    def _set_directory(self, rows: Optional[List[Tuple[str, int, str]]]) -> None:
+        with self._lock:
+            if rows is not None:
+                self._directory = {org_id: (shard, state) for org_id, shard, state in rows}
+            self._loaded_at = time.monotonic()
+            self._refreshing = False
+
+    def refresh(self) -> None:
+        """
+        Reload the directory from shard 0. On failure the previous directory is kept.
+        """
+        rows = None
+        try:
+            with self.pools[0].connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT to_regclass('org_shards') IS NOT NULL")
+                    if cur.fetchone()[0]:
+                        cur.execute(DIRECTORY_QUERY)
+                        rows = cur.fetchall()
+                    else:
+                        rows = []
+                conn.rollback()
+        except Exception as e:
+            logger.warning(f"ShardRouter: loading org_shards failed, keeping cached directory: {e}")
+        finally:
+            self._set_directory(rows)
+
+    async def refresh_async(self) -> None:
+        """
+        Non-blocking variant of refresh() for the async request path.
+        """
+        rows = None
+        try:
+            async with self.async_pools[0].connection() as conn:
+                with conn.cursor() as cur:
+                    await execute_async(cur, "SELECT to_regclass('org_shards') IS NOT NULL")
+                    if cur.fetchone()[0]:
+                        await execute_async(cur, DIRECTORY_QUERY)
+                        rows = cur.fetchall()
+                    else:
+                        rows = []
+        except Exception as e:
+            logger.warning(f"ShardRouter: loading org_shards failed, keeping cached directory: {e}")
+        finally:
+            self._set_directory(rows)
+
+    @contextmanager
+    def connection(self, org_id: str, write: bool = False) -> Iterator[Any]:
+        """
+        Pooled sync connection to the org's shard.
+        :raises OrgMovingError: for writes during a move
+        """
+        if self._directory_stale():
+            self.refresh()
+        with self.pools[self.shard_for(org_id, write)].connection() as conn:
+            yield conn
+
+    @asynccontextmanager
+    async def async_connection(self, org_id: str, write: bool = False) -> AsyncIterator[Any]:
+        """
+        Pooled non-blocking connection to the org's shard.
+        :raises OrgMovingError: for writes during a move
+        """
+        if self._directory_stale():
+            await self.refresh_async()
+        async with self.async_pools[self.shard_for(org_id, write)].connection() as conn:
+            yield conn
+
+    def open(self) -> None:
+        for pool in self.pools:
+            pool.open()
+
+    async def open_async(self) -> None:
+        for pool in self.async_pools:
+            await pool.open()
+
+    def close(self) -> None:
+        for pool in self.pools:
+            pool.close()
+
+    async def close_async(self) -> None:
+        for pool in self.async_pools:
+            await pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Directory size and per-shard pool stats.
+        """
+        return {
+            "shards": len(self.pools),
+            "ring_size": self.ring_size,
+            "pinned": len(self.overrides),
+            "directory_entries": len(self._directory),
+            "pools": [{"sync": p.stats(), "async": a.stats()} for p, a in zip(self.pools, self.async_pools)],
+        }
+
+
+def create_router() -> ShardRouter:
+    """
+    Build the router from settings: shard 0 reuses db_pool/async_db_pool, and
+    each DSN in DB_SHARD_DSNS gets its own pair of pools.
+    """
+    pools: List[ConnectionPool] = [db_pool]
+    async_pools: List[AsyncConnectionPool] = [async_db_pool]
+    for dsn in settings.DB_SHARD_DSNS:
+        pools.append(ConnectionPool(functools.partial(connect, dsn)))
+        async_pools.append(AsyncConnectionPool(
+            functools.partial(connect_async, dsn), max_size=settings.DB_ASYNC_POOL_MAX_SIZE
+        ))
+    return ShardRouter(pools, async_pools)
+
+# Singleton router for global use
+shard_router = create_router()
@@ -3,23 +3,131 @@
 Main entrypoint for HR Employee Search API microservice.
 Handles app setup, health check, CORS, and API router inclusion.
 """
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.apis.employee_api import router as employee_router
+from app.core.config import log_stats, logger
+from app.core.cursor import check_secret
+from app.core.db import PoolTimeout
+from app.core.sharding import OrgMovingError, shard_router
+from app.core.migrations import check_schema
+from app.core.metrics import MetricsMiddleware, Sample, metrics, stats_samples
+from app.core.rate_limit import rate_limiter
+from app.services.query_shapes import prepared_statements, shape_cache
+from app.services.search_cache import search_cache
+from app.services.single_flight import search_flights
+from app.services.count_cache import count_cache
+from app.services.memory_engine import memory_engine
+from app.services.tenant_service import TenantRegistryUnavailable, tenant_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Refuse a published CURSOR_SECRET, open every shard's connection pools and check its schema on startup, preload the
+    organizations registry and start loading MEMORY_ENGINE_ORGS in the background;
+    close the pools on shutdown.
+    A database that is down at startup is logged, not fatal; connections are retried on demand.
+    """
+    check_secret()
+    app.state.schema = {}
+    for shard, (pool, async_pool) in enumerate(zip(shard_router.pools, shard_router.async_pools)):
+        try:
+            pool.open()
+            await async_pool.open()
+            with pool.connection() as conn:
+                app.state.schema[shard] = check_schema(conn, shard)
+        except Exception as e:
+            logger.error(f"Database startup checks failed on shard {shard}: {e}")
+    shard_router.refresh()
+    tenant_service.refresh()
+    memory_engine.start()
+    yield
+    shard_router.close()
+    await shard_router.close_async()
+
 
 app = FastAPI(
     title="HR Employee Search API",
     description="Search API for HR employee directory.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 @app.get("/health", tags=["Health"])
-def health() -> dict:
+def health(request: Request) -> dict:
     """
     Health check endpoint for service monitoring.
-    Returns status OK if service is running.
+    Returns status OK if service is running, plus per-shard DB pool, search cache and coalescing,
+    query shape/prepared statement, tenant cache, memory engine and logging stats and the startup schema check of each shard.
+    """
+    return {
+        "status": "ok",
+        "shards": shard_router.stats(),
+        "search_cache": search_cache.stats(),
+        "search_coalescing": search_flights.stats(),
+        "query_shapes": {**shape_cache.stats(), "prepared": prepared_statements.stats()},
+        "tenants": tenant_service.stats(),
+        "memory_engine": memory_engine.stats(),
+        "logging": log_stats(),
+        "schema": getattr(request.app.state, "schema", None),
+    }
+
+def component_samples() -> List[Sample]:
+    """
+    Pool, cache and rate limiter gauges and counters, read from their stats() at scrape time.
+    """
+    samples: List[Sample] = []
+    for shard, (pool, async_pool) in enumerate(zip(shard_router.pools, shard_router.async_pools)):
+        samples += stats_samples("hr_db_pool", pool.stats(), {"shard": str(shard), "pool": "sync"})
+        samples += stats_samples("hr_db_pool", async_pool.stats(), {"shard": str(shard), "pool": "async"})
+    samples += stats_samples("hr_search_cache", search_cache.stats())
+    samples += stats_samples("hr_search_coalescing", search_flights.stats())
+    samples += stats_samples("hr_count_cache", count_cache.stats())
+    samples += stats_samples("hr_query_shapes", shape_cache.stats())
+    samples += stats_samples("hr_prepared_statements", prepared_statements.stats())
+    samples += stats_samples("hr_rate_limiter", rate_limiter.stats())
+    samples += stats_samples("hr_tenants", tenant_service.stats())
+    samples += stats_samples("hr_logging", log_stats())
+    samples += stats_samples("hr_memory_engine", memory_engine.stats())
+    return samples
+
+metrics.register_collector(component_samples)
+
+@app.get("/metrics", tags=["Health"])
+def prometheus_metrics() -> PlainTextResponse:
     """
-    return {"status": "ok"}
+    Prometheus metrics: per-stage and per-request latency histograms, request and
+    rate-limit rejection counters, and DB pool, cache and prepared statement stats.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout) -> JSONResponse:
+    """
+    Map DB pool exhaustion to 503 so clients can back off and retry.
+    """
+    return JSONResponse(status_code=503, content={"detail": "Database busy, retry later"})
+
+@app.exception_handler(OrgMovingError)
+async def org_moving_handler(request: Request, exc: OrgMovingError) -> JSONResponse:
+    """
+    Writes are paused while an org moves between shards; ask clients to retry.
+    """
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+@app.exception_handler(TenantRegistryUnavailable)
+async def tenant_registry_handler(request: Request, exc: TenantRegistryUnavailable) -> JSONResponse:
+    """
+    An org id that is not cached could not be checked; known tenants are unaffected.
+    """
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+app.add_middleware(MetricsMiddleware)
 
 # Enable CORS for all origins (customize for production)
 app.add_middleware(
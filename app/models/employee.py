@@ -58,5 +58,6 @@ class Employee:
         }
         data.update(self.extra)
         if columns:
-            return {k: v for k, v in data.items() if k in columns}
+            keys = frozenset(columns)
+            return {k: v for k, v in data.items() if k in keys}
         return data
@@ -1,16 +1,28 @@
-
 """
 Organization model for multi-tenancy in HR Employee Search API.
 Represents an organization/tenant.
 """
-from typing import Any
+from typing import Any, Dict, Optional
 
 class Organization:
-    def __init__(self, org_id: str, name: str) -> None:
+    def __init__(
+        self,
+        org_id: str,
+        name: str,
+        rate_limit: Optional[int] = None,
+        columns: Optional[Dict[str, Any]] = None,
+        shard: Optional[int] = None
+    ) -> None:
         """
         Initialize an organization.
         :param org_id: Organization ID
         :param name: Organization name
+        :param rate_limit: Requests per minute, or None for RATE_LIMIT / RATE_LIMIT_OVERRIDES
+        :param columns: {"allowed": ..., "default": ...} as in the column config file, or None to use the file
+        :param shard: Shard from the org_shards directory, or None when on its home shard
         """
         self.org_id = org_id
         self.name = name
+        self.rate_limit = rate_limit
+        self.columns = columns
+        self.shard = shard
@@ -4,7 +4,7 @@ Pydantic schema for employee API output.
 Supports extra fields for dynamic columns.
 """
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from app.models.employee import EmployeeStatus
 
 class EmployeeOut(BaseModel):
@@ -19,3 +19,11 @@ class EmployeeOut(BaseModel):
     # Extra fields allowed for dynamic columns
     class Config:
         extra = "allow"
+
+class EmployeeImportResponse(BaseModel):
+    inserted: int
+    failed: int
+    batches: int
+    errors: List[Dict[str, Any]]  # {"row": 1-based row number, "error": reason}; first 1000 only
+    elapsed_seconds: float
+    rows_per_sec: float
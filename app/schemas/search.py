@@ -1,11 +1,12 @@
 
 """
 Pydantic schemas for employee search API request and response.
-Supports filtering and dynamic output columns.
+Supports filtering (exact, prefix, contains, fuzzy, full-text) and dynamic output columns.
 """
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from app.models.employee import EmployeeStatus
+from app.services.employee_search import CountMode, FacetField, MatchMode
 
 class EmployeeSearchRequest(BaseModel):
     firstname: Optional[str]
@@ -16,7 +17,52 @@ class EmployeeSearchRequest(BaseModel):
     location: Optional[str]
     status: Optional[EmployeeStatus]
     columns: Optional[List[str]]  # dynamic output columns
+    match: Optional[Dict[str, MatchMode]] = None  # per-field match mode, e.g. {"lastname": "prefix"}
+    q: Optional[str] = None  # full-text over name, position and department (words prefix-matched)
 
 class EmployeeSearchResponse(BaseModel):
     results: List[Dict[str, Any]]
-    total: int
+    total: Optional[int]  # None when count=none
+    next_cursor: Optional[str] = None  # pass as `cursor` to fetch the next page
+
+class EmployeeSearchColumnarResponse(BaseModel):
+    # format=columnar: column names once, one array per row in the same order
+    columns: List[str]
+    rows: List[List[Any]]
+    total: Optional[int]
+    next_cursor: Optional[str] = None
+
+class EmployeeBatchSearchItem(EmployeeSearchRequest):
+    # Same as the /search query parameters, per sub-search
+    page: int = 1
+    page_size: int = 20
+    sort_by: str = "id"
+    sort_order: str = "asc"
+    cursor: Optional[str] = None
+    count: CountMode = CountMode.EXACT
+
+class EmployeeBatchSearchRequest(BaseModel):
+    searches: List[EmployeeBatchSearchItem]
+
+class EmployeeBatchSearchResult(BaseModel):
+    results: Optional[List[Dict[str, Any]]] = None  # None when the sub-search failed
+    columns: Optional[List[str]] = None  # format=columnar instead of results
+    rows: Optional[List[List[Any]]] = None
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+    error: Optional[str] = None
+
+class EmployeeBatchSearchResponse(BaseModel):
+    results: List[EmployeeBatchSearchResult]  # same order as the request's searches
+
+class EmployeeFacetRequest(EmployeeSearchRequest):
+    columns: Optional[List[str]] = None  # not used by facets
+    facets: Optional[List[FacetField]] = None  # fields to count; default all
+
+class FacetCount(BaseModel):
+    value: Optional[str]  # None counts employees without a value
+    count: int
+
+class EmployeeFacetResponse(BaseModel):
+    total: int  # employees matching the filters
+    facets: Dict[str, List[FacetCount]]  # most frequent values first, up to `limit` per field
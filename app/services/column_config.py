@@ -0,0 +1,252 @@
+
+"""
+Per-organization output column configuration.
+Loads COLUMN_CONFIG_PATH (JSON: org_id -> {"allowed": [...] or "*", "default": [...]},
+with "*" as the fallback for unlisted orgs), compiles every org's default
+columns into a ProjectionPlan, and compiles requested column lists on first
+use. The file is re-read when it changes, without a restart; an invalid file
+is logged and the previous configuration kept. Entries from the organizations
+registry (see tenant_service) take precedence over the file's.
+"""
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+from app.core.config import logger, settings
+
+# Physical columns of the employees table; any other requested column is a key in `extra`.
+EMPLOYEE_COLUMNS = ("id", "org_id", "firstname", "lastname", "contact", "department", "position", "location", "status", "extra")
+# Dotted paths of plain identifiers (e.g. "badge", "address.city"); anything else is rejected.
+EXTRA_KEY_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+# Sort key and output column ranking full-text and fuzzy matches.
+RELEVANCE = "relevance"
+# Prefix of columns the search SQL adds to result rows (the embedded count "__total", the
+# change feed's "__version", "__op" and "__id"); names starting with it are never output
+# columns, so they cannot overwrite them.
+RESERVED_PREFIX = "__"
+
+
+class ProjectionPlan(NamedTuple):
+    """Compiled output columns: SELECT list and params for `columns`, and their key set."""
+    columns: Tuple[str, ...]
+    keys: FrozenSet[str]
+    select: str  # excludes "relevance", which depends on the query
+    params: Tuple[Any, ...]
+
+
+class OrgColumns(NamedTuple):
+    allowed: Optional[FrozenSet[str]]  # None: any valid column
+    default: ProjectionPlan
+
+
+def is_valid_column(col: str) -> bool:
+    if col.startswith(RESERVED_PREFIX):
+        return False
+    return col in EMPLOYEE_COLUMNS or col == RELEVANCE or bool(EXTRA_KEY_PATTERN.match(col) and len(col) <= 63)
+
+
+def compile_projection(columns: Sequence[str], allowed: Optional[FrozenSet[str]] = None) -> ProjectionPlan:
+    """
+    Compile output columns into a whitelisted SELECT list. Table columns are
+    selected by name; other keys become JSONB paths into `extra` (missing keys
+    come back as null). Duplicates, invalid names and columns outside `allowed`
+    are dropped.
+    """
+    names: List[str] = []
+    exprs: List[str] = []
+    params: List[Any] = []
+    for col in columns:
+        if col in names:
+            continue
+        if not is_valid_column(col):
+            logger.warning(f"columns: Ignoring invalid column '{col}'.")
+            continue
+        if allowed is not None and col not in allowed and col != RELEVANCE:
+            logger.warning(f"columns: Ignoring column '{col}' not allowed for this organization.")
+            continue
+        names.append(col)
+        if col in EMPLOYEE_COLUMNS:
+            exprs.append(col)
+        elif col != RELEVANCE:
+            exprs.append(f'extra #> %s AS "{col}"')
+            params.append(col.split("."))
+    return ProjectionPlan(tuple(names), frozenset(names), ", ".join(exprs), tuple(params))
+
+
+def _compile_org(entry: Dict[str, Any], fallback: Optional[Dict[str, Any]]) -> OrgColumns:
+    entry = {**(fallback or {}), **entry}
+    allowed_spec = entry.get("allowed", "*")
+    default = entry.get("default") or EMPLOYEE_COLUMNS
+    if allowed_spec != "*" and not isinstance(allowed_spec, list):
+        raise ValueError('"allowed" must be "*" or a list of columns')
+    if not isinstance(default, (list, tuple)):
+        raise ValueError('"default" must be a list of columns')
+    reserved = sorted({col for col in (*default, *(allowed_spec if allowed_spec != "*" else ()))
+                       if isinstance(col, str) and col.startswith(RESERVED_PREFIX)})
+    if reserved:
+        raise ValueError(f"columns starting with {RESERVED_PREFIX!r} are reserved: {', '.join(reserved)}")
+    allowed = None if allowed_spec == "*" else frozenset(allowed_spec)
+    return OrgColumns(allowed, compile_projection(default, allowed))
+
+
+class _Compiled(NamedTuple):
+    orgs: Dict[str, OrgColumns]
+    fallback: OrgColumns
+    version: int
+
+
+class ColumnConfig:
+    def __init__(
+        self,
+        path: str = settings.COLUMN_CONFIG_PATH,
+        reload_interval: float = settings.COLUMN_CONFIG_RELOAD_INTERVAL,
+        max_plans: int = 4096
+    ) -> None:
+        """
+        Initialize the column config; the file is loaded on first use.
+        :param path: JSON file; relative paths are resolved from the project root
+        :param reload_interval: Minimum seconds between checks of the file's mtime
+        :param max_plans: Compiled plans for requested column lists kept (LRU)
+        """
+        self.path = Path(path) if os.path.isabs(path) else Path(__file__).resolve().parents[2] / path
+        self.reload_interval = reload_interval
+        self.max_plans = max_plans
+        self._config = _Compiled({}, _compile_org({}, None), 0)
+        self._mtime: Optional[float] = None
+        self._checked = float("-inf")
+        self._plans: "OrderedDict[Tuple[int, str, Tuple[str, ...]], ProjectionPlan]" = OrderedDict()
+        self._fallback_entry: Dict[str, Any] = {}
+        # Registry entries: raw (recompiled when the file's "*" changes) and compiled
+        self._registry_entries: Dict[str, Dict[str, Any]] = {}
+        self._registry: Dict[str, OrgColumns] = {}
+        self._lock = Lock()
+        self.reloads = 0
+
+    @property
+    def version(self) -> int:
+        """Incremented on every successful (re)load."""
+        self._maybe_reload()
+        return self._config.version
+
+    def projection(self, org_id: str, columns: Optional[Sequence[str]] = None) -> ProjectionPlan:
+        """
+        Projection for a request: the org's precompiled default when `columns` is empty,
+        else the requested columns restricted to the org's allowed set (compiled once).
+        """
+        self._maybe_reload()
+        config = self._config
+        registry = self._registry
+        org = registry.get(org_id) or config.orgs.get(org_id, config.fallback)
+        if not columns:
+            return org.default
+        key = (config.version, org_id if org_id in config.orgs or org_id in registry else "*", tuple(columns))
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+        plan = compile_projection(columns, org.allowed)
+        with self._lock:
+            self._plans[key] = plan
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan
+
+    def allows(self, org_id: str, column: str) -> bool:
+        """
+        Whether the org may see a column (and so sort or facet by it). id always is,
+        as the pagination key.
+        """
+        self._maybe_reload()
+        config = self._config
+        org = self._registry.get(org_id) or config.orgs.get(org_id, config.fallback)
+        return column == "id" or org.allowed is None or column in org.allowed
+
+    def set_orgs(self, entries: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        """
+        Apply column configuration from the organizations registry.
+        :param entries: org_id -> {"allowed", "default"} (unlisted keys from the file's "*"), or None to use the file again
+        """
+        registry = dict(self._registry)
+        raw = dict(self._registry_entries)
+        for org_id, entry in entries.items():
+            registry.pop(org_id, None)
+            raw.pop(org_id, None)
+            if entry is None:
+                continue
+            try:
+                if not isinstance(entry, dict):
+                    raise ValueError("expected {allowed, default}")
+                registry[org_id] = _compile_org(entry, self._fallback_entry)
+                raw[org_id] = entry
+            except (ValueError, TypeError) as e:
+                logger.error(f"Invalid column config for organization {org_id} in the registry, using the file: {e}")
+        with self._lock:
+            self._registry_entries = raw
+            self._registry = registry
+            self._config = self._config._replace(version=self._config.version + 1)
+            self._plans.clear()
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        with self._lock:
+            if now - self._checked < self.reload_interval:
+                return
+            self._checked = now
+        try:
+            mtime = self.path.stat().st_mtime
+        except OSError:
+            if self._mtime is not None or self._config.version == 0:
+                logger.warning(f"Column config {self.path} not found; allowing all columns.")
+                self._mtime = None
+                self._config = _Compiled({}, _compile_org({}, None), self._config.version + 1)
+            return
+        if mtime != self._mtime:
+            self.reload(mtime)
+
+    def reload(self, mtime: Optional[float] = None) -> bool:
+        """
+        Load and compile the file now.
+        :return: True if the new configuration was applied
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+            if not isinstance(raw, dict) or not all(isinstance(v, dict) for v in raw.values()):
+                raise ValueError("expected an object of org_id -> {allowed, default}")
+            fallback_entry = raw.get("*", {})
+            fallback = _compile_org(fallback_entry, None)
+            orgs = {org_id: _compile_org(entry, fallback_entry) for org_id, entry in raw.items() if org_id != "*"}
+            registry = {org_id: _compile_org(entry, fallback_entry) for org_id, entry in self._registry_entries.items()}
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Invalid column config {self.path}, keeping previous: {e}")
+            self._mtime = mtime
+            return False
+        with self._lock:
+            self._config = _Compiled(orgs, fallback, self._config.version + 1)
+            self._fallback_entry = fallback_entry
+            self._registry = registry
+            self._plans.clear()
+            self._mtime = mtime if mtime is not None else self.path.stat().st_mtime
+            self.reloads += 1
+        logger.info(f"Loaded column config for {len(orgs)} organizations from {self.path}")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "version": self._config.version,
+            "orgs": len(self._config.orgs),
+            "registry_orgs": len(self._registry),
+            "compiled_plans": len(self._plans),
+            "reloads": self.reloads,
+        }
+
+# Singleton instance for global use
+column_config = ColumnConfig()
@@ -0,0 +1,84 @@
+
+"""
+In-process cache of exact search totals per (organization, filter set).
+Used by the `cached` count mode; entries expire after a TTL and are dropped
+for an organization whenever employees are written through the service. Each
+organization has a generation counter that writes bump, so a total counted
+while a write happened is never stored.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional, Set, Tuple
+from app.core.config import settings
+
+
+class CountCache:
+    def __init__(self, ttl: float = settings.COUNT_CACHE_TTL, max_entries: int = settings.COUNT_CACHE_MAX_ENTRIES) -> None:
+        """
+        Initialize the count cache.
+        :param ttl: Seconds a cached total stays valid (bounds staleness from other writers)
+        :param max_entries: Entries kept before least recently used ones are evicted
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[int, float]]" = OrderedDict()  # LRU across orgs
+        self._keys: Dict[str, Set[str]] = {}  # org_id -> its cached filter fingerprints
+        self._generations: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def get(self, org_id: str, filters_key: str) -> Tuple[Optional[int], int]:
+        """
+        Look up the cached total for an org and filter fingerprint.
+        :return: (total, or None if missing or expired; org generation to pass back to set())
+        """
+        key = (org_id, filters_key)
+        with self._lock:
+            generation = self._generations.get(org_id, 0)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, generation
+            total, expires = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None, generation
+            self._entries.move_to_end(key)
+            return total, generation
+
+    def set(self, org_id: str, filters_key: str, total: int, generation: int) -> None:
+        """
+        Cache an exact total counted at `generation`; dropped if the org was written to meanwhile.
+        """
+        key = (org_id, filters_key)
+        with self._lock:
+            if generation != self._generations.get(org_id, 0):
+                return
+            self._entries[key] = (total, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._keys.setdefault(org_id, set()).add(filters_key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, org_id: str) -> None:
+        """
+        Drop every cached total of an organization and bump its generation (call after writes).
+        """
+        with self._lock:
+            self._generations[org_id] = self._generations.get(org_id, 0) + 1
+            for filters_key in self._keys.pop(org_id, ()):
+                del self._entries[(org_id, filters_key)]
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        del self._entries[key]
+        org_id, filters_key = key
+        keys = self._keys[org_id]
+        keys.discard(filters_key)
+        if not keys:
+            del self._keys[org_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries}
+
+# Singleton instance for global use
+count_cache = CountCache()
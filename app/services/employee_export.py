@@ -0,0 +1,63 @@
+
+"""
+Encoders for streamed employee exports (NDJSON and CSV).
+Each batch of rows is encoded into one chunk, so exports are written with
+constant memory regardless of how many employees match.
+"""
+import csv
+import io
+import json
+from enum import Enum
+from typing import Any, Dict, List
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+class ExportEncoder:
+    def __init__(self, fmt: ExportFormat, columns: List[str]) -> None:
+        """
+        Initialize the encoder.
+        :param fmt: Output format
+        :param columns: Output columns, in order (CSV header and field order)
+        """
+        self.format = ExportFormat(fmt)
+        self.columns = columns
+
+    def header(self) -> bytes:
+        """
+        Bytes written before any row (the CSV header line; nothing for NDJSON).
+        """
+        if self.format == ExportFormat.CSV:
+            return self._csv([self.columns])
+        return b""
+
+    def encode(self, rows: List[Dict[str, Any]]) -> bytes:
+        """
+        Encode one batch of rows.
+        """
+        if self.format == ExportFormat.CSV:
+            return self._csv([[_csv_value(row.get(col)) for col in self.columns] for row in rows])
+        return "".join(json.dumps(row, default=str) + "\n" for row in rows).encode("utf-8")
+
+    @staticmethod
+    def _csv(lines: List[List[Any]]) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerows(lines)
+        return buf.getvalue().encode("utf-8")
@@ -0,0 +1,111 @@
+
+"""
+Streaming parsers for bulk employee imports (NDJSON and CSV).
+Records are parsed incrementally from the request body, so an import file is
+never held in memory. Parse and validation errors are reported per row.
+"""
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, NamedTuple, Optional
+from app.models.employee import Employee, EmployeeStatus
+
+# Employee fields accepted on import; any other key is stored in `extra`.
+IMPORT_FIELDS = ("firstname", "lastname", "contact", "department", "position", "location", "status")
+REQUIRED_FIELDS = ("firstname", "lastname", "status")
+
+
+class ImportRecord(NamedTuple):
+    """One parsed input record: its 1-based row number and data, or the parse error."""
+    row: int
+    data: Optional[Dict[str, Any]]
+    error: Optional[str] = None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split a byte stream into text lines without buffering more than one partial line.
+    """
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8", errors="replace").rstrip("\r")
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[ImportRecord]:
+    """
+    Parse newline-delimited JSON objects. Blank lines are skipped but still counted.
+    """
+    row = 0
+    async for line in iter_lines(chunks):
+        row += 1
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield ImportRecord(row, None, f"Invalid JSON: {e}")
+            continue
+        if not isinstance(data, dict):
+            yield ImportRecord(row, None, "Expected a JSON object.")
+            continue
+        yield ImportRecord(row, data)
+
+
+async def iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[ImportRecord]:
+    """
+    Parse CSV with a header row. Quoted fields may span lines; rows are numbered
+    by record (the header is not counted). Empty cells are treated as missing.
+    """
+    header = None
+    row = 0
+    record = ""
+    async for line in iter_lines(chunks):
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue  # inside a quoted field that continues on the next line
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield ImportRecord(row, None, f"Expected {len(header)} fields, got {len(values)}.")
+            continue
+        yield ImportRecord(row, {k: v for k, v in zip(header, values) if v != ""})
+    if record:
+        yield ImportRecord(row + 1, None, "Unterminated quoted field.")
+
+
+def employee_from_record(org_id: str, data: Dict[str, Any]) -> Employee:
+    """
+    Build an Employee for the importing organization from a parsed record.
+    :param org_id: Organization from the request header; records cannot target another org
+    :param data: Parsed record
+    :return: Employee
+    :raises ValueError: if the record is invalid
+    """
+    if data.get("org_id") not in (None, org_id):
+        raise ValueError("org_id does not match the importing organization.")
+    missing = [f for f in REQUIRED_FIELDS if not data.get(f)]
+    if missing:
+        raise ValueError(f"Missing required field(s): {', '.join(missing)}.")
+    try:
+        status = EmployeeStatus(data["status"])
+    except ValueError:
+        raise ValueError(f"Invalid status '{data['status']}'.")
+    extra = data.get("extra") or {}
+    if not isinstance(extra, dict):
+        raise ValueError("extra must be an object.")
+    extra = dict(extra)
+    for k, v in data.items():
+        if k not in IMPORT_FIELDS and k not in ("id", "org_id", "extra"):
+            extra[k] = v
+    fields = {f: (None if data.get(f) is None else str(data[f])) for f in IMPORT_FIELDS if f != "status"}
+    return Employee(id=None, org_id=org_id, status=status, extra=extra, **fields)
@@ -1,12 +1,174 @@
 """
 Employee search service: all DB logic for employee search, add, pagination, and sorting.
+Supports offset (page) and keyset (cursor) pagination.
 Uses DB connection as dependency, not singleton. Handles edge cases and logs actions.
 """
+import io
+import json
+import re
+import time
+from enum import Enum
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import Json, RealDictCursor
 from app.core.config import settings, logger
+from app.core.cursor import ChangeToken, Cursor, InvalidCursorError, decode_cursor, encode_cursor, filters_fingerprint
+from app.core.db import execute_async
+from app.core.metrics import slow_query_log, stage
+from app.core.migrations import SEARCH_DOCUMENT, TEXT_MATCH_COLUMNS
 from app.models.employee import Employee, EmployeeStatus
-from typing import List, Dict, Any, Optional, Tuple
+from app.services.count_cache import count_cache
+from app.services.memory_engine import memory_engine
+from app.services.search_cache import search_cache
+from app.services.column_config import RELEVANCE, ProjectionPlan, column_config
+from app.services.query_shapes import CompiledShape, PreparedSQL, compile_prepared, prepared_statements, shape_cache
+from typing import AsyncIterator, Iterable, Iterator, List, Dict, Any, NamedTuple, Optional, Tuple
+
+# Columns written on insert (id is generated by the database).
+INSERT_COLUMNS = ("org_id", "firstname", "lastname", "contact", "department", "position", "location", "status", "extra")
+# Columns searches and exports can sort by (besides relevance), if the org may see them.
+SORT_COLUMNS = ("id", "firstname", "lastname", "department", "position", "location", "status")
+# Words of a full-text query; each is prefix-matched so partial input works for typeahead.
+TSQUERY_WORD = re.compile(r"[^\W_]+")
+# Name of the server-side cursor used by exports.
+EXPORT_CURSOR = "employee_export"
+# Name of the server-side cursor used by change feed reads.
+CHANGES_CURSOR = "employee_changes"
+# Change ops recorded by the employees_record_changes trigger, as reported by the feed.
+CHANGE_OPS = {"I": "inserted", "U": "updated", "D": "deleted"}
+# Per-search and per-row info logs; rate-capped by default (LOG_RATE_LIMITS).
+search_logger = logger.getChild("search")
+write_logger = logger.getChild("writes")
+# Values returned per facet field by default and at most.
+FACET_DEFAULT_LIMIT = 10
+FACET_MAX_LIMIT = 100
+
+
+class MatchMode(str, Enum):
+    """How a filter value is matched; non-exact modes apply to TEXT_MATCH_COLUMNS only."""
+    EXACT = "exact"        # col = value
+    PREFIX = "prefix"      # case-insensitive starts-with (btree text_pattern_ops)
+    CONTAINS = "contains"  # case-insensitive substring (trigram GIN)
+    FUZZY = "fuzzy"        # trigram similarity above pg_trgm.similarity_threshold
+
+
+class CountMode(str, Enum):
+    """How the total number of matches is computed."""
+    EXACT = "exact"          # COUNT(*) in the same statement as the page
+    ESTIMATED = "estimated"  # planner row estimate, no scan
+    NONE = "none"            # no total (infinite scroll)
+    CACHED = "cached"        # exact, reused per (org, filters) until TTL or a write
+
+
+class FacetField(str, Enum):
+    """Columns whose value counts can be requested for a filter set."""
+    DEPARTMENT = "department"
+    LOCATION = "location"
+    POSITION = "position"
+    STATUS = "status"
+
+
+class SearchPlan(NamedTuple):
+    """Validated search arguments and the SQL built from them."""
+    query: str
+    params: List[Any]
+    count_query: Optional[str]  # run after the page query when it did not yield the total
+    count_params: List[Any]
+    page: int
+    page_size: int
+    sort_by: str
+    sort_order: str
+    filters_key: str
+    hidden: Tuple[str, ...] = ()  # selected for pagination only, dropped from results
+    count_mode: CountMode = CountMode.EXACT
+    embeds_count: bool = False  # page rows carry the total as __total
+    total: Optional[int] = None  # known before querying (cached hit)
+    prepared: Optional[PreparedSQL] = None  # server-side statements for query and count_query
+    count_prepared: Optional[PreparedSQL] = None
+    # The search itself, for executors other than SQL (see memory_engine)
+    filters: Tuple[Tuple[str, MatchMode, Any], ...] = ()  # (column, match mode, value) per set filter
+    columns: Tuple[str, ...] = ()  # selected columns, hidden keys last
+    ranked: bool = False  # fuzzy or full-text: needs Postgres similarity/ts_rank
+    after: Optional[Cursor] = None
+    offset: int = 0
+    count_generation: int = 0  # count_cache generation when the plan was built; a write since then discards the total
+
+
+class SearchResult(NamedTuple):
+    """
+    One page of search results as tuple rows under a shared column header;
+    next_cursor is None on the last page. Rows are kept as the driver returned
+    them (no per-row dicts), see app.services.response_encoder for the output.
+    """
+    columns: Tuple[str, ...]
+    rows: List[Tuple[Any, ...]]
+    total: Optional[int]  # None when count_mode is none
+    next_cursor: Optional[str] = None
+    failed: bool = False  # the query errored; empty results must not be cached
+
+    @property
+    def results(self) -> List[Dict[str, Any]]:
+        """Rows as dicts keyed by column, for callers that need them."""
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+
+class FacetResult(NamedTuple):
+    """Top (value, count) pairs per facet field, most frequent first, and the number of matches."""
+    facets: Dict[str, List[Tuple[Any, int]]]
+    total: int
+    failed: bool = False  # the query errored; must not be cached
+
+
+class ChangePosition:
+    """
+    Where a change feed read stands. Starts at the client's token and is advanced
+    by each batch, so the token to resume from is always (epoch, version).
+    `reset` is set when the token is from another epoch of the org's history and
+    the read restarted from the beginning.
+    """
+    def __init__(self, token: Optional[ChangeToken] = None) -> None:
+        self.epoch = token.epoch if token else ""
+        self.version = token.version if token else 0
+        self.reset = False
+        self.has_more = False
+
+    @property
+    def token(self) -> ChangeToken:
+        return ChangeToken(self.epoch, self.version)
+
+
+class BulkInsertResult:
+    """
+    Running totals of a bulk insert: rows inserted, per-row errors and throughput.
+    Only the first `max_errors` error messages are kept; `failed` counts all of them.
+    """
+    def __init__(self, max_errors: int = 1000) -> None:
+        self.inserted = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.max_errors = max_errors
+        self.started = time.monotonic()
+
+    def add_error(self, row: int, error: str) -> None:
+        """
+        Record a rejected row.
+        :param row: 1-based position of the row in the input
+        :param error: Reason it was rejected
+        """
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": error})
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.inserted / elapsed, 1) if elapsed > 0 else 0.0,
+        }
 
 
 class EmployeeSearchService:
@@ -30,6 +192,7 @@ class EmployeeSearchService:
                 cur.execute('''
                     INSERT INTO employees (org_id, firstname, lastname, contact, department, position, location, status, extra)
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
                 ''', (
                     employee.org_id,
                     employee.firstname,
@@ -39,15 +202,126 @@ class EmployeeSearchService:
                     employee.position,
                     employee.location,
                     employee.status.value,
-                    employee.extra
+                    Json(employee.extra)
                 ))
+                employee_id = cur.fetchone()[0]
                 self.conn.commit()
-                logger.info(f"Employee {employee.firstname} {employee.lastname} added to DB (org: {employee.org_id})")
+                memory_engine.add(employee.org_id, (employee_id,) + self._insert_values(employee, employee.extra)[1:])
+                self.invalidate_caches(employee.org_id, memory=False)
+                write_logger.info("Employee %s %s added to DB (org: %s)", employee.firstname, employee.lastname, employee.org_id)
         except Exception as e:
             logger.error(f"Failed to add employee: {e}")
             self.conn.rollback()
             raise
 
+    def add_employees(self, employees: Iterable[Employee], batch_size: int = settings.IMPORT_BATCH_SIZE) -> BulkInsertResult:
+        """
+        Bulk-insert employees with COPY, one transaction per batch of `batch_size` rows.
+        Rows the database rejects are reported per row; the rest of their batch is kept.
+        :param employees: Any iterable of Employee objects; consumed lazily
+        :return: BulkInsertResult with counts, errors and rows/sec
+        """
+        result = BulkInsertResult()
+        batch: List[Tuple[int, Employee]] = []
+        for row_number, employee in enumerate(employees, start=1):
+            if not isinstance(employee, Employee):
+                result.add_error(row_number, "Invalid employee object.")
+                continue
+            batch.append((row_number, employee))
+            if len(batch) >= batch_size:
+                self.insert_batch(batch, result)
+                batch = []
+        if batch:
+            self.insert_batch(batch, result)
+        logger.info(f"Bulk insert finished: {result.inserted} inserted, {result.failed} failed")
+        return result
+
+    def insert_batch(self, batch: List[Tuple[int, Employee]], result: BulkInsertResult) -> None:
+        """
+        Insert one batch in a single transaction using COPY.
+        If COPY fails, the batch is retried row by row under savepoints so that
+        only the offending rows are rejected and reported.
+        :param batch: (row number, employee) pairs
+        :param result: Accumulator updated with inserted rows and errors
+        """
+        if not batch:
+            return
+        copy_sql = f"COPY employees ({', '.join(INSERT_COLUMNS)}) FROM STDIN"
+        buf = io.StringIO()
+        for _, employee in batch:
+            values = self._insert_values(employee, json.dumps(employee.extra))
+            buf.write("\t".join(self._copy_field(v) for v in values) + "\n")
+        buf.seek(0)
+        orgs = {employee.org_id for _, employee in batch}
+        try:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(copy_sql, buf)
+            self.conn.commit()
+            result.inserted += len(batch)
+        except Exception as e:
+            self.conn.rollback()
+            logger.warning(f"insert_batch: COPY failed ({e}), retrying {len(batch)} rows individually")
+            self._insert_rows(batch, result)
+        result.batches += 1
+        for org_id in orgs:
+            self.invalidate_caches(org_id)
+
+    @staticmethod
+    def invalidate_caches(org_id: str, memory: bool = True) -> None:
+        """
+        Drop cached totals and result pages of an organization. Every write path must call this after commit.
+        :param memory: Also reload the org in the in-process engine; False when the write was written through to it
+        """
+        count_cache.invalidate(org_id)
+        search_cache.invalidate(org_id)
+        if memory:
+            memory_engine.invalidate(org_id)
+
+    def _insert_rows(self, batch: List[Tuple[int, Employee]], result: BulkInsertResult) -> None:
+        insert_sql = f"INSERT INTO employees ({', '.join(INSERT_COLUMNS)}) VALUES ({', '.join(['%s'] * len(INSERT_COLUMNS))})"
+        inserted, errors = 0, []
+        try:
+            with self.conn.cursor() as cur:
+                for row_number, employee in batch:
+                    cur.execute("SAVEPOINT bulk_row")
+                    try:
+                        cur.execute(insert_sql, self._insert_values(employee, Json(employee.extra)))
+                        cur.execute("RELEASE SAVEPOINT bulk_row")
+                        inserted += 1
+                    except (psycopg2.Error, ValueError) as e:
+                        cur.execute("ROLLBACK TO SAVEPOINT bulk_row")
+                        errors.append((row_number, str(e).strip()))
+            self.conn.commit()
+            result.inserted += inserted
+            for row_number, error in errors:
+                result.add_error(row_number, error)
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    @staticmethod
+    def _copy_field(value: Any) -> str:
+        """
+        Encode a value for COPY text format (NULL as \\N, control characters escaped).
+        """
+        if value is None:
+            return "\\N"
+        return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+    @staticmethod
+    def _insert_values(employee: Employee, extra: Any) -> Tuple[Any, ...]:
+        return (
+            employee.org_id,
+            employee.firstname,
+            employee.lastname,
+            employee.contact,
+            employee.department,
+            employee.position,
+            employee.location,
+            employee.status.value,
+            extra,
+        )
+
     def search(
         self,
         org_id: str,
@@ -56,59 +330,810 @@ class EmployeeSearchService:
         page: int = 1,
         page_size: int = 20,
         sort_by: str = "id",
-        sort_order: str = "asc"
-    ) -> Tuple[List[Dict[str, Any]], int]:
+        sort_order: str = "asc",
+        cursor: Optional[str] = None,
+        count_mode: CountMode = CountMode.EXACT,
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None
+    ) -> SearchResult:
         """
         Search employees with filters, pagination, and sorting.
-        Returns results and total count. Handles SQL errors and logs actions.
+        Pass the previous page's next_cursor as `cursor` for keyset pagination;
+        `page` is then ignored and the cursor's sort is used.
+        `count_mode` selects how the total is computed (see CountMode).
+        `match_modes` maps filter names to a MatchMode (default exact); `text_query`
+        is a full-text search over name, position and department. Both can be
+        ranked with sort_by="relevance".
+        Returns results, total count and next cursor. Handles SQL errors and logs actions.
+        :raises InvalidCursorError: if the cursor is forged or issued for another org or query
+        :raises ValueError: if a match mode is not supported for its field
+        """
+        plan = self._build_search(
+            org_id, filters, columns, page, page_size, sort_by, sort_order, cursor, count_mode, match_modes, text_query
+        )
+        if plan is None:
+            return SearchResult((), [], 0)
+        result = self._search_memory(org_id, plan)
+        if result is not None:
+            return result
+        try:
+            with self.conn.cursor() as cur:
+                with stage("page_query") as timer:
+                    prepared_statements.execute(cur, plan.query, plan.params, plan.prepared)
+                    rows = cur.fetchall()
+                names = [d[0] for d in cur.description]
+                if slow_query_log.should_explain(plan.prepared.name, timer.elapsed):
+                    cur.execute("EXPLAIN " + plan.query, plan.params)
+                    slow_query_log.log(plan.prepared.name, org_id, timer.elapsed, plan.query, [r[0] for r in cur.fetchall()])
+                total = self._embedded_total(plan, names, rows)
+                if total is None and plan.count_query:
+                    with stage("count_query"):
+                        prepared_statements.execute(cur, plan.count_query, plan.count_params, plan.count_prepared)
+                        total = self._read_count(plan, cur.fetchone())
+            with stage("rows"):
+                return self._to_results(org_id, plan, names, rows, total)
+        except Exception as e:
+            logger.error(f"Failed to search employees: {e}")
+            return SearchResult((), [], 0, failed=True)
+
+    def facets(
+        self,
+        org_id: str,
+        filters: Dict[str, Any],
+        fields: Optional[List[FacetField]] = None,
+        limit: int = FACET_DEFAULT_LIMIT,
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None
+    ) -> FacetResult:
+        """
+        Count employees per value of several fields under the same filters and
+        tenant scoping as search(), in a single scan (GROUPING SETS), keeping the
+        `limit` most frequent values per field.
+        :param fields: Facet fields (default all)
+        :raises ValueError: if a field or match mode is not supported
+        """
+        plan = self._build_facets(org_id, filters, fields, limit, match_modes, text_query)
+        if plan is None:
+            return FacetResult({}, 0)
+        shape, params, names = plan
+        try:
+            with self.conn.cursor() as cur:
+                with stage("facet_query"):
+                    prepared_statements.execute(cur, shape.query, params, shape.prepared)
+                    rows = cur.fetchall()
+            return self._to_facets(names, rows)
+        except Exception as e:
+            logger.error(f"Failed to count facets: {e}")
+            return FacetResult({}, 0, failed=True)
+
+    @staticmethod
+    def _build_facets(
+        org_id: str,
+        filters: Dict[str, Any],
+        fields: Optional[List[FacetField]],
+        limit: int,
+        match_modes: Optional[Dict[str, MatchMode]],
+        text_query: Optional[str]
+    ) -> Optional[Tuple[CompiledShape, List[Any], Tuple[str, ...]]]:
+        """
+        Validate facet arguments and build the query; its SQL is cached per shape like searches.
+        Every grouping set is ranked by count (ties by value) and cut at `limit`;
+        the empty grouping set yields the total.
+        :return: (shape, params, facet columns), or None if org_id is invalid
+        :raises ValueError: if a field or match mode is not supported, or a field is not allowed for the org
+        """
+        if not org_id or not isinstance(org_id, str):
+            logger.error("facets: Invalid org_id.")
+            return None
+        if limit < 1 or limit > FACET_MAX_LIMIT:
+            logger.warning(f"facets: Invalid limit {limit}, defaulting to {FACET_DEFAULT_LIMIT}.")
+            limit = FACET_DEFAULT_LIMIT
+        names = tuple(dict.fromkeys(FacetField(f).value for f in fields)) if fields else tuple(f.value for f in FacetField)
+        hidden = [name for name in names if not column_config.allows(org_id, name)]
+        if hidden and fields:
+            raise ValueError(f"Facet field '{hidden[0]}' is not allowed for this organization.")
+        names = tuple(name for name in names if name not in hidden)
+        if not names:
+            raise ValueError("No facet fields are allowed for this organization.")
+        match_modes = {k: MatchMode(m) for k, m in (match_modes or {}).items()}
+        active, words = EmployeeSearchService._where_shape(filters, match_modes, text_query)
+        where_params, _ = EmployeeSearchService._where_params(org_id, filters, active, words)
+        key = ("facets", names, active, bool(words))
+        shape = shape_cache.get(key)
+        if shape is None:
+            where, _ = EmployeeSearchService._where_sql(active, bool(words))
+            cols = ", ".join(names)
+            sets = ", ".join(f"({name})" for name in names)
+            query = (
+                f"SELECT {cols}, g, n FROM (SELECT {cols}, GROUPING({cols}) AS g, COUNT(*) AS n, "
+                f"row_number() OVER (PARTITION BY GROUPING({cols}) ORDER BY COUNT(*) DESC, COALESCE({cols})) AS rk "
+                f"FROM employees{where} GROUP BY GROUPING SETS ({sets}, ())) AS facets WHERE rk <= %s ORDER BY g, rk"
+            )
+            shape = CompiledShape(query, None, (), ("where", "limit"), compile_prepared(query), None)
+            shape_cache.set(key, shape)
+        return shape, where_params + [limit], names
+
+    @staticmethod
+    def _to_facets(names: Tuple[str, ...], rows: List[Tuple[Any, ...]]) -> FacetResult:
+        """
+        Split the grouping set rows by field. GROUPING() has a 0 bit for the
+        field a row is grouped by (first field = highest bit) and is all ones for the total.
+        """
+        width = len(names)
+        everything = (1 << width) - 1
+        facets: Dict[str, List[Tuple[Any, int]]] = {name: [] for name in names}
+        total = 0
+        for row in rows:
+            grouping, count = row[width], row[width + 1]
+            if grouping == everything:
+                total = count
+            else:
+                index = width - (everything ^ grouping).bit_length()
+                facets[names[index]].append((row[index], count))
+        return FacetResult(facets, total)
+
+    def export(
+        self,
+        org_id: str,
+        filters: Dict[str, Any],
+        columns: Optional[List[str]] = None,
+        sort_by: str = "id",
+        sort_order: str = "asc",
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None,
+        fetch_size: int = settings.EXPORT_FETCH_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every matching employee through a named server-side cursor, fetching
+        `fetch_size` rows per round trip, so memory stays constant for any org size.
+        Same filters, columns and tenant scoping as search(); no pagination or total.
+        :raises ValueError: if org_id is invalid or a match mode is not supported
+        """
+        query, params, hidden = self._build_export(
+            org_id, filters, columns, sort_by, sort_order, match_modes, text_query
+        )
+        try:
+            with self.conn.cursor(name=EXPORT_CURSOR, cursor_factory=RealDictCursor) as cur:
+                cur.itersize = fetch_size
+                cur.execute(query, params)
+                for row in cur:
+                    yield self._strip_hidden(row, hidden)
+        finally:
+            self.conn.rollback()
+
+    @staticmethod
+    def _build_export(
+        org_id: str,
+        filters: Dict[str, Any],
+        columns: Optional[List[str]],
+        sort_by: str,
+        sort_order: str,
+        match_modes: Optional[Dict[str, MatchMode]],
+        text_query: Optional[str]
+    ) -> Tuple[str, List[Any], Tuple[str, ...]]:
+        """
+        Build the unpaginated export query, validated like a search.
+        :return: (query, params, hidden keys to drop from rows)
+        :raises ValueError: if org_id is invalid or a match mode is not supported
+        """
+        if not org_id or not isinstance(org_id, str):
+            raise ValueError("Invalid org_id.")
+        match_modes = {k: MatchMode(m) for k, m in (match_modes or {}).items()}
+        where, where_params, relevance = EmployeeSearchService._where_clause(org_id, filters, match_modes, text_query)
+        allowed_sort = {c for c in SORT_COLUMNS if column_config.allows(org_id, c)}
+        if relevance[0]:
+            allowed_sort.add(RELEVANCE)
+        if sort_by not in allowed_sort:
+            logger.warning(f"export: Invalid sort_by '{sort_by}', defaulting to 'id'.")
+            sort_by = "id"
+        sort_order = "desc" if sort_order.lower() == "desc" or sort_by == RELEVANCE else "asc"
+        projection = column_config.projection(org_id, columns)
+        select, select_params, hidden = EmployeeSearchService._select_list(projection, sort_by, relevance)
+        query = f"SELECT {select} FROM employees" + where + f" ORDER BY {sort_by} {sort_order}"
+        if sort_by != "id":
+            query += f", id {sort_order}"
+        return query, select_params + where_params, hidden
+
+    @staticmethod
+    def _build_changes(org_id: str, since: int, columns: Optional[List[str]], limit: int) -> Tuple[str, List[Any]]:
+        """
+        Build the query for an org's changes after version `since`, oldest first:
+        at most limit + 1 rows (the extra one only tells whether more remain).
+        Each row has the change's version, op and employee id, then the employee's
+        current values of the projected columns (NULL for deletions); projected
+        names cannot start with "__" (see column_config), so they never shadow the first three.
+        :raises ValueError: if org_id is invalid
+        """
+        if not org_id or not isinstance(org_id, str):
+            raise ValueError("Invalid org_id.")
+        projection = column_config.projection(org_id, columns)
+        query = (
+            "SELECT v.version AS __version, v.op AS __op, v.employee_id AS __id, e.* FROM employee_versions v"
+            f" LEFT JOIN LATERAL (SELECT {projection.select} FROM employees WHERE id = v.employee_id AND org_id = v.org_id) e"
+            " ON v.op <> 'D'"
+            " WHERE v.org_id = %s AND v.version > %s ORDER BY v.version LIMIT %s"
+        )
+        return query, list(projection.params) + [org_id, since, limit + 1]
+
+    @staticmethod
+    def _to_change(row: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        One change feed entry: {"op", "id", "row"}, with row None for deletions.
+        """
+        data = dict(row)
+        del data["__version"]
+        op = CHANGE_OPS[data.pop("__op")]
+        employee_id = data.pop("__id")
+        return {"op": op, "id": employee_id, "row": None if op == "deleted" else data}
+
+    @staticmethod
+    def _strip_hidden(row: Dict[str, Any], hidden: Tuple[str, ...]) -> Dict[str, Any]:
+        data = dict(row)
+        for k in hidden:
+            del data[k]
+        return data
+
+    @staticmethod
+    def _build_search(
+        org_id: str,
+        filters: Dict[str, Any],
+        columns: Optional[List[str]],
+        page: int,
+        page_size: int,
+        sort_by: str,
+        sort_order: str,
+        cursor: Optional[str] = None,
+        count_mode: CountMode = CountMode.EXACT,
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None
+    ) -> Optional[SearchPlan]:
+        """
+        Validate search arguments and build the page and count queries.
+        Only the requested columns the org may see are selected (see column_config).
+        One row beyond page_size is fetched to detect whether a next page exists.
+        Exact totals are computed by an uncorrelated COUNT subquery in the page
+        query itself, so the common case costs one round trip; the separate
+        count query is only run for empty pages and planner estimates.
+        The SQL depends only on the search's shape (see query_shapes): it is
+        generated on the first search of a shape and reused after that, so a
+        repeated shape only collects its parameter values.
+        :return: SearchPlan, or None if org_id is invalid
+        :raises InvalidCursorError: if the cursor does not verify or does not match the filters
+        :raises ValueError: if a match mode is not supported for its field
         """
         if not org_id or not isinstance(org_id, str):
             logger.error("search: Invalid org_id.")
-            return [], 0
+            return None
         if page < 1:
             logger.warning(f"search: Invalid page {page}, defaulting to 1.")
             page = 1
         if page_size < 1 or page_size > 100:
             logger.warning(f"search: Invalid page_size {page_size}, defaulting to 20.")
             page_size = 20
-        query = "SELECT * FROM employees WHERE org_id = %s"
-        params = [org_id]
-        for k, v in filters.items():
-            if v is not None:
-                query += f" AND {k} = %s"
-                params.append(v.value if isinstance(v, EmployeeStatus) else v)
-        # Sorting
-        allowed_sort = {"id", "firstname", "lastname", "department", "position", "location", "status"}
+        match_modes = {k: MatchMode(m) for k, m in (match_modes or {}).items()}
+        active, words = EmployeeSearchService._where_shape(filters, match_modes, text_query)
+        where_params, rank_params = EmployeeSearchService._where_params(org_id, filters, active, words)
+        ranked = bool(words) or MatchMode.FUZZY in (mode for _, mode in active)
+        # Sorting: only by columns the org may see, since the sort value is written into the cursor
+        allowed_sort = {c for c in SORT_COLUMNS if column_config.allows(org_id, c)}
+        if ranked:
+            allowed_sort.add(RELEVANCE)
         if sort_by not in allowed_sort:
             logger.warning(f"search: Invalid sort_by '{sort_by}', defaulting to 'id'.")
             sort_by = "id"
-        sort_order = "desc" if sort_order.lower() == "desc" else "asc"
-        query += f" ORDER BY {sort_by} {sort_order}"
-        # Pagination
+        sort_order = "desc" if sort_order.lower() == "desc" or sort_by == RELEVANCE else "asc"
+        filters_key = filters_fingerprint({
+            **filters,
+            "__match": sorted((k, m.value) for k, m in match_modes.items() if m != MatchMode.EXACT and filters.get(k) is not None),
+            "__q": text_query or None,
+        })
+        # Pagination: keyset after the cursor row, else offset by page
+        after: Optional[Cursor] = None
         offset = (page - 1) * page_size
+        if cursor:
+            after = decode_cursor(org_id, cursor)
+            if after.sort_by not in allowed_sort or after.filters_key != filters_key:
+                raise InvalidCursorError("Cursor does not match this search.")
+            sort_by, sort_order, offset = after.sort_by, after.sort_order, 0
+        projection = column_config.projection(org_id, columns)
+        # Total count
+        count_mode = CountMode(count_mode)
+        total, count_generation = count_cache.get(org_id, filters_key) if count_mode == CountMode.CACHED else (None, 0)
+        embeds_count = count_mode == CountMode.EXACT or (count_mode == CountMode.CACHED and total is None)
+        estimated = not embeds_count and count_mode == CountMode.ESTIMATED
+        key = (
+            projection.columns, active, bool(words), sort_by, sort_order,
+            None if after is None else after.value is None, embeds_count, estimated
+        )
+        shape = shape_cache.get(key)
+        if shape is None:
+            shape = EmployeeSearchService._compile_shape(projection, active, bool(words), sort_by, sort_order, after, embeds_count, estimated)
+            shape_cache.set(key, shape)
+        groups = {
+            "projection": projection.params,
+            "rank": rank_params,
+            "where": where_params,
+            "keyset": EmployeeSearchService._keyset_params(after, rank_params) if after else (),
+        }
+        params = [p for group in shape.layout for p in groups[group]] + [page_size + 1, offset]
+        selected = tuple(c for c in projection.columns if c != RELEVANCE or ranked) + tuple(h for h in shape.hidden if h != "__total")
+        return SearchPlan(
+            shape.query, params, shape.count_query, where_params, page, page_size, sort_by, sort_order, filters_key,
+            shape.hidden, count_mode, embeds_count, total, shape.prepared, shape.count_prepared,
+            tuple((k, mode, getattr(filters[k], "value", filters[k])) for k, mode in active), selected, ranked, after, offset,
+            count_generation
+        )
+
+    @staticmethod
+    def _compile_shape(
+        projection: ProjectionPlan,
+        active: Tuple[Tuple[str, MatchMode], ...],
+        has_words: bool,
+        sort_by: str,
+        sort_order: str,
+        after: Optional[Cursor],
+        embeds_count: bool,
+        estimated: bool
+    ) -> CompiledShape:
+        """
+        Generate the page and count SQL for a search shape, and the order of the
+        parameter groups they take (see _build_search).
+        """
+        where, relevance_sql = EmployeeSearchService._where_sql(active, has_words)
+        relevance = (relevance_sql, [])
+        select, _, hidden = EmployeeSearchService._select_list(projection, sort_by, relevance)
+        layout = ["projection"] + (["rank"] if EmployeeSearchService._selects_rank(projection, hidden, relevance_sql) else [])
+        count_query: Optional[str] = None
+        if embeds_count:
+            count_query = "SELECT COUNT(*) FROM employees" + where
+            select += f", ({count_query}) AS __total"
+            layout.append("where")
+            hidden += ("__total",)
+        elif estimated:
+            count_query = "EXPLAIN (FORMAT JSON) SELECT 1 FROM employees" + where
+        query = f"SELECT {select} FROM employees" + where
+        layout.append("where")
+        if after is not None:
+            query += EmployeeSearchService._keyset_clause(after, relevance)[0]
+            layout.append("keyset")
+        query += f" ORDER BY {sort_by} {sort_order}"
+        if sort_by != "id":
+            query += f", id {sort_order}"
         query += " LIMIT %s OFFSET %s"
-        params.extend([page_size, offset])
+        count_prepared = compile_prepared(count_query) if count_query and not estimated else None
+        return CompiledShape(query, count_query, hidden, tuple(layout), compile_prepared(query), count_prepared)
+
+    @staticmethod
+    def _where_clause(
+        org_id: str,
+        filters: Dict[str, Any],
+        match_modes: Dict[str, MatchMode],
+        text_query: Optional[str]
+    ) -> Tuple[str, List[Any], Tuple[str, List[Any]]]:
+        """
+        Compile filters into index-backed predicates, scoped to the org.
+        exact -> `=`, prefix -> lower(col) LIKE 'v%', contains -> ILIKE '%v%',
+        fuzzy -> trigram `%`; text_query words are prefix-matched against SEARCH_DOCUMENT.
+        :return: (WHERE SQL, params, (relevance SQL or "", relevance params))
+        :raises ValueError: if a match mode is not supported for its field
+        """
+        active, words = EmployeeSearchService._where_shape(filters, match_modes, text_query)
+        where, relevance = EmployeeSearchService._where_sql(active, bool(words))
+        params, rank_params = EmployeeSearchService._where_params(org_id, filters, active, words)
+        return where, params, (relevance, rank_params)
+
+    @staticmethod
+    def _where_shape(
+        filters: Dict[str, Any],
+        match_modes: Dict[str, MatchMode],
+        text_query: Optional[str]
+    ) -> Tuple[Tuple[Tuple[str, MatchMode], ...], List[str]]:
+        """
+        Validate match modes and reduce filters to their shape.
+        :return: ((filter, match mode) for each set filter, full-text words)
+        :raises ValueError: if a match mode is not supported for its field
+        """
+        for k, mode in match_modes.items():
+            if k not in filters:
+                raise ValueError(f"Unknown filter '{k}' in match modes.")
+            if mode != MatchMode.EXACT and k not in TEXT_MATCH_COLUMNS:
+                raise ValueError(f"Match mode '{mode.value}' is not supported for '{k}'.")
+        active = tuple((k, match_modes.get(k, MatchMode.EXACT)) for k, v in filters.items() if v is not None)
+        words = TSQUERY_WORD.findall(text_query.lower()) if text_query else []
+        return active, words
+
+    @staticmethod
+    def _where_sql(active: Tuple[Tuple[str, MatchMode], ...], has_words: bool) -> Tuple[str, str]:
+        """
+        :return: (WHERE SQL, relevance SQL or "") for a filter shape
+        """
+        where = " WHERE org_id = %s"
+        rank_sql: List[str] = []
+        for k, mode in active:
+            if mode == MatchMode.PREFIX:
+                where += f" AND lower({k}) LIKE %s"
+            elif mode == MatchMode.CONTAINS:
+                where += f" AND {k} ILIKE %s"
+            elif mode == MatchMode.FUZZY:
+                where += f" AND {k} %% %s"
+                rank_sql.append(f"similarity({k}, %s)")
+            else:
+                where += f" AND {k} = %s"
+        if has_words:
+            where += f" AND {SEARCH_DOCUMENT} @@ to_tsquery('simple', %s)"
+            rank_sql.append(f"ts_rank({SEARCH_DOCUMENT}, to_tsquery('simple', %s))")
+        # float8 so the rank round-trips exactly through keyset cursors
+        relevance = f"({' + '.join(rank_sql)})::float8" if rank_sql else ""
+        return where, relevance
+
+    @staticmethod
+    def _where_params(
+        org_id: str,
+        filters: Dict[str, Any],
+        active: Tuple[Tuple[str, MatchMode], ...],
+        words: List[str]
+    ) -> Tuple[List[Any], List[Any]]:
+        """
+        :return: (WHERE params, relevance params), in the order _where_sql consumes them
+        """
+        params: List[Any] = [org_id]
+        rank_params: List[Any] = []
+        for k, mode in active:
+            v = filters[k]
+            value = v.value if isinstance(v, EmployeeStatus) else v
+            if mode == MatchMode.PREFIX:
+                params.append(EmployeeSearchService._like_escape(value.lower()) + "%")
+            elif mode == MatchMode.CONTAINS:
+                params.append("%" + EmployeeSearchService._like_escape(value) + "%")
+            elif mode == MatchMode.FUZZY:
+                params.append(value)
+                rank_params.append(value)
+            else:
+                params.append(value)
+        if words:
+            tsquery = " & ".join(f"{w}:*" for w in words)
+            params.append(tsquery)
+            rank_params.append(tsquery)
+        return params, rank_params
+
+    @staticmethod
+    def search_memory(
+        org_id: str,
+        filters: Dict[str, Any],
+        columns: Optional[List[str]] = None,
+        page: int = 1,
+        page_size: int = 20,
+        sort_by: str = "id",
+        sort_order: str = "asc",
+        cursor: Optional[str] = None,
+        count_mode: CountMode = CountMode.EXACT,
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None
+    ) -> Optional[SearchResult]:
+        """
+        Serve a search from the in-process engine without a database connection.
+        Same arguments and errors as search().
+        :return: SearchResult, or None if the org is not loaded there or the search needs Postgres
+        """
+        if not memory_engine.enabled or memory_engine.store(org_id) is None:
+            return None
+        plan = EmployeeSearchService._build_search(
+            org_id, filters, columns, page, page_size, sort_by, sort_order, cursor, count_mode, match_modes, text_query
+        )
+        return EmployeeSearchService._search_memory(org_id, plan) if plan is not None else None
+
+    @staticmethod
+    def _search_memory(org_id: str, plan: SearchPlan) -> Optional[SearchResult]:
+        """
+        Serve the search from the in-process engine when the org is loaded there
+        and the search is not ranked; None means it runs on Postgres.
+        """
+        if not memory_engine.enabled or plan.ranked:
+            return None
+        with stage("memory_query"):
+            page = memory_engine.search(
+                org_id, plan.filters, plan.columns, plan.sort_by, plan.sort_order, plan.after, plan.offset, plan.page_size + 1
+            )
+            if page is None:
+                return None
+            names, rows, total = page
+            return EmployeeSearchService._to_results(
+                org_id, plan, names, rows, None if plan.count_mode == CountMode.NONE else total
+            )
+
+    @staticmethod
+    def _like_escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    @staticmethod
+    def _select_list(
+        projection: ProjectionPlan,
+        sort_by: str,
+        relevance: Tuple[str, List[Any]] = ("", [])
+    ) -> Tuple[str, List[Any], Tuple[str, ...]]:
+        """
+        Extend a compiled projection (see column_config) for one query: "relevance"
+        selects the match rank when the search has one, and id and the sort key are
+        always selected for cursor pagination and reported as hidden when they were
+        not requested.
+        :return: (select SQL, params for JSONB paths and rank, hidden keys)
+        """
+        hidden = tuple(k for k in dict.fromkeys(("id", sort_by)) if k not in projection.keys)
+        exprs = [projection.select] if projection.select else []
+        params = list(projection.params)
+        if EmployeeSearchService._selects_rank(projection, hidden, relevance[0]):
+            exprs.append(f"{relevance[0]} AS {RELEVANCE}")
+            params.extend(relevance[1])
+        exprs.extend(col for col in hidden if col != RELEVANCE)
+        return ", ".join(exprs), params, hidden
+
+    @staticmethod
+    def _selects_rank(projection: ProjectionPlan, hidden: Tuple[str, ...], relevance_sql: str) -> bool:
+        return bool(relevance_sql) and (RELEVANCE in projection.keys or RELEVANCE in hidden)
+
+    @staticmethod
+    def _keyset_clause(after: Cursor, relevance: Tuple[str, List[Any]] = ("", [])) -> Tuple[str, List[Any]]:
+        """
+        WHERE clause selecting rows strictly after the cursor row in (sort_by, id) order.
+        Postgres sorts NULLs last ascending and first descending, so NULL sort values
+        are handled explicitly; non-NULL positions use an index-friendly row comparison.
+        """
+        col, op = after.sort_by, "<" if after.sort_order == "desc" else ">"
+        params = EmployeeSearchService._keyset_params(after, relevance[1])
+        if col == "id":
+            return f" AND id {op} %s", params
+        if col == RELEVANCE:
+            return f" AND ({relevance[0]}, id) {op} (%s, %s)", params
+        if after.value is None:
+            if after.sort_order == "asc":
+                return f" AND {col} IS NULL AND id > %s", params
+            return f" AND ({col} IS NOT NULL OR id < %s)", params
+        clause = f"({col}, id) {op} (%s, %s)"
+        if after.sort_order == "asc":
+            clause = f"({clause} OR {col} IS NULL)"
+        return f" AND {clause}", params
+
+    @staticmethod
+    def _keyset_params(after: Cursor, rank_params: List[Any]) -> List[Any]:
+        """
+        Params of _keyset_clause, in order.
+        """
+        if after.sort_by == RELEVANCE:
+            return rank_params + [after.value, after.id]
+        if after.sort_by == "id" or after.value is None:
+            return [after.id]
+        return [after.value, after.id]
+
+    @staticmethod
+    def _embedded_total(plan: SearchPlan, names: List[str], rows: List[Tuple[Any, ...]]) -> Optional[int]:
+        """
+        Total carried by the page rows, or the total known up front.
+        None means the plan's count query still has to run.
+        """
+        if plan.embeds_count:
+            return rows[0][names.index("__total")] if rows else None
+        return plan.total
+
+    @staticmethod
+    def _read_count(plan: SearchPlan, row: Tuple[Any, ...]) -> int:
+        """
+        Extract the total from the count query row (COUNT or EXPLAIN estimate).
+        """
+        if plan.count_mode == CountMode.ESTIMATED:
+            return int(row[0][0]["Plan"]["Plan Rows"])
+        return row[0]
+
+    @staticmethod
+    def _to_results(
+        org_id: str,
+        plan: SearchPlan,
+        names: List[str],
+        rows: List[Tuple[Any, ...]],
+        total: Optional[int]
+    ) -> SearchResult:
+        """
+        Drop hidden pagination keys from the projected rows and issue the next-page cursor.
+        Hidden keys are selected after the requested columns, so dropping them is a
+        tuple slice per row. Freshly computed totals are stored for the cached count mode.
+        """
+        if plan.count_mode == CountMode.CACHED and plan.total is None and total is not None:
+            count_cache.set(org_id, plan.filters_key, total, plan.count_generation)
+        next_cursor = None
+        if len(rows) > plan.page_size:
+            rows = rows[:plan.page_size]
+            last = rows[-1]
+            next_cursor = encode_cursor(org_id, Cursor(
+                plan.sort_by, plan.sort_order, last[names.index(plan.sort_by)], last[names.index("id")], plan.filters_key
+            ))
+        keep = [i for i, name in enumerate(names) if name not in plan.hidden]
+        if len(keep) < len(names):
+            if keep == list(range(len(keep))):
+                rows = [row[:len(keep)] for row in rows]
+            else:
+                rows = [tuple(row[i] for i in keep) for row in rows]
+        search_logger.info(
+            "Search returned %d results for org %s, page %d, page_size %d, sort_by %s %s",
+            len(rows), org_id, plan.page, plan.page_size, plan.sort_by, plan.sort_order
+        )
+        return SearchResult(tuple(names[i] for i in keep), rows, total, next_cursor)
+
+
+class AsyncEmployeeSearchService(EmployeeSearchService):
+    """
+    Non-blocking variant of EmployeeSearchService for the async request path.
+    Uses a non-blocking (async_=1) connection from the async pool; query building
+    is shared with the sync service, which stays available for scripts and tests.
+    """
+    async def search(
+        self,
+        org_id: str,
+        filters: Dict[str, Any],
+        columns: Optional[List[str]] = None,
+        page: int = 1,
+        page_size: int = 20,
+        sort_by: str = "id",
+        sort_order: str = "asc",
+        cursor: Optional[str] = None,
+        count_mode: CountMode = CountMode.EXACT,
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None
+    ) -> SearchResult:
+        """
+        Search employees without blocking the event loop.
+        Same arguments and result as EmployeeSearchService.search.
+        """
+        plan = self._build_search(
+            org_id, filters, columns, page, page_size, sort_by, sort_order, cursor, count_mode, match_modes, text_query
+        )
+        if plan is None:
+            return SearchResult((), [], 0)
+        result = self._search_memory(org_id, plan)
+        if result is not None:
+            return result
         try:
-            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, params)
-                rows = cur.fetchall()
-                # Get total count
-                count_query = "SELECT COUNT(*) FROM employees WHERE org_id = %s"
-                count_params = [org_id]
-                for k, v in filters.items():
-                    if v is not None:
-                        count_query += f" AND {k} = %s"
-                        count_params.append(v.value if isinstance(v, EmployeeStatus) else v)
-                cur.execute(count_query, count_params)
-                total = cur.fetchone()["count"]
-            results = []
-            for row in rows:
-                data = dict(row)
-                if columns:
-                    data = {k: v for k, v in data.items() if k in columns}
-                results.append(data)
-            logger.info(f"Search returned {len(results)} results for org {org_id}, page {page}, page_size {page_size}, sort_by {sort_by} {sort_order}")
-            return results, total
+            with self.conn.cursor() as cur:
+                with stage("page_query") as timer:
+                    await prepared_statements.execute_async(cur, plan.query, plan.params, plan.prepared)
+                    rows = cur.fetchall()
+                names = [d[0] for d in cur.description]
+                if slow_query_log.should_explain(plan.prepared.name, timer.elapsed):
+                    await execute_async(cur, "EXPLAIN " + plan.query, plan.params)
+                    slow_query_log.log(plan.prepared.name, org_id, timer.elapsed, plan.query, [r[0] for r in cur.fetchall()])
+                total = self._embedded_total(plan, names, rows)
+                if total is None and plan.count_query:
+                    with stage("count_query"):
+                        await prepared_statements.execute_async(cur, plan.count_query, plan.count_params, plan.count_prepared)
+                        total = self._read_count(plan, cur.fetchone())
+            with stage("rows"):
+                return self._to_results(org_id, plan, names, rows, total)
         except Exception as e:
             logger.error(f"Failed to search employees: {e}")
-            return [], 0
+            return SearchResult((), [], 0, failed=True)
+
+    async def facets(
+        self,
+        org_id: str,
+        filters: Dict[str, Any],
+        fields: Optional[List[FacetField]] = None,
+        limit: int = FACET_DEFAULT_LIMIT,
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None
+    ) -> FacetResult:
+        """
+        Facet counts without blocking the event loop.
+        Same arguments and result as EmployeeSearchService.facets.
+        """
+        plan = self._build_facets(org_id, filters, fields, limit, match_modes, text_query)
+        if plan is None:
+            return FacetResult({}, 0)
+        shape, params, names = plan
+        try:
+            with self.conn.cursor() as cur:
+                with stage("facet_query"):
+                    await prepared_statements.execute_async(cur, shape.query, params, shape.prepared)
+                    rows = cur.fetchall()
+            return self._to_facets(names, rows)
+        except Exception as e:
+            logger.error(f"Failed to count facets: {e}")
+            return FacetResult({}, 0, failed=True)
+
+    async def export_batches(
+        self,
+        org_id: str,
+        filters: Dict[str, Any],
+        columns: Optional[List[str]] = None,
+        sort_by: str = "id",
+        sort_order: str = "asc",
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None,
+        fetch_size: int = settings.EXPORT_FETCH_SIZE
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream every matching employee in batches of up to `fetch_size` rows.
+        Non-blocking connections cannot use named cursors, so this declares one in
+        SQL and FETCHes the next batch only when the consumer asks for it; a slow
+        client therefore slows the query down instead of buffering rows.
+        If the consumer stops early (e.g. the client disconnected) or the query fails,
+        the running statement is cancelled and the connection closed so the pool
+        discards it rather than reusing an open transaction.
+        :raises ValueError: if org_id is invalid or a match mode is not supported
+        """
+        query, params, hidden = self._build_export(
+            org_id, filters, columns, sort_by, sort_order, match_modes, text_query
+        )
+        finished = False
+        try:
+            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+                await execute_async(cur, "BEGIN READ ONLY")
+                await execute_async(cur, f"DECLARE {EXPORT_CURSOR} NO SCROLL CURSOR FOR {query}", params)
+                while True:
+                    await execute_async(cur, f"FETCH FORWARD %s FROM {EXPORT_CURSOR}", (fetch_size,))
+                    rows = cur.fetchall()
+                    if rows:
+                        yield [self._strip_hidden(row, hidden) for row in rows]
+                    if len(rows) < fetch_size:
+                        break
+                await execute_async(cur, "COMMIT")
+                finished = True
+        finally:
+            if not finished:
+                if self.conn.isexecuting():
+                    try:
+                        self.conn.cancel()
+                    except Exception as e:
+                        logger.warning(f"export: cancelling query failed: {e}")
+                self.conn.close()
+
+    async def change_batches(
+        self,
+        org_id: str,
+        position: ChangePosition,
+        columns: Optional[List[str]] = None,
+        limit: int = settings.CHANGES_PAGE_SIZE,
+        fetch_size: int = settings.EXPORT_FETCH_SIZE
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream up to `limit` changes of the org after `position`, in batches of up
+        to `fetch_size`, advancing `position` past each batch as it is yielded.
+        Versions of an org become visible in order (writers serialize on the org's
+        counter row), so no change can later appear below a version already served.
+        A position from another epoch (the org's history restarted, e.g. it moved
+        shards) restarts from version 0 and sets position.reset.
+        Cursor handling and cleanup on early exit are as in export_batches.
+        :raises ValueError: if org_id is invalid
+        """
+        finished = False
+        try:
+            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+                await execute_async(cur, "BEGIN READ ONLY")
+                await execute_async(cur, "SELECT epoch FROM org_change_versions WHERE org_id = %s", (org_id,))
+                head = cur.fetchone()
+                epoch = head["epoch"] if head else ""
+                if epoch != position.epoch:
+                    position.reset = position.version > 0 or bool(position.epoch)
+                    position.epoch, position.version = epoch, 0
+                query, params = self._build_changes(org_id, position.version, columns, limit)
+                await execute_async(cur, f"DECLARE {CHANGES_CURSOR} NO SCROLL CURSOR FOR {query}", params)
+                served = 0
+                while True:
+                    await execute_async(cur, f"FETCH FORWARD %s FROM {CHANGES_CURSOR}", (fetch_size,))
+                    rows = cur.fetchall()
+                    if served + len(rows) > limit:
+                        position.has_more = True
+                        rows = rows[:limit - served]
+                    if rows:
+                        served += len(rows)
+                        position.version = rows[-1]["__version"]
+                        yield [self._to_change(row) for row in rows]
+                    if position.has_more or len(rows) < fetch_size:
+                        break
+                await execute_async(cur, "COMMIT")
+                finished = True
+        finally:
+            if not finished:
+                if self.conn.isexecuting():
+                    try:
+                        self.conn.cancel()
+                    except Exception as e:
+                        logger.warning(f"changes: cancelling query failed: {e}")
+                self.conn.close()
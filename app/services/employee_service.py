@@ -9,11 +9,24 @@ Employee service for business logic related to employee search and management.
 Uses EmployeeSearchService for DB logic, supports pagination and sorting.
 """
 
-from app.core.config import logger
+import asyncio
+import json
+from app.core.config import logger, settings
+from app.core.cursor import decode_change_token, encode_change_token
 from app.models.employee import Employee
-from app.services.employee_search import EmployeeSearchService
-from app.core.db import get_db_conn
-from typing import List, Dict, Any, Optional, Tuple
+from app.services.employee_search import (
+    EmployeeSearchService, AsyncEmployeeSearchService, BulkInsertResult, ChangePosition, CountMode, FACET_DEFAULT_LIMIT,
+    FacetField, FacetResult, MatchMode, SearchResult, write_logger
+)
+from app.services.employee_import import ImportRecord, employee_from_record
+from app.services.employee_export import ExportEncoder, ExportFormat
+from app.services.search_cache import search_cache
+from app.services.single_flight import search_flights
+from app.services.column_config import column_config
+from app.core.db import PoolTimeout, get_db_conn
+from app.core.metrics import stage
+from app.core.sharding import shard_router
+from typing import AsyncIterator, Iterable, List, Dict, Any, Optional, Sequence, Tuple, Union
 
 
 class EmployeeService:
@@ -27,23 +40,347 @@ class EmployeeService:
         page_size: int = 20,
         sort_by: str = "id",
         sort_order: str = "asc",
-        db_conn=None
-    ) -> Tuple[List[Dict[str, Any]], int]:
+        db_conn=None,
+        cursor: Optional[str] = None,
+        count_mode: CountMode = CountMode.EXACT,
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None
+    ) -> SearchResult:
         """
         Search employees for an organization with filters, pagination, and sorting.
-        :return: Tuple of results and total count
+        :param cursor: next_cursor from a previous page, for keyset pagination
+        :param count_mode: How the total is computed (exact, estimated, none, cached)
+        :param match_modes: Per-filter MatchMode (exact, prefix, contains, fuzzy)
+        :param text_query: Full-text query over name, position and department
+        :return: SearchResult of results, total count and next cursor
+        Pages are served from search_cache when possible; treat the results as read-only.
+        Without db_conn the query runs on the org's shard.
         """
-        service = EmployeeSearchService(db_conn)
-        results, total = service.search(org_id, filters, columns, page, page_size, sort_by, sort_order)
-        return results, total
+        key = EmployeeService._cache_key(
+            filters, columns, page, page_size, sort_by, sort_order, cursor, count_mode, match_modes, text_query
+        )
+        with stage("cache"):
+            cached, generation = search_cache.get(org_id, key)
+        if cached is not None:
+            return cached
+        args = (org_id, filters, columns, page, page_size, sort_by, sort_order, cursor, count_mode, match_modes, text_query)
+        # Orgs loaded in the in-process engine are served without a connection
+        result = EmployeeSearchService.search_memory(*args)
+        if result is None:
+            if db_conn is None:
+                with shard_router.connection(org_id) as conn:
+                    result = EmployeeSearchService(conn).search(*args)
+            else:
+                result = EmployeeSearchService(db_conn).search(*args)
+        if not result.failed:
+            search_cache.set(org_id, key, result, generation)
+        return result
+
+    @staticmethod
+    async def search_employees_async(
+        org_id: str,
+        filters: Dict[str, Any],
+        columns: Optional[List[str]] = None,
+        page: int = 1,
+        page_size: int = 20,
+        sort_by: str = "id",
+        sort_order: str = "asc",
+        db_conn=None,
+        cursor: Optional[str] = None,
+        count_mode: CountMode = CountMode.EXACT,
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None
+    ) -> SearchResult:
+        """
+        Non-blocking variant of search_employees for async routes.
+        db_conn must be a non-blocking connection from the async pool; if omitted, one is
+        checked out from the org's shard only on a cache miss, so cached pages never wait for a pool.
+        Identical concurrent misses for the org share one query (see single_flight).
+        :return: SearchResult of results, total count and next cursor
+        """
+        key = EmployeeService._cache_key(
+            filters, columns, page, page_size, sort_by, sort_order, cursor, count_mode, match_modes, text_query
+        )
+        with stage("cache"):
+            cached, generation = search_cache.get(org_id, key)
+        if cached is not None:
+            return cached
+        args = (org_id, filters, columns, page, page_size, sort_by, sort_order, cursor, count_mode, match_modes, text_query)
+
+        async def execute() -> SearchResult:
+            # Orgs loaded in the in-process engine are served without a connection
+            result = EmployeeSearchService.search_memory(*args)
+            if result is None:
+                if db_conn is None:
+                    async with shard_router.async_connection(org_id) as conn:
+                        result = await AsyncEmployeeSearchService(conn).search(*args)
+                else:
+                    result = await AsyncEmployeeSearchService(db_conn).search(*args)
+            if not result.failed:
+                search_cache.set(org_id, key, result, generation)
+            return result
+
+        return await search_flights.run(org_id, (generation, key), execute)
+
+    @staticmethod
+    async def search_batch_async(
+        org_id: str,
+        searches: Sequence[Dict[str, Any]],
+        concurrency: int = settings.BATCH_SEARCH_CONCURRENCY
+    ) -> List[Union[SearchResult, str]]:
+        """
+        Run several searches for one org concurrently, at most `concurrency` at a
+        time so a single batch cannot take the whole async pool. Each sub-search
+        uses the result cache and its own pooled connection on a miss.
+        :param searches: Keyword arguments for search_employees_async, one dict per search
+        :return: In request order, a SearchResult or an error message per search
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(kwargs: Dict[str, Any]) -> Union[SearchResult, str]:
+            async with semaphore:
+                try:
+                    result = await EmployeeService.search_employees_async(org_id, **kwargs)
+                except ValueError as e:  # invalid cursor or match mode
+                    return str(e)
+                except PoolTimeout:
+                    return "Database busy, retry later"
+                except Exception as e:
+                    logger.error(f"Batch search failed for org {org_id}: {e}")
+                    return "Search failed"
+            return "Search failed" if result.failed else result
+
+        return await asyncio.gather(*(run(kwargs) for kwargs in searches))
+
+    @staticmethod
+    async def facets_async(
+        org_id: str,
+        filters: Dict[str, Any],
+        fields: Optional[List[FacetField]] = None,
+        limit: int = FACET_DEFAULT_LIMIT,
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None
+    ) -> FacetResult:
+        """
+        Top value counts per facet field for an org's filtered employees, in one query.
+        Results are cached per org and filter set in search_cache, so writes invalidate them
+        with the org's result pages; a connection is only checked out on a miss, and
+        identical concurrent misses share one query.
+        :raises ValueError: if a field or match mode is not supported
+        """
+        fields = [FacetField(f) for f in fields] if fields else None
+        key = search_cache.make_key(
+            column_config=column_config.version,
+            facets=[f.value for f in fields] if fields else None,
+            filters={k: getattr(v, "value", v) for k, v in filters.items() if v is not None},
+            limit=limit,
+            match={k: getattr(v, "value", v) for k, v in (match_modes or {}).items()},
+            q=text_query or None,
+        )
+        with stage("cache"):
+            cached, generation = search_cache.get(org_id, key)
+        if cached is not None:
+            return cached
+
+        async def execute() -> FacetResult:
+            async with shard_router.async_connection(org_id) as conn:
+                result = await AsyncEmployeeSearchService(conn).facets(org_id, filters, fields, limit, match_modes, text_query)
+            if not result.failed:
+                search_cache.set(org_id, key, result, generation)
+            return result
+
+        return await search_flights.run(org_id, (generation, key), execute)
+
+    @staticmethod
+    def export_employees(
+        org_id: str,
+        filters: Dict[str, Any],
+        columns: Optional[List[str]] = None,
+        sort_by: str = "id",
+        sort_order: str = "asc",
+        match_modes: Optional[Dict[str, MatchMode]] = None,
+        text_query: Optional[str] = None,
+        fmt: ExportFormat = ExportFormat.NDJSON
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream all matching employees of an org as NDJSON or CSV chunks, one per
+        server-side cursor FETCH, from a connection to the org's shard.
+        Arguments are validated here, before the first byte is produced.
+        :raises ValueError: if org_id is invalid or a match mode is not supported
+        """
+        EmployeeSearchService._build_export(org_id, filters, columns, sort_by, sort_order, match_modes, text_query)
+        encoder = ExportEncoder(fmt, list(column_config.projection(org_id, columns).columns))
+        return EmployeeService._export_stream(
+            encoder, org_id, filters, columns, sort_by, sort_order, match_modes, text_query
+        )
+
+    @staticmethod
+    async def _export_stream(encoder: ExportEncoder, org_id: str, *args: Any) -> AsyncIterator[bytes]:
+        rows = 0
+        header = encoder.header()
+        if header:
+            yield header
+        async with shard_router.async_connection(org_id) as conn:
+            async for batch in AsyncEmployeeSearchService(conn).export_batches(org_id, *args):
+                rows += len(batch)
+                yield encoder.encode(batch)
+        logger.info(f"Export for org {org_id}: {rows} rows as {encoder.format.value}")
+
+    @staticmethod
+    def stream_changes(
+        org_id: str,
+        since: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        limit: int = settings.CHANGES_PAGE_SIZE
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream an org's employee changes after a change token as NDJSON, oldest first:
+        {"op": "inserted"|"updated"|"deleted", "id": ..., "row": {...}|null} per changed
+        employee with its current projected columns, then a last line
+        {"next_token": ..., "has_more": ...}. If the token is from an earlier history
+        of the org (e.g. before a shard move), the feed starts over from the first
+        change after a {"op": "reset"} line, and the client must drop its copy.
+        Without a token, every employee of the org is streamed as a change.
+        Arguments are validated here, before the first byte is produced.
+        :param since: Token from a previous response's next_token
+        :raises InvalidCursorError: if the token does not verify for this org
+        :raises ValueError: if org_id is invalid
+        """
+        position = ChangePosition(decode_change_token(org_id, since) if since else None)
+        EmployeeSearchService._build_changes(org_id, position.version, columns, limit)
+        return EmployeeService._changes_stream(org_id, position, columns, limit)
+
+    @staticmethod
+    async def _changes_stream(
+        org_id: str, position: ChangePosition, columns: Optional[List[str]], limit: int
+    ) -> AsyncIterator[bytes]:
+        reset = b'{"op": "reset"}\n'
+        changes = 0
+        async with shard_router.async_connection(org_id) as conn:
+            async for batch in AsyncEmployeeSearchService(conn).change_batches(org_id, position, columns, limit):
+                if position.reset and not changes:
+                    yield reset
+                changes += len(batch)
+                yield "".join(json.dumps(change, default=str) + "\n" for change in batch).encode("utf-8")
+        if position.reset and not changes:
+            yield reset
+        token = encode_change_token(org_id, position.token)
+        yield (json.dumps({"next_token": token, "has_more": position.has_more}) + "\n").encode("utf-8")
+        logger.info(f"Changes for org {org_id}: {changes} up to version {position.version}")
+
+    @staticmethod
+    def _cache_key(
+        filters: Dict[str, Any],
+        columns: Optional[List[str]],
+        page: int,
+        page_size: int,
+        sort_by: str,
+        sort_order: str,
+        cursor: Optional[str],
+        count_mode: CountMode,
+        match_modes: Optional[Dict[str, MatchMode]],
+        text_query: Optional[str]
+    ) -> str:
+        """
+        Normalized search_cache key: unset filters are dropped, enums reduced to their values,
+        and page ignored when a cursor is given (the cursor decides the position). The column
+        config version is included so a config change is not masked by cached pages.
+        """
+        active = {k: getattr(v, "value", v) for k, v in filters.items() if v is not None}
+        return search_cache.make_key(
+            column_config=column_config.version,
+            filters=active,
+            columns=columns,
+            page=None if cursor else page,
+            page_size=page_size,
+            sort=[sort_by, str(sort_order).lower()],
+            cursor=cursor,
+            count=getattr(count_mode, "value", count_mode),
+            match={k: getattr(v, "value", v) for k, v in (match_modes or {}).items()},
+            q=text_query or None,
+        )
 
     @staticmethod
     def add_employee(employee: Employee, db_conn=None) -> None:
         """
-        Add an employee to the database.
+        Add an employee to the database (the org's shard unless db_conn is given).
+        :raises OrgMovingError: while the org is being moved between shards
+        """
+        if db_conn is None:
+            with shard_router.connection(employee.org_id, write=True) as conn:
+                EmployeeSearchService(conn).add_employee(employee)
+        else:
+            EmployeeSearchService(db_conn).add_employee(employee)
+        write_logger.info("Employee %s added for org %s", employee.id, employee.org_id)
+
+    @staticmethod
+    def add_employees(
+        employees: Iterable[Employee],
+        db_conn=None,
+        batch_size: int = settings.IMPORT_BATCH_SIZE
+    ) -> BulkInsertResult:
+        """
+        Bulk-add employees in batches of batch_size, one transaction per batch.
+        Without db_conn each batch is split by org and written to the orgs' shards.
+        :return: BulkInsertResult with inserted/failed counts, per-row errors and rows/sec
         """
-        service = EmployeeSearchService(db_conn)
-        service.add_employee(employee)
-        logger.info(f"Employee {employee.id} added for org {employee.org_id}")
+        if db_conn is not None:
+            return EmployeeSearchService(db_conn).add_employees(employees, batch_size)
+        result = BulkInsertResult()
+        batch: List[Tuple[int, Employee]] = []
+        for row_number, employee in enumerate(employees, start=1):
+            if not isinstance(employee, Employee):
+                result.add_error(row_number, "Invalid employee object.")
+                continue
+            batch.append((row_number, employee))
+            if len(batch) >= batch_size:
+                EmployeeService._insert_batch(batch, result)
+                batch = []
+        if batch:
+            EmployeeService._insert_batch(batch, result)
+        return result
+
+    @staticmethod
+    async def import_employees(
+        org_id: str,
+        records: AsyncIterator[ImportRecord],
+        batch_size: int = settings.IMPORT_BATCH_SIZE
+    ) -> BulkInsertResult:
+        """
+        Import a stream of parsed records for one organization.
+        Records are validated and inserted batch by batch on pooled connections in a
+        worker thread; the next batch is not read until the previous one is committed.
+        :return: BulkInsertResult with inserted/failed counts, per-row errors and rows/sec
+        :raises OrgMovingError: while the org is being moved between shards
+        """
+        shard_router.shard_for(org_id, write=True)  # fail before consuming the body
+        result = BulkInsertResult()
+        batch: List[Tuple[int, Employee]] = []
+        async for record in records:
+            if record.error:
+                result.add_error(record.row, record.error)
+                continue
+            try:
+                batch.append((record.row, employee_from_record(org_id, record.data)))
+            except ValueError as e:
+                result.add_error(record.row, str(e))
+                continue
+            if len(batch) >= batch_size:
+                await asyncio.to_thread(EmployeeService._insert_batch, batch, result)
+                batch = []
+        if batch:
+            await asyncio.to_thread(EmployeeService._insert_batch, batch, result)
+        stats = result.as_dict()
+        logger.info(f"Import for org {org_id}: {stats['inserted']} inserted, {stats['failed']} failed, {stats['rows_per_sec']} rows/sec")
+        return result
+
+    @staticmethod
+    def _insert_batch(batch: List[Tuple[int, Employee]], result: BulkInsertResult) -> None:
+        by_org: Dict[str, List[Tuple[int, Employee]]] = {}
+        for row in batch:
+            by_org.setdefault(row[1].org_id, []).append(row)
+        for org_id, rows in by_org.items():
+            with shard_router.connection(org_id, write=True) as conn:
+                EmployeeSearchService(conn).insert_batch(rows, result)
 
 employee_service = EmployeeService()
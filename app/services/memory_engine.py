@@ -0,0 +1,530 @@
+
+"""
+Optional in-process read engine for employee searches (MEMORY_ENGINE_ENABLED).
+Holds a columnar copy of selected organizations: ids in an array, each text
+column dictionary-encoded (every distinct string stored once, rows hold codes),
+an inverted index per filter column and a presorted permutation per sort
+column. A filtered, sorted page is then an intersection of postings plus a walk
+(or a small sort) over the permutation, without a database round trip.
+Exact, prefix and contains filters are served; fuzzy and full-text searches,
+which rank with pg_trgm and ts_rank, always go to Postgres. Text is sorted by
+code point; warm() checks the database sorts the same way (C collation) and
+otherwise leaves text sorts to Postgres, so pages and cursors agree on both paths.
+Inserts through add_employee are written through; bulk writes and stores older
+than MEMORY_ENGINE_MAX_AGE (writes by other workers) trigger a background reload,
+during which the org is served from Postgres.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from app.core.config import logger, settings
+from app.core.cursor import Cursor
+from app.core.sharding import shard_router
+
+# Row layout accepted by OrgStore (and selected by MemoryEngine.warm).
+ROW_COLUMNS = ("id", "firstname", "lastname", "contact", "department", "position", "location", "status", "extra")
+# Dictionary-encoded text columns; each has an inverted index.
+TEXT_COLUMNS = ROW_COLUMNS[1:-1]
+# Columns with a presorted permutation.
+SORT_COLUMNS = ("id", "firstname", "lastname", "department", "position", "location", "status")
+# A page from the engine: (column names, rows, total matches)
+Page = Tuple[List[str], List[Tuple[Any, ...]], int]
+# Strings that linguistic collations (en_US and the like) order differently from code points:
+# case, punctuation, spaces and digits. ASCII only, so the probe runs under any server encoding.
+COLLATION_PROBE = ("B", "a", "A", "b", "_a", "a b", "ab", "Ab", "a-c", "e", "f", "-1", "1", "10", "9", " z", "Z")
+
+
+def code_point_collation(conn: Any) -> bool:
+    """
+    Whether the database sorts text by code point, as OrgStore does.
+    :param conn: Sync connection
+    :return: True if the default collation orders COLLATION_PROBE like Python's sorted()
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT array_agg(s ORDER BY s) FROM unnest(%s::text[]) AS s", (list(COLLATION_PROBE),))
+        ordered = cur.fetchone()[0]
+    conn.rollback()
+    return list(ordered) == sorted(COLLATION_PROBE)
+
+
+class OrgStore:
+    """
+    Columnar store of one organization. Positions (row numbers) are stable;
+    rows are appended, never removed. Pages and inserts hold the store's lock:
+    an insert updates the columns, postings and caches in place.
+    """
+    def __init__(self, org_id: str, rows: Iterable[Sequence[Any]] = (), text_sorts: bool = True) -> None:
+        """
+        :param rows: Rows in ROW_COLUMNS order
+        :param text_sorts: Serve sorts by text columns (only if the database sorts text by code point)
+        """
+        self.org_id = org_id
+        self.text_sorts = text_sorts
+        self._lock = threading.Lock()
+        self.ids = array("q")
+        self.extra: List[Any] = []
+        # code -> string per column; code 0 is NULL
+        self.values: Dict[str, List[Optional[str]]] = {col: [None] for col in TEXT_COLUMNS}
+        self.codes: Dict[str, Dict[Optional[str], int]] = {col: {None: 0} for col in TEXT_COLUMNS}
+        self.columns: Dict[str, array] = {col: array("I") for col in TEXT_COLUMNS}
+        # column -> code -> ascending positions
+        self.postings: Dict[str, Dict[int, array]] = {col: {} for col in TEXT_COLUMNS}
+        # (column, code) -> postings as a bitset, for frequent values (see _mask)
+        self._masks: Dict[Tuple[str, int], int] = {}
+        for row in rows:
+            self._append(row)
+        self.order: Dict[str, array] = {
+            col: array("I", sorted(range(len(self.ids)), key=self.sort_key(col))) for col in SORT_COLUMNS
+        }
+        # sort column -> position -> index in order[column]; rebuilt on first use after an insert
+        self._ranks: Dict[str, array] = {}
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _append(self, row: Sequence[Any]) -> int:
+        position = len(self.ids)
+        self.ids.append(row[0])
+        for i, col in enumerate(TEXT_COLUMNS, start=1):
+            value = row[i]
+            codes = self.codes[col]
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values[col])
+                self.values[col].append(value)
+            self.columns[col].append(code)
+            if code:
+                self.postings[col].setdefault(code, array("I")).append(position)
+        self.extra.append(row[-1])
+        return position
+
+    def add(self, row: Sequence[Any]) -> None:
+        """
+        Append a newly inserted row and place it in every sort permutation.
+        """
+        with self._lock:
+            position = self._append(row)
+            self._masks = {}
+            self._ranks = {}
+            for col, order in self.order.items():
+                key = self.sort_key(col)
+                order.insert(bisect_right(order, key(position), key=key), position)
+
+    def sort_key(self, col: str) -> Callable[[int], Any]:
+        """
+        Key of a position in ascending (col, id) order with NULLs last, as Postgres sorts.
+        Descending order is the exact reverse.
+        """
+        ids = self.ids
+        if col == "id":
+            return ids.__getitem__
+        values, codes = self.values[col], self.columns[col]
+
+        def key(position: int) -> Tuple[bool, str, int]:
+            value = values[codes[position]]
+            return (value is None, value or "", ids[position])
+        return key
+
+    @staticmethod
+    def cursor_key(after: Cursor) -> Any:
+        if after.sort_by == "id":
+            return after.id
+        return (after.value is None, after.value or "", after.id)
+
+    def match_codes(self, col: str, mode: str, value: str) -> Optional[Set[int]]:
+        """
+        Codes of the column's distinct values matching one filter: exact is a dict
+        lookup; prefix and contains test each distinct value (lowercased), not each row.
+        :return: Set of codes, or None if the match mode cannot be served here
+        """
+        if mode == "exact":
+            code = self.codes[col].get(value)
+            return {code} if code else set()
+        needle = value.lower()
+        if mode == "prefix":
+            test = lambda text: text.lower().startswith(needle)
+        elif mode == "contains":
+            test = lambda text: needle in text.lower()
+        else:
+            return None
+        return {code for code, text in enumerate(self.values[col]) if text is not None and test(text)}
+
+    def _mask(self, col: str, codes: Set[int]) -> int:
+        """
+        Positions of rows with any of `codes` in `col` as an int bitset (bit i = position i).
+        Bitsets of frequent values are kept until the next insert.
+        """
+        postings = self.postings[col]
+        result = 0
+        for code in codes:
+            mask = self._masks.get((col, code))
+            if mask is None:
+                positions = postings.get(code, ())
+                bits = bytearray((len(self) + 7) // 8)
+                for position in positions:
+                    bits[position >> 3] |= 1 << (position & 7)
+                mask = int.from_bytes(bits, "little")
+                if len(positions) * 64 >= len(self):
+                    self._masks[(col, code)] = mask
+            result |= mask
+        return result
+
+    def _rank(self, col: str) -> array:
+        rank = self._ranks.get(col)
+        if rank is None:
+            order = self.order[col]
+            rank = array("I", bytes(4 * len(order)))
+            for index, position in enumerate(order):
+                rank[position] = index
+            self._ranks[col] = rank
+        return rank
+
+    @staticmethod
+    def _positions(mask: int) -> List[int]:
+        bits = format(mask, "b")[::-1]
+        positions: List[int] = []
+        position = bits.find("1")
+        while position >= 0:
+            positions.append(position)
+            position = bits.find("1", position + 1)
+        return positions
+
+    @staticmethod
+    def _predicate(checks: List[Tuple[array, Set[int]]]) -> Callable[[int], bool]:
+        if len(checks) == 1 and len(checks[0][1]) == 1:
+            column, code = checks[0][0], next(iter(checks[0][1]))
+            return lambda position: column[position] == code
+        return lambda position: all(column[position] in codes for column, codes in checks)
+
+    def getter(self, column: str) -> Callable[[int], Any]:
+        """
+        Value of an output column at a position: a table column or a dotted path into `extra`.
+        """
+        if column == "id":
+            return self.ids.__getitem__
+        if column == "org_id":
+            org_id = self.org_id
+            return lambda position: org_id
+        if column == "extra":
+            return self.extra.__getitem__
+        if column in self.columns:
+            values, codes = self.values[column], self.columns[column]
+            return lambda position: values[codes[position]]
+        path = column.split(".")
+        extra = self.extra
+
+        def extra_path(position: int) -> Any:
+            value = extra[position]
+            for key in path:
+                if not isinstance(value, dict):
+                    return None
+                value = value.get(key)
+            return value
+        return extra_path
+
+    def page(
+        self,
+        filters: Sequence[Tuple[str, str, Any]],
+        columns: Sequence[str],
+        sort_by: str,
+        sort_order: str,
+        after: Optional[Cursor],
+        offset: int,
+        limit: int
+    ) -> Optional[Page]:
+        """
+        One page of matches in (sort_by, id) order.
+        :param filters: (column, match mode, value) per set filter
+        :param columns: Output columns, in order
+        :param after: Keyset cursor; rows strictly after it are returned
+        :return: Page, or None if a filter or the sort cannot be served here
+        """
+        if sort_by != "id" and not self.text_sorts:
+            return None
+        with self._lock:
+            return self._page(filters, columns, sort_by, sort_order, after, offset, limit)
+
+    def _page(
+        self,
+        filters: Sequence[Tuple[str, str, Any]],
+        columns: Sequence[str],
+        sort_by: str,
+        sort_order: str,
+        after: Optional[Cursor],
+        offset: int,
+        limit: int
+    ) -> Optional[Page]:
+        # Intersect through the inverted index: take the postings of the most selective
+        # filter and check the other filters' codes on those positions only.
+        conditions = []
+        for col, mode, value in filters:
+            if col not in self.postings:
+                return None
+            codes = self.match_codes(col, mode, value)
+            if codes is None:
+                return None
+            postings = self.postings[col]
+            conditions.append((sum(len(postings.get(code, ())) for code in codes), col, codes))
+        matched: Optional[List[int]] = None
+        mask: Optional[int] = None
+        total = len(self)
+        conditions.sort(key=lambda c: c[0])
+        if len(conditions) == 1:
+            total = conditions[0][0]
+        elif conditions and conditions[0][0] * 32 >= len(self):
+            # Only large postings: AND their bitsets
+            mask = -1
+            for _, col, codes in conditions:
+                mask &= self._mask(col, codes)
+            total = mask.bit_count()
+        elif conditions:
+            _, col, codes = conditions[0]
+            postings = self.postings[col]
+            matched = [p for code in codes for p in postings.get(code, ())]
+            for _, col, codes in conditions[1:]:
+                column = self.columns[col]
+                if len(codes) == 1:
+                    code = next(iter(codes))
+                    matched = [p for p in matched if column[p] == code]
+                else:
+                    matched = [p for p in matched if column[p] in codes]
+            total = len(matched)
+        order = self.order[sort_by]
+        key = self.sort_key(sort_by)
+        descending = sort_order == "desc"
+        # Rows after the cursor are order[start:] ascending, order[:end] reversed descending
+        start, end = 0, len(order)
+        if after is not None:
+            if descending:
+                end = bisect_left(order, self.cursor_key(after), key=key)
+            else:
+                start = bisect_right(order, self.cursor_key(after), key=key)
+        if conditions and total * 16 < len(order):
+            # Few matches: sort them by their index in the permutation instead of walking it
+            if matched is None:
+                if mask is not None:
+                    matched = self._positions(mask)
+                else:
+                    _, col, codes = conditions[0]
+                    matched = [p for code in codes for p in self.postings[col].get(code, ())]
+            rank = self._rank(sort_by)
+            if after is not None:
+                matched = [p for p in matched if start <= rank[p] < end]
+            positions = sorted(matched, key=rank.__getitem__, reverse=descending)[offset:offset + limit]
+        else:
+            # Walk the permutation from the cursor, testing each row, until the page is full
+            if descending:
+                walk: Iterable[int] = islice(reversed(order), len(order) - end, None)
+            else:
+                walk = islice(order, start, None)
+            if mask is not None:
+                bits = mask.to_bytes((len(self) + 7) // 8, "little")
+                walk = filter(lambda p: bits[p >> 3] >> (p & 7) & 1, walk)
+            elif conditions:
+                walk = filter(self._predicate([(self.columns[col], codes) for _, col, codes in conditions]), walk)
+            positions = list(islice(walk, offset, offset + limit))
+        getters = [self.getter(col) for col in columns]
+        rows = [tuple(get(p) for get in getters) for p in positions]
+        return list(columns), rows, total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": len(self),
+            "distinct_values": sum(len(values) - 1 for values in self.values.values()),
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1),
+        }
+
+
+class MemoryEngine:
+    """
+    Per-process registry of OrgStores. Thread-safe; a store's pages and
+    write-through inserts are serialized by the store's own lock (pages are
+    pure Python, so under the GIL they would not run in parallel anyway).
+    """
+    def __init__(
+        self,
+        enabled: bool = settings.MEMORY_ENGINE_ENABLED,
+        orgs: str = settings.MEMORY_ENGINE_ORGS,
+        max_rows: int = settings.MEMORY_ENGINE_MAX_ROWS,
+        max_age: float = settings.MEMORY_ENGINE_MAX_AGE
+    ) -> None:
+        """
+        Initialize the engine; nothing is loaded until start() or load().
+        :param enabled: Serve searches from loaded stores
+        :param orgs: Comma-separated org ids kept loaded (warmed by start(), reloaded after writes)
+        :param max_rows: Larger organizations are not loaded
+        :param max_age: Seconds a store is served before it is reloaded; 0 keeps it until a write
+        """
+        self.enabled = enabled
+        self.orgs = frozenset(o.strip() for o in orgs.split(",") if o.strip())
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self._stores: Dict[str, OrgStore] = {}
+        self._generations: Dict[str, int] = {}
+        self._loading: Set[str] = set()
+        self._lock = threading.Lock()
+        self.served = 0
+        self.fallbacks = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    def start(self) -> None:
+        """
+        Warm every configured organization in the background (startup).
+        """
+        if self.enabled:
+            for org_id in sorted(self.orgs):
+                self._schedule(org_id)
+
+    def load(self, org_id: str, rows: Iterable[Sequence[Any]], text_sorts: bool = True) -> OrgStore:
+        """
+        Build and install an org's store from rows in ROW_COLUMNS order; also the
+        DB-free way to fill the engine for tests and benchmarks.
+        """
+        store = OrgStore(org_id, rows, text_sorts)
+        with self._lock:
+            self._stores[org_id] = store
+        return store
+
+    def warm(self, conn: Any, org_id: str, attempts: int = 3) -> Optional[OrgStore]:
+        """
+        Load an organization from the database. A load that overlaps a write to the
+        org may miss it, so it is discarded and retried.
+        :param conn: Sync connection on the org's shard
+        :return: The store, or None if the org has more than max_rows employees or kept changing
+        """
+        text_sorts = code_point_collation(conn)
+        if not text_sorts:
+            logger.info(f"MemoryEngine: database collation is not code-point order, org {org_id} text sorts go to Postgres")
+        for _ in range(attempts):
+            with self._lock:
+                generation = self._generations.get(org_id, 0)
+            started = time.monotonic()
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT {', '.join(ROW_COLUMNS)} FROM employees WHERE org_id = %s ORDER BY id LIMIT %s",
+                    (org_id, self.max_rows + 1)
+                )
+                rows = cur.fetchall()
+            conn.rollback()
+            if len(rows) > self.max_rows:
+                logger.warning(f"MemoryEngine: org {org_id} has more than {self.max_rows} employees, not loaded")
+                return None
+            store = OrgStore(org_id, rows, text_sorts)
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.loads += 1
+                self.load_seconds += elapsed
+                if self._generations.get(org_id, 0) != generation:
+                    continue
+                self._stores[org_id] = store
+            logger.info(f"MemoryEngine: loaded {len(store)} employees of org {org_id} in {elapsed:.2f}s")
+            return store
+        logger.warning(f"MemoryEngine: org {org_id} changed during every load attempt, not loaded")
+        return None
+
+    def store(self, org_id: str) -> Optional[OrgStore]:
+        """
+        The org's store if it is loaded and fresh; an expired store is reloaded in the background.
+        """
+        store = self._stores.get(org_id)
+        if store is None:
+            return None
+        if self.max_age and time.monotonic() - store.loaded_at > self.max_age:
+            with self._lock:
+                if self._stores.get(org_id) is store:
+                    del self._stores[org_id]
+            self._schedule(org_id)
+            return None
+        return store
+
+    def search(
+        self,
+        org_id: str,
+        filters: Sequence[Tuple[str, str, Any]],
+        columns: Sequence[str],
+        sort_by: str,
+        sort_order: str,
+        after: Optional[Cursor],
+        offset: int,
+        limit: int
+    ) -> Optional[Page]:
+        """
+        A page from the org's store (see OrgStore.page).
+        :return: Page, or None if the org is not loaded or the search cannot be served here
+        """
+        if not self.enabled:
+            return None
+        store = self.store(org_id)
+        page = store.page(filters, columns, sort_by, sort_order, after, offset, limit) if store is not None else None
+        if page is None:
+            self.fallbacks += 1
+        else:
+            self.served += 1
+        return page
+
+    def add(self, org_id: str, row: Sequence[Any]) -> None:
+        """
+        Write through a committed insert (row in ROW_COLUMNS order).
+        """
+        with self._lock:
+            self._generations[org_id] = self._generations.get(org_id, 0) + 1
+            store = self._stores.get(org_id)
+            if store is not None:
+                store.add(row)
+
+    def invalidate(self, org_id: str) -> None:
+        """
+        Drop an org's store after a write that was not written through; configured orgs are reloaded.
+        """
+        with self._lock:
+            self._generations[org_id] = self._generations.get(org_id, 0) + 1
+            dropped = self._stores.pop(org_id, None) is not None
+        if dropped or org_id in self.orgs:
+            self._schedule(org_id)
+
+    def unload(self, org_id: str) -> None:
+        """
+        Drop an org's store without reloading it.
+        """
+        with self._lock:
+            self._stores.pop(org_id, None)
+
+    def _schedule(self, org_id: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if org_id in self._loading:
+                return
+            self._loading.add(org_id)
+        threading.Thread(target=self._reload, args=(org_id,), name=f"memory-engine-{org_id}", daemon=True).start()
+
+    def _reload(self, org_id: str) -> None:
+        try:
+            with shard_router.connection(org_id) as conn:
+                self.warm(conn, org_id)
+        except Exception as e:
+            logger.error(f"MemoryEngine: failed to load org {org_id}: {e}")
+        finally:
+            with self._lock:
+                self._loading.discard(org_id)
+
+    def stats(self) -> Dict[str, Any]:
+        stores = dict(self._stores)
+        return {
+            "enabled": self.enabled,
+            "orgs": len(stores),
+            "rows": sum(len(store) for store in stores.values()),
+            "loading": len(self._loading),
+            "served": self.served,
+            "fallbacks": self.fallbacks,
+            "loads": self.loads,
+            "load_seconds": round(self.load_seconds, 3),
+        }
+
+# Singleton instance for global use
+memory_engine = MemoryEngine()
@@ -0,0 +1,225 @@
+
+"""
+Query shapes and server-side prepared statements for employee search.
+A shape is everything that determines the SQL text of a search (columns, active
+filters and their match modes, full-text on/off, sort, keyset clause, count
+mode) but not the values. The SQL is generated once per shape and cached; each
+pooled connection PREPAREs a shape's statement the first time it runs it and
+then only EXECUTEs it, so Postgres skips parsing and, once it settles on a
+generic plan, planning as well.
+"""
+import hashlib
+import re
+import weakref
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+import psycopg2
+from psycopg2 import errorcodes
+from app.core.config import logger, settings
+from app.core.db import execute_async
+
+# psycopg2 placeholders: "%s" for a parameter, "%%" for a literal percent sign.
+PLACEHOLDER = re.compile(r"%([s%])")
+
+
+class PreparedSQL(NamedTuple):
+    """A query rewritten for PREPARE/EXECUTE; `name` is derived from the SQL text."""
+    name: str
+    prepare: str  # PREPARE name AS ... with $n parameters
+    execute: str  # EXECUTE name (%s, ...) for psycopg2 to fill in
+
+
+def compile_prepared(sql: str) -> PreparedSQL:
+    """
+    Rewrite a psycopg2 query (%s parameters) as a named prepared statement.
+    Statement names are a hash of the SQL, so every connection and worker uses the
+    same name for the same query and a changed query never reuses a stale statement.
+    """
+    count = 0
+
+    def number(match: "re.Match[str]") -> str:
+        nonlocal count
+        if match.group(1) == "%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    body = PLACEHOLDER.sub(number, sql)
+    name = "emp_" + hashlib.blake2b(sql.encode("utf-8"), digest_size=8).hexdigest()
+    args = f" ({', '.join(['%s'] * count)})" if count else ""
+    return PreparedSQL(name, f"PREPARE {name} AS {body}", f"EXECUTE {name}{args}")
+
+
+class CompiledShape(NamedTuple):
+    """
+    SQL generated for one search shape. `layout` names the parameter groups in the
+    order the query consumes them; the search fills them in per request.
+    """
+    query: str
+    count_query: Optional[str]
+    hidden: Tuple[str, ...]
+    layout: Tuple[str, ...]
+    prepared: Optional[PreparedSQL]
+    count_prepared: Optional[PreparedSQL]
+
+
+class ShapeCache:
+    def __init__(self, max_shapes: int = settings.SEARCH_SHAPE_CACHE_SIZE) -> None:
+        """
+        Initialize the shape cache.
+        :param max_shapes: Shapes kept before least recently used ones are evicted
+        """
+        self.max_shapes = max_shapes
+        self._shapes: "OrderedDict[Hashable, CompiledShape]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[CompiledShape]:
+        with self._lock:
+            shape = self._shapes.get(key)
+            if shape is None:
+                self.misses += 1
+                return None
+            self._shapes.move_to_end(key)
+            self.hits += 1
+            return shape
+
+    def set(self, key: Hashable, shape: CompiledShape) -> None:
+        with self._lock:
+            self._shapes[key] = shape
+            while len(self._shapes) > self.max_shapes:
+                self._shapes.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "shapes": len(self._shapes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+class PreparedStatements:
+    """
+    Tracks which statements each pooled connection has prepared and runs queries
+    through them. Connections are tracked weakly, so a connection the pool
+    discards takes its statements with it. A statement that fails to prepare is
+    not retried; its query runs unprepared from then on.
+    """
+    def __init__(
+        self,
+        enabled: bool = settings.SEARCH_PREPARED_STATEMENTS,
+        max_per_connection: int = settings.SEARCH_PREPARED_MAX_PER_CONNECTION
+    ) -> None:
+        """
+        :param enabled: False runs every query unprepared (e.g. behind a transaction-pooling proxy)
+        :param max_per_connection: Statements kept per connection; the oldest is DEALLOCATEd beyond this
+        """
+        self.enabled = enabled
+        self.max_per_connection = max_per_connection
+        self._prepared: "weakref.WeakKeyDictionary[Any, OrderedDict[str, None]]" = weakref.WeakKeyDictionary()
+        self._failed: set = set()
+        self._lock = Lock()
+        self.prepares = 0
+        self.executions = 0
+        self.unprepared = 0
+
+    def _plan(self, conn: Any, prepared: Optional[PreparedSQL]) -> Tuple[bool, List[str]]:
+        """
+        Decide how to run a statement on a connection.
+        :return: (run prepared, statements to send first: DEALLOCATEs and the PREPARE)
+        """
+        if not self.enabled or prepared is None or prepared.name in self._failed:
+            return False, []
+        with self._lock:
+            names = self._prepared.setdefault(conn, OrderedDict())
+            if prepared.name in names:
+                names.move_to_end(prepared.name)
+                return True, []
+            setup = []
+            while len(names) >= self.max_per_connection:
+                setup.append(f"DEALLOCATE {names.popitem(last=False)[0]}")
+            return True, setup + [prepared.prepare]
+
+    def _prepared_ok(self, conn: Any, prepared: PreparedSQL) -> None:
+        with self._lock:
+            self._prepared.setdefault(conn, OrderedDict())[prepared.name] = None
+            self.prepares += 1
+
+    def _prepare_failed(self, conn: Any, prepared: PreparedSQL, error: psycopg2.Error) -> bool:
+        """
+        :return: True if the statement exists after all (prepared before an interrupted attempt was recorded)
+        """
+        if error.pgcode == errorcodes.DUPLICATE_PREPARED_STATEMENT:
+            self._prepared_ok(conn, prepared)
+            return True
+        logger.warning(f"Could not prepare {prepared.name}, running it unprepared: {error}")
+        with self._lock:
+            self._failed.add(prepared.name)
+            # DEALLOCATEs may have run before the failure; forget this connection's statements
+            self._prepared.pop(conn, None)
+        return False
+
+    def execute(self, cur: Any, query: str, params: Sequence[Any], prepared: Optional[PreparedSQL]) -> None:
+        """
+        Run a query on a blocking cursor, through its prepared statement when possible.
+        """
+        use, setup = self._plan(cur.connection, prepared)
+        if use and setup:
+            try:
+                for statement in setup:
+                    cur.execute(statement)
+                self._prepared_ok(cur.connection, prepared)
+            except psycopg2.Error as e:
+                cur.connection.rollback()  # searches are read-only; nothing else is lost
+                use = self._prepare_failed(cur.connection, prepared, e)
+        self._run(use)
+        cur.execute(prepared.execute if use else query, params)
+
+    async def execute_async(self, cur: Any, query: str, params: Sequence[Any], prepared: Optional[PreparedSQL]) -> None:
+        """
+        Run a query on a non-blocking (autocommit) cursor, through its prepared statement when possible.
+        """
+        use, setup = self._plan(cur.connection, prepared)
+        if use and setup:
+            try:
+                for statement in setup:
+                    await execute_async(cur, statement)
+                self._prepared_ok(cur.connection, prepared)
+            except psycopg2.Error as e:
+                use = self._prepare_failed(cur.connection, prepared, e)
+        self._run(use)
+        await execute_async(cur, prepared.execute if use else query, params)
+
+    def _run(self, prepared: bool) -> None:
+        with self._lock:
+            if prepared:
+                self.executions += 1
+            else:
+                self.unprepared += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "connections": len(self._prepared),
+                "prepares": self.prepares,
+                "prepared_executions": self.executions,
+                "unprepared_executions": self.unprepared,
+                "failed": len(self._failed),
+            }
+
+# Singleton instances for global use
+shape_cache = ShapeCache()
+prepared_statements = PreparedStatements()
@@ -0,0 +1,77 @@
+
+"""
+JSON encoding of search responses straight from tuple rows.
+The rows come from our own SQL under a compiled projection, so they are not
+re-validated through Pydantic; the response models stay the documented schema.
+Uses orjson when installed and the standard library encoder otherwise; both
+produce compact UTF-8 JSON.
+"""
+import json
+from enum import Enum
+from typing import Any, Dict, List, Sequence, Union
+from app.services.employee_search import FacetResult, SearchResult
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # optional, faster encoder
+
+
+class ResponseFormat(str, Enum):
+    OBJECTS = "objects"  # {"results": [{column: value, ...}, ...]}
+    COLUMNAR = "columnar"  # {"columns": [...], "rows": [[...], ...]}; column names sent once
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Compact JSON; values JSON cannot represent (dates, decimals) are written as strings.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def search_body(result: SearchResult, fmt: ResponseFormat = ResponseFormat.OBJECTS) -> Dict[str, Any]:
+    """
+    Response body of one search page, ready for dumps().
+    """
+    if fmt == ResponseFormat.COLUMNAR:
+        return {"columns": result.columns, "rows": result.rows, "total": result.total, "next_cursor": result.next_cursor}
+    columns = result.columns
+    return {
+        "results": [dict(zip(columns, row)) for row in result.rows],
+        "total": result.total,
+        "next_cursor": result.next_cursor,
+    }
+
+
+def encode_search(result: SearchResult, fmt: ResponseFormat = ResponseFormat.OBJECTS) -> bytes:
+    """
+    Encode a /search response.
+    """
+    return dumps(search_body(result, fmt))
+
+
+def encode_batch(outcomes: Sequence[Union[SearchResult, str]], fmt: ResponseFormat = ResponseFormat.OBJECTS) -> bytes:
+    """
+    Encode a /search/batch response; a string outcome is the sub-search's error.
+    """
+    results: List[Dict[str, Any]] = [
+        {"results": None, "total": None, "next_cursor": None, "error": outcome} if isinstance(outcome, str)
+        else {**search_body(outcome, fmt), "error": None}
+        for outcome in outcomes
+    ]
+    return dumps({"results": results})
+
+
+def encode_facets(result: FacetResult) -> bytes:
+    """
+    Encode a /search/facets response: the total and, per field, its values with counts.
+    """
+    return dumps({
+        "total": result.total,
+        "facets": {
+            field: [{"value": value, "count": count} for value, count in values]
+            for field, values in result.facets.items()
+        },
+    })
@@ -0,0 +1,158 @@
+
+"""
+Tenant-scoped cache of search result pages.
+Bounded by a byte budget (LRU eviction) and a TTL. Each organization has a
+generation counter that writes bump, which invalidates all of its cached pages
+at once; a page computed while a write happened is never stored.
+Cached results are shared between requests and must be treated as read-only.
+Entry sizes are estimated from a page's row and column counts, not by serializing it.
+"""
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+from app.core.config import settings
+
+# Approximate bytes per cached cell (a short string or number plus its tuple slot).
+CELL_BYTES = 48
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate memory of a cached value from its shape: rows x columns for a
+    SearchResult, (value, count) pairs for a FacetResult, items otherwise.
+    """
+    rows = getattr(value, "rows", None)
+    if rows is not None:
+        return (len(rows) + 1) * max(len(value.columns), 1) * CELL_BYTES
+    facets = getattr(value, "facets", None)
+    if facets is not None:
+        return (1 + 2 * sum(len(pairs) for pairs in facets.values())) * CELL_BYTES
+    if isinstance(value, (list, tuple, dict)):
+        return max(len(value), 1) * CELL_BYTES
+    return CELL_BYTES
+
+
+class _Entry(NamedTuple):
+    generation: int
+    expires: float
+    size: int
+    value: Any
+
+
+class SearchCache:
+    def __init__(
+        self,
+        ttl: float = settings.SEARCH_CACHE_TTL,
+        max_bytes: int = settings.SEARCH_CACHE_MAX_BYTES,
+        enabled: bool = settings.SEARCH_CACHE_ENABLED
+    ) -> None:
+        """
+        Initialize the search cache.
+        :param ttl: Seconds a cached page stays valid (bounds staleness from other workers)
+        :param max_bytes: Approximate memory budget for cached pages
+        :param enabled: When False, every lookup misses and nothing is stored
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """
+        Canonical key for a search: sorted JSON of its normalized parts.
+        The org is kept separately so entries can never be shared across tenants.
+        """
+        return json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+
+    def get(self, org_id: str, key: Hashable) -> Tuple[Optional[Any], int]:
+        """
+        Look up a cached page.
+        :return: (value or None, org generation to pass back to set())
+        """
+        with self._lock:
+            generation = self._generations.get(org_id, 0)
+            if not self.enabled:
+                return None, generation
+            full_key = (org_id, key)
+            entry = self._entries.get(full_key)
+            if entry is None:
+                self._misses += 1
+                return None, generation
+            if entry.generation != generation or entry.expires < time.monotonic():
+                self._remove(full_key)
+                self._expirations += 1
+                self._misses += 1
+                return None, generation
+            self._entries.move_to_end(full_key)
+            self._hits += 1
+            return entry.value, generation
+
+    def set(self, org_id: str, key: Hashable, value: Any, generation: int) -> None:
+        """
+        Store a page computed at `generation`; dropped if the org was written to meanwhile.
+        """
+        if not self.enabled:
+            return
+        size = estimate_size(value) + len(str(key))
+        with self._lock:
+            if generation != self._generations.get(org_id, 0) or size > self.max_bytes:
+                return
+            full_key = (org_id, key)
+            if full_key in self._entries:
+                self._remove(full_key)
+            self._entries[full_key] = _Entry(generation, time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def invalidate(self, org_id: str) -> None:
+        """
+        Bump the org's generation so all its cached pages become stale (call after writes).
+        """
+        with self._lock:
+            self._generations[org_id] = self._generations.get(org_id, 0) + 1
+            self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for monitoring: hits, misses, evictions, size.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
+
+    def _remove(self, full_key: Tuple[str, Hashable]) -> None:
+        entry = self._entries.pop(full_key)
+        self._bytes -= entry.size
+
+# Singleton instance for global use
+search_cache = SearchCache()
@@ -0,0 +1,181 @@
+
+"""
+Online move of one organization between shards.
+Usage: python -m app.services.shard_rebalance ORG_ID TARGET_SHARD
+Reads are served from the source shard until the directory points at the target.
+Writes for the org are refused (503, retry) from shortly before the copy until
+the switch. Employees keep their ids (each shard generates ids in its own
+range, see reserve_id_range), so pagination cursors stay valid; search caches
+expire within their TTL, and change feed clients resync (new epoch).
+"""
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import logger
+from app.core.migrations import reserve_id_range
+from app.core.sharding import ShardRouter, shard_router
+from app.services.employee_search import INSERT_COLUMNS
+
+# Rows are copied with their ids.
+COPY_COLUMNS = ("id",) + INSERT_COLUMNS
+
+# Rows deleted per transaction when clearing the source shard.
+DELETE_BATCH_SIZE = 10000
+
+
+def _set_entry(conn: Any, org_id: str, entry: Optional[Tuple[int, str]], source: Optional[int] = None) -> None:
+    """
+    Write the org's directory entry (None drops it).
+    :param source: Shard still holding the org's rows after a switch, until they are deleted
+    """
+    with conn.cursor() as cur:
+        if entry is None:
+            cur.execute("DELETE FROM org_shards WHERE org_id = %s", (org_id,))
+        else:
+            cur.execute("""
+                INSERT INTO org_shards (org_id, shard, state, source) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (org_id) DO UPDATE SET shard = EXCLUDED.shard, state = EXCLUDED.state,
+                    source = EXCLUDED.source, updated_at = now()
+            """, (org_id, entry[0], entry[1], source))
+    conn.commit()
+
+
+def _pending_source(conn: Any, org_id: str) -> Optional[int]:
+    """
+    Source shard of a switched move whose delete did not finish, if any.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT source FROM org_shards WHERE org_id = %s", (org_id,))
+        row = cur.fetchone()
+    conn.rollback()
+    return row[0] if row else None
+
+
+def _count(conn: Any, org_id: str) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM employees WHERE org_id = %s", (org_id,))
+        return cur.fetchone()[0]
+
+
+def copy_org(src: Any, dst: Any, org_id: str) -> int:
+    """
+    Copy an org's rows with their ids from one shard to another in a single target
+    transaction, replacing leftovers of an earlier aborted move. Spills to disk for
+    large orgs.
+    :return: Rows copied
+    :raises RuntimeError: if the row counts do not match after the copy
+    :raises psycopg2.IntegrityError: if an id is taken on the target (rows created
+        before the shards' id ranges were reserved); nothing is copied then
+    """
+    columns = ", ".join(COPY_COLUMNS)
+    with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as buf:
+        with src.cursor() as cur:
+            query = cur.mogrify(f"COPY (SELECT {columns} FROM employees WHERE org_id = %s ORDER BY id) TO STDOUT", (org_id,))
+            cur.copy_expert(query.decode("utf-8"), buf)
+        expected = _count(src, org_id)
+        src.rollback()
+        buf.seek(0)
+        try:
+            with dst.cursor() as cur:
+                cur.execute("DELETE FROM employees WHERE org_id = %s", (org_id,))
+                cur.copy_expert(f"COPY employees ({columns}) FROM STDIN", buf)
+            copied = _count(dst, org_id)
+            if copied != expected:
+                raise RuntimeError(f"Copied {copied} rows for org {org_id}, expected {expected}.")
+            dst.commit()
+        except Exception:
+            dst.rollback()
+            raise
+    return copied
+
+
+def delete_org(conn: Any, org_id: str) -> int:
+    """
+    Delete an org's rows in short transactions.
+    :return: Rows deleted
+    """
+    deleted = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM employees WHERE id IN (SELECT id FROM employees WHERE org_id = %s LIMIT %s)",
+                (org_id, DELETE_BATCH_SIZE),
+            )
+            count = cur.rowcount
+        conn.commit()
+        deleted += count
+        if count < DELETE_BATCH_SIZE:
+            return deleted
+
+
+def move_org(org_id: str, target: int, router: ShardRouter = shard_router, settle: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Move an organization to another shard while the service keeps running.
+    1. Mark it moving in org_shards and wait `settle` seconds so every worker refuses writes.
+    2. Copy its rows to the target and verify the count.
+    3. Point the directory at the target (or its home shard entry) with the source
+       recorded, and wait again so in-flight reads drain from the source.
+    4. Delete its rows from the source and clear the recorded source.
+    If the copy fails, the org is routed to the source again and the source is untouched.
+    Re-running after an interrupted move resumes it: before step 3 the move starts over,
+    after it the recorded source is cleared first.
+    :param settle: Seconds to wait for workers to reload the directory (default TTL + 1)
+    :return: Summary with source, target and row counts
+    :raises ValueError: if the target shard is not configured
+    """
+    if not 0 <= target < len(router.pools):
+        raise ValueError(f"Shard {target} is not configured.")
+    settle = (router.directory_ttl or 0) + 1 if settle is None else settle
+    router.refresh()
+    source, _ = router.lookup(org_id)
+
+    def serve_from(shard: int) -> Optional[Tuple[int, str]]:
+        # The directory only needs an entry when the org is not on its home shard.
+        return None if shard == router.home_shard(org_id) else (shard, "active")
+
+    with router.pools[0].connection() as directory:
+        pending = _pending_source(directory, org_id)
+    deleted = 0
+    if pending is not None and pending != source:
+        logger.info(f"Finishing earlier move of org {org_id}: clearing shard {pending}")
+        deleted = _clear_source(router, org_id, pending, serve_from(source))
+    if source == target:
+        return {"org_id": org_id, "source": source, "target": target, "copied": 0, "deleted": deleted}
+
+    with router.pools[0].connection() as directory:
+        _set_entry(directory, org_id, (source, "moving"))
+        logger.info(f"Moving org {org_id} from shard {source} to {target}; writes paused")
+        time.sleep(settle)
+        try:
+            with router.pools[source].connection() as src, router.pools[target].connection() as dst:
+                reserve_id_range(src, source)
+                reserve_id_range(dst, target)
+                copied = copy_org(src, dst, org_id)
+        except Exception:
+            _set_entry(directory, org_id, serve_from(source))
+            logger.error(f"Moving org {org_id} failed; it stays on shard {source}")
+            raise
+        _set_entry(directory, org_id, (target, "active"), source=source)
+    logger.info(f"Org {org_id} now served from shard {target}; clearing shard {source}")
+    time.sleep(settle)
+    deleted = _clear_source(router, org_id, source, serve_from(target))
+    return {"org_id": org_id, "source": source, "target": target, "copied": copied, "deleted": deleted}
+
+
+def _clear_source(router: ShardRouter, org_id: str, shard: int, entry: Optional[Tuple[int, str]]) -> int:
+    """
+    Delete the org's rows from a former shard, then write its final directory entry.
+    :return: Rows deleted
+    """
+    with router.pools[shard].connection() as src:
+        deleted = delete_org(src, org_id)
+    with router.pools[0].connection() as directory:
+        _set_entry(directory, org_id, entry)
+    return deleted
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python -m app.services.shard_rebalance ORG_ID TARGET_SHARD")
+    logger.info(f"Move finished: {move_org(sys.argv[1], int(sys.argv[2]))}")
@@ -0,0 +1,93 @@
+
+"""
+Single-flight coalescing of identical concurrent searches.
+The first request for a key runs the query; requests with the same key that
+arrive while it is in flight wait for it and share its result instead of
+querying again. Keys are per organization and include the org's search cache
+generation, so a request that arrives after a write never joins a query that
+started before it. Only in-flight work is shared; nothing is kept afterwards.
+Waiting is bounded: a follower that waits longer than `wait_timeout` runs its
+own query, and followers of a cancelled leader (client disconnect) do the same.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+from app.core.config import settings
+from app.core.metrics import metrics, org_label
+
+T = TypeVar("T")
+
+COALESCED = metrics.counter("hr_search_coalesced_total", "Searches answered by another request's in-flight query", ("org",))
+
+
+class SingleFlight:
+    def __init__(
+        self,
+        wait_timeout: float = settings.SEARCH_COALESCE_WAIT,
+        enabled: bool = settings.SEARCH_COALESCE_ENABLED
+    ) -> None:
+        """
+        Initialize the in-flight table (one per event loop's worker).
+        :param wait_timeout: Seconds a follower waits for the leader before running its own query
+        :param enabled: When False, every call runs its own query
+        """
+        self.wait_timeout = wait_timeout
+        self.enabled = enabled
+        self._inflight: Dict[Tuple[str, Hashable], "asyncio.Future[Any]"] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    async def run(self, org_id: str, key: Hashable, execute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `execute` unless an identical call for the org is in flight, then share its outcome
+        (result or exception).
+        :param key: Normalized request key, including anything that must not be mixed (e.g. a cache generation)
+        """
+        if not self.enabled:
+            return await execute()
+        full_key = (org_id, key)
+        flight = self._inflight.get(full_key)
+        if flight is None:
+            return await self._lead(full_key, execute)
+        self.coalesced += 1
+        COALESCED.inc((org_label(org_id),))
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+        except asyncio.CancelledError:
+            if not flight.cancelled():
+                raise  # this request itself was cancelled
+        return await execute()
+
+    async def _lead(self, full_key: Tuple[str, Hashable], execute: Callable[[], Awaitable[T]]) -> T:
+        flight: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = flight
+        self.executions += 1
+        try:
+            result = await execute()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # retrieved, so an unwaited flight does not log "never retrieved"
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(full_key) is flight:
+                del self._inflight[full_key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+        }
+
+# Singleton instance for global use
+search_flights = SingleFlight()
@@ -1,20 +1,318 @@
 
 """
 Tenant service for multi-tenant safety and organization validation.
-Extendable for real DB-backed org validation.
+Organizations are rows of the `organizations` table on shard 0. Each worker
+keeps every active organization in memory: loaded in bulk at startup and
+reloaded in the background every TENANT_CACHE_TTL seconds, so requests of known
+tenants never query it. An org id that is not cached is looked up once; unknown
+ids are then rejected without a lookup for TENANT_NEGATIVE_TTL seconds. Lookups
+are capped per worker (TENANT_LOOKUP_RATE per minute, TENANT_LOOKUP_CONCURRENCY
+at once), so a flood of made-up ids cannot load the registry database; over the
+cap an uncached id is refused as "retry later" until the next reload knows it.
+The records also carry each org's rate limit and column configuration, which
+are applied to the rate limiter and column config when they load.
+Usage: python -m app.services.tenant_service add ORG_ID [NAME] | sync
 """
+import asyncio
+import json
+import re
+import sys
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+from app.core.config import logger, settings
+from app.core.db import execute_async
+from app.core.rate_limit import MemoryBucketStore, parse_overrides, rate_limiter
+from app.core.sharding import shard_router
 from app.models.organization import Organization
-from typing import Optional
+from app.services.column_config import column_config
+
+ORG_QUERY = """
+    SELECT o.org_id, o.name, o.rate_limit, o.columns, s.shard
+    FROM organizations o
+    LEFT JOIN org_shards s ON s.org_id = o.org_id
+    WHERE o.active
+"""
+# Ids that can never be registered are rejected without a lookup.
+ORG_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.:@-]{1,128}$")
+
+
+class TenantRegistryUnavailable(Exception):
+    """Raised when an uncached org id cannot be looked up (registry database unreachable or lookups capped)."""
+
+
+def _organization(row: Sequence[Any]) -> Organization:
+    org_id, name, rate_limit, columns, shard = row
+    return Organization(org_id, name, rate_limit, columns, shard)
+
 
 class TenantService:
-    @staticmethod
-    def validate_org(org_id: str) -> bool:
+    def __init__(
+        self,
+        enabled: bool = settings.TENANT_REGISTRY_ENABLED,
+        ttl: float = settings.TENANT_CACHE_TTL,
+        negative_ttl: float = settings.TENANT_NEGATIVE_TTL,
+        negative_max_entries: int = settings.TENANT_NEGATIVE_MAX_ENTRIES,
+        lookup_rate: int = settings.TENANT_LOOKUP_RATE,
+        lookup_concurrency: int = settings.TENANT_LOOKUP_CONCURRENCY
+    ) -> None:
+        """
+        Initialize the tenant cache; call refresh() to preload it.
+        :param enabled: Validate against the registry; False accepts any non-empty org id
+        :param ttl: Seconds between bulk reloads
+        :param negative_ttl: Seconds an unknown org id stays rejected without a lookup
+        :param negative_max_entries: Unknown org ids remembered (oldest dropped first)
+        :param lookup_rate: Uncached org id lookups per minute; 0 rejects uncached ids without a lookup
+        :param lookup_concurrency: Uncached org id lookups in flight at once
+        """
+        self.enabled = enabled
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.negative_max_entries = negative_max_entries
+        self.lookup_rate = lookup_rate
+        self.lookup_concurrency = lookup_concurrency
+        self._lookup_bucket = MemoryBucketStore(stripes=1)
+        self._lookups_in_flight = 0
+        self._orgs: Dict[str, Organization] = {}
+        self._unknown: "OrderedDict[str, float]" = OrderedDict()  # org_id -> rejected until (monotonic)
+        self._env_limits = parse_overrides(settings.RATE_LIMIT_OVERRIDES)
+        self._loaded_at = float("-inf")
+        self._refreshing = False
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._lock = Lock()
+        self.hits = 0
+        self.rejected = 0
+        self.lookups = 0
+        self.throttled = 0
+        self.loads = 0
+
+    def validate_org(self, org_id: str) -> bool:
         """
-        Validate organization ID for multi-tenant safety.
-        Extend to check org existence in DB for production.
+        Validate organization ID for multi-tenant safety, from the cache only.
         :param org_id: Organization ID
         :return: True if valid, False otherwise
         """
-        return isinstance(org_id, str) and len(org_id.strip()) > 0
+        if not isinstance(org_id, str) or not org_id.strip():
+            return False
+        return not self.enabled or org_id in self._orgs
+
+    def get(self, org_id: str) -> Optional[Organization]:
+        """
+        Cached record of a known organization (no database access).
+        """
+        return self._orgs.get(org_id)
+
+    async def resolve(self, org_id: str) -> Optional[Organization]:
+        """
+        Validate an org id on the request path.
+        Known orgs are answered from the cache; ids rejected recently are
+        rejected again without a lookup; anything else is looked up once, within
+        the worker's lookup rate and concurrency caps.
+        :return: The organization, or None if it is unknown or inactive
+        :raises TenantRegistryUnavailable: if an uncached id cannot be looked up now
+        """
+        if not self.enabled:
+            return Organization(org_id, org_id) if org_id.strip() else None
+        self._maybe_refresh()
+        org = self._orgs.get(org_id)
+        if org is not None:
+            self.hits += 1
+            return org
+        if not ORG_ID_PATTERN.match(org_id) or self._recently_unknown(org_id):
+            self.rejected += 1
+            return None
+        if not self.lookup_rate:
+            self.rejected += 1
+            return None
+        if (self._lookups_in_flight >= self.lookup_concurrency
+                or not self._lookup_bucket.take("", 1, self.lookup_rate, time.monotonic())):
+            self.throttled += 1
+            raise TenantRegistryUnavailable("Too many lookups of unknown organizations, retry later")
+        self.lookups += 1
+        self._lookups_in_flight += 1
+        try:
+            row = await self._fetch_async(org_id)
+        except Exception as e:
+            logger.warning(f"TenantService: looking up organization {org_id} failed: {e}")
+            raise TenantRegistryUnavailable("Organization registry unavailable, retry later") from e
+        finally:
+            self._lookups_in_flight -= 1
+        if row is None:
+            self._remember_unknown(org_id)
+            self.rejected += 1
+            return None
+        org = _organization(row)
+        self._store([org])
+        return org
+
+    @staticmethod
+    async def _fetch_async(org_id: str) -> Optional[Sequence[Any]]:
+        async with shard_router.async_pools[0].connection() as conn:
+            with conn.cursor() as cur:
+                await execute_async(cur, ORG_QUERY + " AND o.org_id = %s", (org_id,))
+                return cur.fetchone()
+
+    def _recently_unknown(self, org_id: str) -> bool:
+        with self._lock:
+            until = self._unknown.get(org_id)
+            if until is None:
+                return False
+            if until > time.monotonic():
+                return True
+            del self._unknown[org_id]
+            return False
+
+    def _remember_unknown(self, org_id: str) -> None:
+        with self._lock:
+            self._unknown[org_id] = time.monotonic() + self.negative_ttl
+            self._unknown.move_to_end(org_id)
+            while len(self._unknown) > self.negative_max_entries:
+                self._unknown.popitem(last=False)
+
+    def _maybe_refresh(self) -> None:
+        """
+        Start a background reload when the cache is older than the TTL; requests never wait for it.
+        """
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._loaded_at < self.ttl:
+                return
+            self._refreshing = True
+        self._task = asyncio.get_running_loop().create_task(self.refresh_async())
+
+    def refresh(self) -> None:
+        """
+        Load every active organization from shard 0 (startup, scripts). On failure the previous cache is kept.
+        """
+        rows = None
+        try:
+            with shard_router.pools[0].connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(ORG_QUERY)
+                    rows = cur.fetchall()
+                conn.rollback()
+        except Exception as e:
+            logger.warning(f"TenantService: loading organizations failed, keeping cached tenants: {e}")
+        finally:
+            self._loaded(rows)
+
+    async def refresh_async(self) -> None:
+        """
+        Non-blocking variant of refresh() for the request path.
+        """
+        rows = None
+        try:
+            async with shard_router.async_pools[0].connection() as conn:
+                with conn.cursor() as cur:
+                    await execute_async(cur, ORG_QUERY)
+                    rows = cur.fetchall()
+        except Exception as e:
+            logger.warning(f"TenantService: loading organizations failed, keeping cached tenants: {e}")
+        finally:
+            self._loaded(rows)
+
+    def _loaded(self, rows: Optional[Sequence[Sequence[Any]]]) -> None:
+        if rows is not None:
+            self._store([_organization(row) for row in rows], replace=True)
+            self.loads += 1
+        with self._lock:
+            self._loaded_at = time.monotonic()
+            self._refreshing = False
+
+    def _store(self, orgs: Iterable[Organization], replace: bool = False) -> None:
+        """
+        Update the cache and apply changed rate limits and column configuration.
+        :param replace: orgs is the full registry; cached orgs missing from it are dropped
+        """
+        with self._lock:
+            previous = self._orgs
+            current = {} if replace else dict(previous)
+            for org in orgs:
+                current[org.org_id] = org
+                self._unknown.pop(org.org_id, None)
+            self._orgs = current
+        columns: Dict[str, Optional[Dict[str, Any]]] = {}
+        for org_id in current.keys() | previous.keys():
+            old_limit, old_columns = self._settings(previous.get(org_id))
+            new_limit, new_columns = self._settings(current.get(org_id))
+            if new_limit != old_limit:
+                rate_limiter.set_limit(org_id, new_limit if new_limit is not None else self._env_limits.get(org_id))
+            if new_columns != old_columns:
+                columns[org_id] = new_columns
+        if columns:
+            column_config.set_orgs(columns)
+
+    @staticmethod
+    def _settings(org: Optional[Organization]) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+        """(rate limit, column config) of a cached org; (None, None) when it is not cached."""
+        return (org.rate_limit, org.columns) if org is not None else (None, None)
+
+    def register(
+        self, org_id: str, name: str, rate_limit: Optional[int] = None, columns: Optional[Dict[str, Any]] = None
+    ) -> Organization:
+        """
+        Create or update an organization and activate it. Other workers see it on
+        their next lookup or reload.
+        :raises ValueError: if org_id is not a valid organization id
+        """
+        if not ORG_ID_PATTERN.match(org_id):
+            raise ValueError(f"Invalid organization id '{org_id}'.")
+        with shard_router.pools[0].connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO organizations (org_id, name, rate_limit, columns) VALUES (%s, %s, %s, %s::jsonb)
+                    ON CONFLICT (org_id) DO UPDATE SET name = EXCLUDED.name, rate_limit = EXCLUDED.rate_limit,
+                        columns = EXCLUDED.columns, active = true, updated_at = now()
+                """, (org_id, name, rate_limit, None if columns is None else json.dumps(columns)))
+                cur.execute(ORG_QUERY + " AND o.org_id = %s", (org_id,))
+                org = _organization(cur.fetchone())
+            conn.commit()
+        self._store([org])
+        logger.info(f"Registered organization {org_id}")
+        return org
 
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "known": len(self._orgs),
+            "unknown_cached": len(self._unknown),
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at > float("-inf") else None,
+            "hits": self.hits,
+            "rejected": self.rejected,
+            "lookups": self.lookups,
+            "throttled": self.throttled,
+            "loads": self.loads,
+        }
+
+# Singleton instance for global use
 tenant_service = TenantService()
+
+
+def sync_from_shards() -> int:
+    """
+    Register every org that has employees on any shard and is not registered yet.
+    :return: Organizations added
+    """
+    found = set()
+    for pool in shard_router.pools:
+        with pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT org_id FROM employees")
+            found.update(row[0] for row in cur.fetchall())
+            conn.rollback()
+    with shard_router.pools[0].connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT org_id FROM organizations")
+            missing = sorted(found - {row[0] for row in cur.fetchall()})
+            for org_id in missing:
+                cur.execute("INSERT INTO organizations (org_id, name) VALUES (%s, %s) ON CONFLICT (org_id) DO NOTHING", (org_id, org_id))
+        conn.commit()
+    return len(missing)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "add":
+        tenant_service.register(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else sys.argv[2])
+    elif len(sys.argv) == 2 and sys.argv[1] == "sync":
+        logger.info(f"Registered {sync_from_shards()} organizations found on the shards")
+    else:
+        sys.exit("Usage: python -m app.services.tenant_service add ORG_ID [NAME] | sync")
@@ -0,0 +1,28 @@
+"""
+Unit tests for the benchmark suite helpers.
+Ensures seeded data is reproducible and skewed, and latency summaries and comparisons are correct.
+"""
+from app.benchmarks.common import percentile, summarize
+from app.benchmarks.compare import compare
+from app.benchmarks.data import generate, org_sizes
+
+
+def test_generated_data_is_seeded_and_skewed() -> None:
+    """Same seed, same rows; skew makes the first org the largest."""
+    rows = lambda seed: [(e.org_id, e.lastname, e.extra) for e in generate(orgs=3, employees=20, extra_width=5, seed=seed)]
+    assert rows(7) == rows(7) and rows(7) != rows(8)
+    assert org_sizes(4, 100, 0) == [100, 100, 100, 100]
+    sizes = org_sizes(4, 100, 1.0)
+    assert sizes == sorted(sizes, reverse=True) and sizes[0] > 2 * sizes[-1]
+    assert len(next(iter(generate(orgs=1, employees=1, extra_width=5))).extra) == 5
+
+
+def test_summary_percentiles_and_regression_check() -> None:
+    """Nearest-rank percentiles in ms; p95 regressions beyond the threshold are reported."""
+    assert percentile([1, 2, 3, 4], 50) == 2 and percentile([1, 2, 3, 4], 99) == 4
+    summary = summarize([i / 1000 for i in range(1, 101)], elapsed=2.0, errors=3)
+    assert (summary["count"], summary["errors"], summary["throughput"]) == (100, 3, 50.0)
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (50.0, 95.0, 99.0)
+    slower = {**summary, "p95_ms": 120.0}
+    rows, regressions = compare({"scenarios": {"a": summary, "b": summary}}, {"scenarios": {"a": slower, "b": summary}}, 10)
+    assert regressions == ["a"] and rows[0]["p95_ms"] == (95.0, 120.0, 26.3)
@@ -0,0 +1,51 @@
+"""
+Unit tests for the employee change feed (tokens and query building).
+Ensures change tokens round-trip and are bound to their org, and changes are
+read after the token's version with the requested columns, which cannot shadow
+the entries' metadata.
+"""
+import pytest
+from app.core.cursor import ChangeToken, InvalidCursorError, decode_change_token, encode_change_token, encode_cursor, Cursor
+from app.services.column_config import column_config
+from app.services.employee_search import ChangePosition, EmployeeSearchService
+
+
+def test_change_token_round_trip_and_org_binding() -> None:
+    """A token decodes for its org only; search cursors are not change tokens."""
+    token = encode_change_token("org_a", ChangeToken("3f2a9c", 41))
+    assert decode_change_token("org_a", token) == ChangeToken("3f2a9c", 41)
+    with pytest.raises(InvalidCursorError):
+        decode_change_token("org_b", token)
+    with pytest.raises(InvalidCursorError):
+        decode_change_token("org_a", encode_cursor("org_a", Cursor("id", "asc", 5, 5, "")))
+    with pytest.raises(InvalidCursorError):
+        decode_change_token("org_a", "not-a-token")
+    assert ChangePosition(decode_change_token("org_a", token)).token == ChangeToken("3f2a9c", 41)
+
+
+def test_changes_query_and_entries() -> None:
+    """Changes after the version, one extra row for has_more; deletions carry no row."""
+    query, params = EmployeeSearchService._build_changes("org_a", 41, ["lastname"], 100)
+    assert "v.version > %s ORDER BY v.version LIMIT %s" in query
+    assert params[-3:] == ["org_a", 41, 101]
+    updated = {"__version": 42, "__op": "U", "__id": 7, "lastname": "Smith"}
+    deleted = {"__version": 43, "__op": "D", "__id": 8, "lastname": None}
+    assert EmployeeSearchService._to_change(updated) == {"op": "updated", "id": 7, "row": {"lastname": "Smith"}}
+    assert EmployeeSearchService._to_change(deleted) == {"op": "deleted", "id": 8, "row": None}
+    with pytest.raises(ValueError):
+        EmployeeSearchService._build_changes("", 0, None, 100)
+
+
+def test_changes_metadata_not_shadowed_by_columns() -> None:
+    """Extra keys named like the feed's metadata are neither projected nor accepted in column config."""
+    query, params = EmployeeSearchService._build_changes("org_a", 0, ["__op", "__id", "__version", "lastname"], 10)
+    assert query.count("__op") == 1 and query.count("__id") == 1 and ["__op"] not in params
+    column_config.set_orgs({"org_feed": {"default": ["lastname", "__op"]}})
+    try:
+        assert "__op" not in column_config.projection("org_feed").columns
+        query, _ = EmployeeSearchService._build_changes("org_feed", 0, None, 10)
+        assert query.count("__op") == 1
+    finally:
+        column_config.set_orgs({"org_feed": None})
+    entry = EmployeeSearchService._to_change({"__version": 5, "__op": "I", "__id": 3, "lastname": "Lee"})
+    assert entry == {"op": "inserted", "id": 3, "row": {"lastname": "Lee"}}
@@ -0,0 +1,89 @@
+"""
+Unit tests for ColumnConfig (per-org output columns).
+Ensures compiled projections, allowed-column enforcement (including sorts), reserved names, and hot reload.
+"""
+import json
+import os
+import pytest
+from app.core.cursor import Cursor, InvalidCursorError, encode_cursor, filters_fingerprint
+from app.services.column_config import ColumnConfig, column_config, compile_projection, is_valid_column
+from app.services.employee_search import EmployeeSearchService
+
+FILTER_FIELDS = ("firstname", "lastname", "contact", "department", "position", "location", "status")
+CONFIG = {
+    "*": {"allowed": "*", "default": ["id", "firstname"]},
+    "org_small": {"allowed": ["id", "lastname", "badge"], "default": ["lastname", "badge"]},
+}
+
+
+def _write(path, config, mtime=None) -> None:
+    path.write_text(json.dumps(config))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_compile_projection_selects_table_and_extra_columns() -> None:
+    """Table columns by name, other keys from extra; invalid names dropped."""
+    plan = compile_projection(["id", "badge", "id", "bad key", "address.city"])
+    assert plan.columns == ("id", "badge", "address.city")
+    assert plan.select == 'id, extra #> %s AS "badge", extra #> %s AS "address.city"'
+    assert plan.params == (["badge"], ["address", "city"])
+    select, _, hidden = EmployeeSearchService._select_list(plan, "lastname")
+    assert select.endswith(", lastname") and hidden == ("lastname",)
+
+
+def test_column_config_defaults_and_allowed(tmp_path) -> None:
+    """Orgs get their default columns and cannot request columns outside their allowed set."""
+    path = tmp_path / "columns.json"
+    _write(path, CONFIG)
+    config = ColumnConfig(str(path), reload_interval=0)
+    assert config.projection("org_other").columns == ("id", "firstname")
+    assert config.projection("org_small").columns == ("lastname", "badge")
+    assert config.projection("org_small", ["firstname", "badge"]).columns == ("badge",)
+    assert config.projection("org_small", ["badge"]) is config.projection("org_small", ["badge"])
+
+
+def test_column_config_hot_reload_keeps_previous_on_error(tmp_path) -> None:
+    """A changed file is picked up; an invalid one is ignored."""
+    path = tmp_path / "columns.json"
+    _write(path, CONFIG, mtime=1_000_000)
+    config = ColumnConfig(str(path), reload_interval=0)
+    assert config.projection("org_small").columns == ("lastname", "badge")
+    _write(path, {**CONFIG, "org_small": {"default": ["id"]}}, mtime=1_000_001)
+    assert config.projection("org_small").columns == ("id",)
+    path.write_text("{not json")
+    os.utime(path, (1_000_002, 1_000_002))
+    assert config.projection("org_small").columns == ("id",)
+
+
+def test_sort_limited_to_allowed_columns() -> None:
+    """Sorting by a column the org may not see falls back to id, and its cursors are refused."""
+    column_config.set_orgs({"org_hidden": {"allowed": ["id", "lastname"], "default": ["lastname"]}})
+    try:
+        filters = dict.fromkeys(FILTER_FIELDS)
+        assert EmployeeSearchService._build_search("org_hidden", filters, None, 1, 20, "firstname", "asc").sort_by == "id"
+        assert EmployeeSearchService._build_search("org_hidden", filters, None, 1, 20, "lastname", "asc").sort_by == "lastname"
+        assert "ORDER BY id" in EmployeeSearchService._build_export("org_hidden", filters, None, "firstname", "asc", None, None)[0]
+        token = encode_cursor("org_hidden", Cursor("firstname", "asc", "Ann", 3, filters_fingerprint(filters)))
+        with pytest.raises(InvalidCursorError):
+            EmployeeSearchService._build_search("org_hidden", filters, None, 1, 20, "id", "asc", cursor=token)
+        assert column_config.allows("org_hidden", "id") and not column_config.allows("org_hidden", "firstname")
+    finally:
+        column_config.set_orgs({"org_hidden": None})
+
+
+def test_reserved_prefix_rejected(tmp_path) -> None:
+    """A "__total" extra key can neither be requested nor configured, so it never shadows the embedded count."""
+    assert not is_valid_column("__total") and is_valid_column("_total") and is_valid_column("address.__total")
+    assert compile_projection(["id", "__total"]).columns == ("id",)
+    plan = EmployeeSearchService._build_search("org_test", dict.fromkeys(FILTER_FIELDS), ["lastname", "__total"], 1, 20, "id", "asc")
+    assert plan.query.count("AS __total") == 1
+    path = tmp_path / "columns.json"
+    _write(path, CONFIG, mtime=1_000_000)
+    config = ColumnConfig(str(path), reload_interval=0)
+    assert config.projection("org_small").columns == ("lastname", "badge")
+    _write(path, {**CONFIG, "org_small": {"allowed": ["id", "__total"], "default": ["id"]}}, mtime=1_000_001)
+    assert not config.reload()
+    assert config.projection("org_small").columns == ("lastname", "badge")
+    config.set_orgs({"org_reserved": {"default": ["id", "__total"]}})
+    assert config.projection("org_reserved").columns == ("id", "firstname")
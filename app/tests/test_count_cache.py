@@ -0,0 +1,53 @@
+"""
+Unit tests for CountCache (cached search totals).
+Ensures expiry, per-org invalidation, generation checks, and bounded size.
+"""
+import time
+from app.services.count_cache import CountCache
+
+ORG_ID = "org_test"
+
+
+def test_count_cache_hit_and_expiry() -> None:
+    """Should return cached totals until the TTL passes."""
+    cache = CountCache(ttl=0.05, max_entries=10)
+    cache.set(ORG_ID, "f1", 42, 0)
+    assert cache.get(ORG_ID, "f1") == (42, 0)
+    time.sleep(0.06)
+    assert cache.get(ORG_ID, "f1") == (None, 0)
+
+
+def test_count_cache_invalidate_is_per_org() -> None:
+    """Invalidating one org must not drop another org's totals."""
+    cache = CountCache(ttl=60, max_entries=10)
+    cache.set(ORG_ID, "f1", 1, 0)
+    cache.set("org_other", "f1", 2, 0)
+    cache.invalidate(ORG_ID)
+    assert cache.get(ORG_ID, "f1") == (None, 1)
+    assert cache.get("org_other", "f1") == (2, 0)
+    assert cache.stats()["entries"] == 1
+
+
+def test_count_cache_evicts_least_recently_used() -> None:
+    """Should keep at most max_entries, evicting the least recently used."""
+    cache = CountCache(ttl=60, max_entries=2)
+    cache.set(ORG_ID, "a", 1, 0)
+    cache.set(ORG_ID, "b", 2, 0)
+    cache.get(ORG_ID, "a")
+    cache.set(ORG_ID, "c", 3, 0)
+    assert cache.get(ORG_ID, "b") == (None, 0)
+    assert cache.get(ORG_ID, "a") == (1, 0) and cache.get(ORG_ID, "c") == (3, 0)
+    cache.invalidate(ORG_ID)
+    assert cache.stats()["entries"] == 0
+
+
+def test_count_cache_skips_total_counted_during_write() -> None:
+    """A total counted before a write commits (generation changed) is not stored."""
+    cache = CountCache(ttl=60, max_entries=10)
+    _, generation = cache.get(ORG_ID, "f1")
+    cache.invalidate(ORG_ID)  # write lands while the count query runs
+    cache.set(ORG_ID, "f1", 41, generation)
+    total, generation = cache.get(ORG_ID, "f1")
+    assert total is None
+    cache.set(ORG_ID, "f1", 42, generation)
+    assert cache.get(ORG_ID, "f1") == (42, 1)
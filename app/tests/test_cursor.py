@@ -0,0 +1,58 @@
+"""
+Unit tests for keyset pagination cursors.
+Ensures cursors round-trip and are bound to their organization and filters.
+"""
+import pytest
+from app.core.cursor import Cursor, InvalidCursorError, check_secret, decode_cursor, encode_cursor, filters_fingerprint
+from app.services.employee_search import EmployeeSearchService
+from app.models.employee import EmployeeStatus
+
+ORG_ID = "org_test"
+
+
+def test_cursor_round_trip() -> None:
+    """Should decode to the same cursor it was encoded from."""
+    cursor = Cursor("lastname", "desc", "Doe", 42, filters_fingerprint({"department": "HR"}))
+    assert decode_cursor(ORG_ID, encode_cursor(ORG_ID, cursor)) == cursor
+
+
+def test_cursor_rejected_for_other_org() -> None:
+    """A cursor issued to one org must not verify for another."""
+    token = encode_cursor(ORG_ID, Cursor("id", "asc", 1, 1, ""))
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("org_other", token)
+
+
+def test_cursor_rejects_tampering() -> None:
+    """Edited or malformed tokens should be rejected."""
+    token = encode_cursor(ORG_ID, Cursor("id", "asc", 1, 1, ""))
+    forged = encode_cursor("org_other", Cursor("id", "asc", 1, 999, "")).split(".")[0] + "." + token.split(".")[1]
+    for bad in (forged, "not-a-cursor", ""):
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(ORG_ID, bad)
+
+
+def test_validly_signed_cursor_with_injected_sort_rejected() -> None:
+    """A cursor signed with the key but carrying SQL in its sort must never reach ORDER BY."""
+    fingerprint = filters_fingerprint({})
+    for sort_by, sort_order in (("id", "asc; DROP TABLE employees; --"), ("id; DELETE FROM employees", "asc"), ("contact", "asc")):
+        token = encode_cursor(ORG_ID, Cursor(sort_by, sort_order, 1, 1, fingerprint))
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(ORG_ID, token)
+        with pytest.raises(InvalidCursorError):
+            EmployeeSearchService._build_search(ORG_ID, {}, None, 1, 20, "id", "asc", cursor=token)
+
+
+def test_published_secret_refused(monkeypatch) -> None:
+    """Startup fails when CURSOR_SECRET is set to the old public default."""
+    monkeypatch.setenv("CURSOR_SECRET", "change-me-in-production")
+    with pytest.raises(RuntimeError):
+        check_secret()
+    monkeypatch.setenv("CURSOR_SECRET", "a-real-random-secret")
+    check_secret()
+
+
+def test_filters_fingerprint_ignores_unset_filters() -> None:
+    """None-valued filters and enum vs raw values should not change the fingerprint."""
+    assert filters_fingerprint({"status": EmployeeStatus.ACTIVE, "location": None}) == filters_fingerprint({"status": "Active"})
+    assert filters_fingerprint({"status": "Active"}) != filters_fingerprint({"status": "Terminated"})
@@ -0,0 +1,170 @@
+"""
+Unit tests for ConnectionPool (pooled PostgreSQL connections).
+Uses fake connections so no database is required.
+"""
+import asyncio
+import threading
+import pytest
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from app.core.db import AsyncConnectionPool, ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn) -> None:
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def execute(self, query, params=None) -> None:
+        if self.conn.broken:
+            raise RuntimeError("connection lost")
+
+
+class FakeConn:
+    def __init__(self) -> None:
+        self.closed = 0
+        self.broken = False
+        self.status = TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.executing = False
+
+    def cursor(self, *args, **kwargs) -> FakeCursor:
+        return FakeCursor(self)
+
+    def get_transaction_status(self) -> int:
+        return self.status
+
+    def rollback(self) -> None:
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def isexecuting(self) -> bool:
+        return self.executing
+
+    def cancel(self) -> None:
+        self.executing = False
+
+    def close(self) -> None:
+        self.closed = 1
+
+
+def make_pool(**kwargs) -> ConnectionPool:
+    opts = {"min_size": 0, "max_size": 2, "timeout": 0.05, "health_check_interval": 30.0}
+    opts.update(kwargs)
+    return ConnectionPool(FakeConn, **opts)
+
+
+def test_pool_reuses_released_connection() -> None:
+    """Should hand out the same connection again after release."""
+    pool = make_pool()
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        assert conn is first
+    assert pool.stats()["created"] == 1
+
+
+def test_pool_times_out_when_exhausted() -> None:
+    """Should raise PoolTimeout once max_size connections are in use."""
+    pool = make_pool(max_size=1)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    pool.release(conn)
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_pool_waiter_gets_released_connection() -> None:
+    """A blocked acquire should succeed as soon as another thread releases."""
+    pool = make_pool(max_size=1, timeout=2.0)
+    conn = pool.acquire()
+    timer = threading.Timer(0.05, pool.release, args=(conn,))
+    timer.start()
+    assert pool.acquire() is conn
+    assert pool.stats()["wait_time_max"] > 0
+
+
+def test_pool_releases_connection_on_error() -> None:
+    """Connections must return to the pool even when the caller raises."""
+    pool = make_pool()
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            conn.status = TRANSACTION_STATUS_INTRANS
+            raise ValueError("boom")
+    stats = pool.stats()
+    assert stats["in_use"] == 0 and stats["idle"] == 1
+    assert conn.rollbacks == 1
+
+
+def test_pool_replaces_unhealthy_connection() -> None:
+    """Idle connections failing the health check should be replaced."""
+    pool = make_pool(health_check_interval=0.0)
+    with pool.connection() as conn:
+        first = conn
+    first.broken = True
+    with pool.connection() as conn:
+        assert conn is not first
+    assert first.closed
+    assert pool.stats()["discarded"] == 1
+
+
+def test_pool_open_prefills_min_size() -> None:
+    """open() should create min_size idle connections."""
+    pool = make_pool(min_size=2)
+    pool.open()
+    stats = pool.stats()
+    assert stats["idle"] == 2 and stats["size"] == 2
+
+
+def test_pool_open_failure_keeps_every_slot() -> None:
+    """A connect failing during open() frees all unfilled slots, so the pool can still reach max_size."""
+    attempts = []
+
+    def flaky_connect() -> FakeConn:
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("database down")
+        return FakeConn()
+
+    pool = ConnectionPool(flaky_connect, min_size=3, max_size=3, timeout=0.05, health_check_interval=30.0)
+    with pytest.raises(RuntimeError):
+        pool.open()
+    stats = pool.stats()
+    assert stats["size"] == 0 and stats["idle"] == 0
+    conns = [pool.acquire() for _ in range(3)]
+    assert pool.stats()["size"] == 3
+    for conn in conns:
+        pool.release(conn)
+
+
+async def fake_connect_async() -> FakeConn:
+    return FakeConn()
+
+
+def test_async_pool_times_out_and_reuses() -> None:
+    """The async pool should time out when exhausted and reuse released connections."""
+    async def scenario() -> None:
+        pool = AsyncConnectionPool(fake_connect_async, min_size=0, max_size=1, timeout=0.05)
+        conn = await pool.acquire()
+        with pytest.raises(PoolTimeout):
+            await pool.acquire()
+        await pool.release(conn)
+        async with pool.connection() as again:
+            assert again is conn
+    asyncio.run(scenario())
+
+
+def test_async_pool_discards_connection_cancelled_mid_query() -> None:
+    """A connection released while still executing should be cancelled and discarded."""
+    async def scenario() -> None:
+        pool = AsyncConnectionPool(fake_connect_async, min_size=0, max_size=1, timeout=0.05)
+        async with pool.connection() as conn:
+            conn.executing = True
+        assert conn.closed
+        stats = pool.stats()
+        assert stats["size"] == 0 and stats["discarded"] == 1
+    asyncio.run(scenario())
@@ -1,61 +1,55 @@
-
 """
-Unit tests for EmployeeService and multi-tenant safety.
+Integration tests for EmployeeService and multi-tenant safety (need PostgreSQL; skipped without it).
 Ensures correct search, add, and tenant isolation behavior.
 """
 import pytest
 from app.models.employee import Employee, EmployeeStatus
-from app.core.db import employee_db
+from app.core.sharding import shard_router
+from app.services.employee_search import EmployeeSearchService
 from app.services.employee_service import employee_service
 
 ORG_ID = "org_test"
+FILTERS = dict(firstname=None, lastname=None, contact=None, department=None, position=None, location=None, status=None)
+
 
 def setup_module(module) -> None:
     """
     Clean up test data before each test run.
     """
-    with employee_db.conn.cursor() as cur:
-        cur.execute("DELETE FROM employees WHERE org_id = %s OR org_id = %s", (ORG_ID, "org_other"))
-        employee_db.conn.commit()
+    for org_id in (ORG_ID, "org_other"):
+        try:
+            with shard_router.connection(org_id, write=True) as conn:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM employees WHERE org_id = %s", (org_id,))
+                conn.commit()
+        except Exception as e:
+            pytest.skip(f"PostgreSQL not available: {e}", allow_module_level=True)
+        EmployeeSearchService.invalidate_caches(org_id)
+
+
+def _employee(org_id: str, firstname: str, lastname: str) -> Employee:
+    return Employee(
+        id=None, org_id=org_id, firstname=firstname, lastname=lastname, contact="1234567890",
+        department="HR", position="Manager", location="NY", status=EmployeeStatus.ACTIVE
+    )
+
 
 def test_add_and_search_employee() -> None:
     """
     Should add an employee and find them by search.
     """
-    emp = Employee(
-        id=1,
-        org_id=ORG_ID,
-        firstname="John",
-        lastname="Doe",
-        contact="1234567890",
-        department="HR",
-        position="Manager",
-        location="NY",
-        status=EmployeeStatus.ACTIVE
-    )
-    employee_service.add_employee(emp)
-    filters = {"firstname": "John", "lastname": "Doe", "contact": None, "department": None, "position": None, "location": None, "status": None}
-    results = employee_service.search_employees(ORG_ID, filters)
-    assert len(results) == 1
-    assert results[0]["firstname"] == "John"
-    assert results[0]["lastname"] == "Doe"
+    employee_service.add_employee(_employee(ORG_ID, "John", "Doe"))
+    result = employee_service.search_employees(ORG_ID, {**FILTERS, "firstname": "John", "lastname": "Doe"})
+    assert result.total == 1
+    assert result.results[0]["firstname"] == "John"
+    assert result.results[0]["lastname"] == "Doe"
+
 
 def test_multi_tenant_safety() -> None:
     """
     Should not leak data between organizations.
     """
-    emp2 = Employee(
-        id=2,
-        org_id="org_other",
-        firstname="Jane",
-        lastname="Smith",
-        contact="9876543210",
-        department="IT",
-        position="Developer",
-        location="SF",
-        status=EmployeeStatus.ACTIVE
-    )
-    employee_service.add_employee(emp2)
-    filters = {"firstname": "Jane", "lastname": "Smith", "contact": None, "department": None, "position": None, "location": None, "status": None}
-    results = employee_service.search_employees(ORG_ID, filters)
-    assert len(results) == 0
+    employee_service.add_employee(_employee("org_other", "Jane", "Smith"))
+    result = employee_service.search_employees(ORG_ID, {**FILTERS, "firstname": "Jane", "lastname": "Smith"})
+    assert result.total == 0 and result.results == []
+    assert employee_service.search_employees("org_other", {**FILTERS, "firstname": "Jane"}).total == 1
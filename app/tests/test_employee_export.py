@@ -0,0 +1,34 @@
+"""
+Unit tests for export encoding and the export query.
+Ensures NDJSON/CSV output and tenant-scoped, unpaginated SQL.
+"""
+import json
+from app.services.employee_export import ExportEncoder, ExportFormat
+from app.services.employee_search import EmployeeSearchService
+
+ROWS = [{"id": 1, "lastname": "Doe", "extra": {"badge": 7}}, {"id": 2, "lastname": None, "extra": {}}]
+
+
+def test_export_ndjson_one_object_per_line() -> None:
+    """NDJSON should have no header and one JSON object per row."""
+    encoder = ExportEncoder(ExportFormat.NDJSON, ["id", "lastname", "extra"])
+    assert encoder.header() == b""
+    lines = encoder.encode(ROWS).decode().splitlines()
+    assert [json.loads(line) for line in lines] == ROWS
+
+
+def test_export_csv_header_and_values() -> None:
+    """CSV should follow the column order, blank NULLs and JSON-encode objects."""
+    encoder = ExportEncoder(ExportFormat.CSV, ["lastname", "id", "extra"])
+    assert encoder.header() == b"lastname,id,extra\n"
+    assert encoder.encode(ROWS).decode() == 'Doe,1,"{""badge"": 7}"\n,2,{}\n'
+
+
+def test_export_query_is_scoped_and_unpaginated() -> None:
+    """The export query should filter by org and have no LIMIT/OFFSET."""
+    query, params, hidden = EmployeeSearchService._build_export(
+        "org1", {"status": None, "lastname": "Doe"}, ["lastname"], "lastname", "desc", None, None
+    )
+    assert "WHERE org_id = %s" in query and "LIMIT" not in query
+    assert query.endswith("ORDER BY lastname desc, id desc")
+    assert params == ["org1", "Doe"] and hidden == ("id",)
@@ -0,0 +1,53 @@
+"""
+Unit tests for streaming employee import parsers.
+Ensures records are parsed across chunk boundaries and errors are reported per row.
+"""
+import asyncio
+import pytest
+from app.models.employee import EmployeeStatus
+from app.services.employee_import import employee_from_record, iter_csv, iter_ndjson
+
+ORG_ID = "org_test"
+
+
+async def chunked(data: bytes, size: int = 7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def collect(parser, data: bytes) -> list:
+    async def run() -> list:
+        return [record async for record in parser(chunked(data))]
+    return asyncio.run(run())
+
+
+def test_ndjson_records_and_errors() -> None:
+    """Should parse objects split across chunks and flag bad lines by row."""
+    data = b'{"firstname": "John", "lastname": "Doe"}\n\nnot json\n[1]\n{"firstname": "Jane"}'
+    records = collect(iter_ndjson, data)
+    assert [r.row for r in records] == [1, 3, 4, 5]
+    assert records[0].data["lastname"] == "Doe"
+    assert records[1].error and records[2].error
+    assert records[3].data == {"firstname": "Jane"}
+
+
+def test_csv_multiline_quoted_field() -> None:
+    """Quoted fields may contain newlines; empty cells are treated as missing."""
+    data = b'firstname,lastname,location\r\nJohn,Doe,"New\nYork"\nJane,,SF\nBad,Row\n'
+    records = collect(iter_csv, data)
+    assert records[0].data == {"firstname": "John", "lastname": "Doe", "location": "New\nYork"}
+    assert records[1].data == {"firstname": "Jane", "location": "SF"}
+    assert records[2].row == 3 and records[2].error
+
+
+def test_employee_from_record_maps_extra_and_validates() -> None:
+    """Unknown keys go to extra; status and org are validated."""
+    emp = employee_from_record(ORG_ID, {"firstname": "J", "lastname": "D", "status": "Active", "badge": 7})
+    assert emp.org_id == ORG_ID and emp.status == EmployeeStatus.ACTIVE
+    assert emp.extra == {"badge": 7} and emp.contact is None
+    with pytest.raises(ValueError):
+        employee_from_record(ORG_ID, {"firstname": "J", "lastname": "D", "status": "Retired"})
+    with pytest.raises(ValueError):
+        employee_from_record(ORG_ID, {"firstname": "J", "lastname": "D", "status": "Active", "org_id": "org_other"})
+    with pytest.raises(ValueError):
+        employee_from_record(ORG_ID, {"firstname": "J", "status": "Active"})
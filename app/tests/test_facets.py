@@ -0,0 +1,40 @@
+"""
+Unit tests for facet counts.
+Ensures all fields are counted in one grouping-sets query scoped to the org and grouping rows are split by field.
+"""
+import pytest
+from app.services.column_config import column_config
+from app.services.employee_search import EmployeeSearchService
+
+FILTERS = dict(firstname=None, lastname=None, contact=None, department="Sales", position=None, location=None, status=None)
+
+
+def test_facet_query_is_one_scoped_grouping_sets_query() -> None:
+    """Filters and org scoping match search; every requested field is a grouping set, plus the total."""
+    shape, params, names = EmployeeSearchService._build_facets("org1", FILTERS, ["status", "location"], 5, None, None)
+    assert names == ("status", "location") and params == ["org1", "Sales", 5]
+    assert "WHERE org_id = %s AND department = %s" in shape.query
+    assert "GROUPING SETS ((status), (location), ())" in shape.query
+    with pytest.raises(ValueError):
+        EmployeeSearchService._build_facets("org1", FILTERS, ["firstname"], 5, None, None)
+
+
+def test_facet_rows_split_by_grouping() -> None:
+    """GROUPING() clears the bit of the grouped field; all bits set is the total."""
+    rows = [("Active", None, 0b01, 7), ("Terminated", None, 0b01, 2), (None, "Berlin", 0b10, 5), (None, None, 0b10, 4),
+            (None, None, 0b11, 9)]
+    result = EmployeeSearchService._to_facets(("status", "location"), rows)
+    assert result.total == 9
+    assert result.facets == {"status": [("Active", 7), ("Terminated", 2)], "location": [("Berlin", 5), (None, 4)]}
+
+
+def test_facets_limited_to_allowed_columns() -> None:
+    """Fields the org may not see are left out of the defaults and refused when requested."""
+    column_config.set_orgs({"org_hidden": {"allowed": ["id", "lastname", "status"]}})
+    try:
+        _, _, names = EmployeeSearchService._build_facets("org_hidden", FILTERS, None, 5, None, None)
+        assert names == ("status",)
+        with pytest.raises(ValueError):
+            EmployeeSearchService._build_facets("org_hidden", FILTERS, ["status", "location"], 5, None, None)
+    finally:
+        column_config.set_orgs({"org_hidden": None})
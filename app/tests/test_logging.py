@@ -0,0 +1,35 @@
+"""
+Unit tests for the logging setup.
+Ensures info records are sampled and rate-capped per logger, never warnings, and a full queue only drops info.
+"""
+import logging
+import queue
+from app.core.config import BackgroundQueueHandler, SamplingFilter, parse_log_rules
+
+
+def record(name: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, "message %s", ("arg",), None)
+
+
+def test_sampling_and_rate_caps_per_logger() -> None:
+    """Rules cover child loggers, the most specific rule wins, and warnings always pass."""
+    sampler = SamplingFilter(parse_log_rules("app.quiet=0"), parse_log_rules("app=3,app.search=1"))
+    assert not sampler.filter(record("app.quiet.child"))
+    assert [sampler.filter(record("app.search")) for _ in range(3)] == [True, False, False]
+    assert [sampler.filter(record("app.other")) for _ in range(4)] == [True, True, True, False]
+    assert sampler.filter(record("app.search", logging.WARNING)) and sampler.filter(record("app.quiet", logging.ERROR))
+    assert sampler.filter(record("unrelated"))
+    assert (sampler.sampled_out, sampler.rate_limited) == (1, 3)
+
+
+def test_full_queue_drops_info_but_keeps_warnings() -> None:
+    """Records are queued unformatted; info is dropped when the queue is full, warnings are not."""
+    handler = BackgroundQueueHandler(queue.Queue(2))
+    handler.emit(record("app"))
+    handler.emit(record("app", logging.WARNING))
+    handler.emit(record("app"))
+    assert handler.dropped == 1 and handler.queue.qsize() == 2
+    first = handler.queue.get_nowait()
+    assert first.msg == "message %s" and first.args == ("arg",)
+    handler.emit(record("app", logging.ERROR))
+    assert [handler.queue.get_nowait().levelno for _ in range(2)] == [logging.WARNING, logging.ERROR]
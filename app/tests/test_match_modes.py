@@ -0,0 +1,59 @@
+"""
+Unit tests for name search match modes (prefix, contains, fuzzy, full-text) and relevance sorting.
+Ensures LIKE input is escaped, tsqueries are built from words only, and the generated SQL
+takes exactly its params under psycopg2's paramstyle, including relevance cursors.
+"""
+from app.core.cursor import Cursor, encode_cursor
+from app.services.employee_search import EmployeeSearchService, MatchMode, RELEVANCE
+
+FILTERS = dict(firstname=None, lastname=None, contact=None, department=None, position=None, location=None, status=None)
+ORG_ID = "org_test"
+
+
+def _substituted(query, params) -> str:
+    """The query as psycopg2 would send it (%% -> %); raises if placeholders and params disagree."""
+    return query % tuple(f"<{i}>" for i in range(len(params)))
+
+
+def _plan(filters=None, match=None, q=None, sort_by="id", cursor=None):
+    return EmployeeSearchService._build_search(
+        ORG_ID, {**FILTERS, **(filters or {})}, ["id", RELEVANCE], 1, 20, sort_by, "asc", cursor, match_modes=match, text_query=q
+    )
+
+
+def test_like_wildcards_escaped_and_trigram_operator() -> None:
+    """%, _ and \\ in input match literally; fuzzy uses the pg_trgm `%` operator."""
+    plan = _plan(
+        {"firstname": "50%_O\\K", "lastname": "a_b%", "contact": "Smyth"},
+        {"firstname": MatchMode.PREFIX, "lastname": MatchMode.CONTAINS, "contact": MatchMode.FUZZY},
+    )
+    sql = _substituted(plan.query, plan.params)
+    assert "lower(firstname) LIKE <2>" in sql and "lastname ILIKE <3>" in sql and "contact % <4>" in sql
+    assert "similarity(contact, <0>)" in sql
+    assert plan.params[:5] == ["Smyth", ORG_ID, "50\\%\\_o\\\\k%", "%a\\_b\\%%", "Smyth"]
+    assert EmployeeSearchService._like_escape("\\%_") == "\\\\\\%\\_"
+
+
+def test_full_text_words_and_empty_query() -> None:
+    """q is reduced to prefix-matched words; q without words adds no full-text predicate or rank."""
+    plan = _plan(q="Ann-Marie o'Neil & !")
+    assert "to_tsquery('simple', %s)" in plan.query and plan.ranked
+    assert "ann:* & marie:* & o:* & neil:*" in plan.params
+    _substituted(plan.query, plan.params)
+    for empty in ("", "  ", "&|!:*"):
+        plan = _plan(q=empty)
+        assert "to_tsquery" not in plan.query and not plan.ranked
+        _substituted(plan.query, plan.params)
+
+
+def test_relevance_cursor_repeats_rank_params() -> None:
+    """A relevance cursor compares (rank, id) and passes the rank params again for the keyset clause."""
+    first = _plan({"lastname": "smi"}, {"lastname": MatchMode.FUZZY}, q="dev", sort_by=RELEVANCE)
+    assert first.sort_by == RELEVANCE and first.sort_order == "desc"
+    token = encode_cursor(ORG_ID, Cursor(RELEVANCE, "desc", 0.25, 17, first.filters_key))
+    plan = _plan({"lastname": "smi"}, {"lastname": MatchMode.FUZZY}, q="dev", sort_by=RELEVANCE, cursor=token)
+    sql = _substituted(plan.query, plan.params)
+    assert ", id) < (<" in sql and sql.endswith("ORDER BY relevance desc, id desc LIMIT <%d> OFFSET <%d>" % (len(plan.params) - 2, len(plan.params) - 1))
+    assert plan.params[-4:-2] == [0.25, 17]
+    # selected rank, embedded COUNT's WHERE, page WHERE, keyset rank
+    assert plan.params.count("smi") == 4 and plan.params.count("dev:*") == 4
@@ -0,0 +1,169 @@
+"""
+Unit tests for the in-process read engine.
+Ensures filtered, sorted and paginated searches match a brute-force reference without a database,
+text sorts are served only where they match the database's collation, and pages stay
+consistent while rows are written through.
+"""
+import random
+import threading
+import pytest
+from app.core.sharding import shard_router
+from app.services.employee_search import EmployeeSearchService, MatchMode
+from app.services.memory_engine import COLLATION_PROBE, code_point_collation, memory_engine
+
+FILTERS = dict(firstname=None, lastname=None, contact=None, department=None, position=None, location=None, status=None)
+NAMES = ["Smith", "smithers", "Jones", "Brown", None]
+DEPARTMENTS = ["Sales", "Engineering", None]
+
+
+def _rows(count: int):
+    rng = random.Random(3)
+    return [
+        (i, rng.choice(["Ann", "Bob"]), rng.choice(NAMES), f"c{i}", rng.choice(DEPARTMENTS), "Engineer",
+         rng.choice(["Berlin", "Pune"]), rng.choice(["Active", "Terminated"]), {"badge": i, "address": {"city": "X"}})
+        for i in rng.sample(range(1, 10 * count), count)
+    ]
+
+
+def _expected(rows, sort_by, sort_order, keep):
+    # Postgres order: NULLs last ascending, first descending; ties by id
+    index = {"id": 0, "lastname": 2, "department": 4}[sort_by]
+    ordered = sorted((r for r in rows if keep(r)), key=lambda r: (r[index] is None, r[index] or "", r[0]))
+    return ordered[::-1] if sort_order == "desc" else ordered
+
+
+def test_pages_and_cursors_match_reference(monkeypatch) -> None:
+    """Every page, by offset and by cursor, equals the reference order and totals."""
+    rows = _rows(300)
+    monkeypatch.setattr(memory_engine, "enabled", True)
+    memory_engine.load("memorg", rows)
+    service = EmployeeSearchService(None)
+    cases = [
+        ({}, {}, lambda r: True),
+        ({"lastname": "smith"}, {"lastname": MatchMode.PREFIX}, lambda r: (r[2] or "").lower().startswith("smith")),
+        ({"department": "Sales", "status": "Active"}, {}, lambda r: r[4] == "Sales" and r[7] == "Active"),
+        ({"lastname": "ON"}, {"lastname": MatchMode.CONTAINS}, lambda r: "on" in (r[2] or "").lower()),
+    ]
+    try:
+        for filters, modes, keep in cases:
+            for sort_by in ("id", "lastname", "department"):
+                for sort_order in ("asc", "desc"):
+                    expected = [(r[0], r[2], r[8]["badge"]) for r in _expected(rows, sort_by, sort_order, keep)]
+                    args = ({**FILTERS, **filters}, ["id", "lastname", "badge"])
+                    page2 = service.search("memorg", *args, 2, 7, sort_by, sort_order, match_modes=modes)
+                    assert page2.rows == expected[7:14] and page2.total == len(expected)
+                    walked, cursor = [], None
+                    while True:
+                        result = service.search("memorg", *args, 1, 20, sort_by, sort_order, cursor=cursor, match_modes=modes)
+                        walked += result.rows
+                        cursor = result.next_cursor
+                        if not cursor:
+                            break
+                    assert walked == expected
+        memory_engine.add("memorg", (5, "Cy", "Aaa", "c", "Sales", "Engineer", None, "Active", None))
+        first = service.search("memorg", {**FILTERS}, ["id", "location"], 1, 1, "lastname", "asc")
+        assert first.rows == [(5, None)] and first.total == 301
+    finally:
+        memory_engine.unload("memorg")
+
+
+def test_pages_consistent_during_write_through(monkeypatch) -> None:
+    """Every page computed while inserts land is complete and ordered for the rows it counts."""
+    monkeypatch.setattr(memory_engine, "enabled", True)
+    memory_engine.load("memorg", [])
+    errors = []
+
+    def write() -> None:
+        for i in range(1, 3001):
+            memory_engine.add("memorg", (i, "Ann", f"n{i % 97:02d}", "c", "Sales", "Engineer", "Pune", "Active", None))
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        while writer.is_alive():
+            columns, rows, total = memory_engine.search("memorg", [("department", "exact", "Sales")], ["id", "lastname"], "lastname", "asc", None, 0, 10000)
+            if len(rows) != total or rows != sorted(rows, key=lambda r: (r[1], r[0])):
+                errors.append(total)
+    finally:
+        writer.join()
+        memory_engine.unload("memorg")
+    assert errors == []
+
+
+class FakeCollation:
+    """Connection whose probe query returns the strings in the given order."""
+    def __init__(self, key) -> None:
+        self.key = key
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def execute(self, query, params) -> None:
+        self.ordered = sorted(params[0], key=self.key)
+
+    def fetchone(self):
+        return (self.ordered,)
+
+    def rollback(self) -> None:
+        pass
+
+
+def test_text_sorts_left_to_postgres_without_code_point_collation(monkeypatch) -> None:
+    """A linguistic collation (case-insensitive first) is detected; its store serves id sorts only."""
+    assert code_point_collation(FakeCollation(lambda s: s))
+    assert not code_point_collation(FakeCollation(lambda s: (s.lower(), s.swapcase())))
+    monkeypatch.setattr(memory_engine, "enabled", True)
+    memory_engine.load("memorg", _rows(20), text_sorts=False)
+    try:
+        args = ("memorg", [], ["id"])
+        assert memory_engine.search(*args, "lastname", "asc", None, 0, 5) is None
+        assert memory_engine.search(*args, "id", "asc", None, 0, 5)[1] == [(r[0],) for r in sorted(_rows(20))[:5]]
+    finally:
+        memory_engine.unload("memorg")
+
+
+def test_served_text_order_matches_database(monkeypatch) -> None:
+    """Against a real database: a warmed store either sorts text exactly like Postgres or declines."""
+    org_id = "org_collation_test"
+    names = list(COLLATION_PROBE) + ["smith", "Smith", "SMITH", "o'Neil", "O Neil", "van Dyke", "Van dyke"]
+    try:
+        with shard_router.connection(org_id, write=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM employees WHERE org_id = %s", (org_id,))
+                for name in names:
+                    cur.execute(
+                        "INSERT INTO employees (org_id, firstname, lastname, status) VALUES (%s, 'X', %s, 'Active')",
+                        (org_id, name)
+                    )
+            conn.commit()
+    except Exception as e:
+        pytest.skip(f"PostgreSQL not available: {e}")
+    monkeypatch.setattr(memory_engine, "enabled", True)
+    try:
+        with shard_router.connection(org_id) as conn:
+            store = memory_engine.warm(conn, org_id)
+            for sort_order in ("asc", "desc"):
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"SELECT id, lastname FROM employees WHERE org_id = %s ORDER BY lastname {sort_order}, id {sort_order}",
+                        (org_id,)
+                    )
+                    expected = cur.fetchall()
+                conn.rollback()
+                page = memory_engine.search(org_id, [], ["id", "lastname"], "lastname", sort_order, None, 0, len(names))
+                if store.text_sorts:
+                    assert page[1] == expected
+                else:
+                    assert page is None
+    finally:
+        memory_engine.unload(org_id)
+        with shard_router.connection(org_id, write=True) as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM employees WHERE org_id = %s", (org_id,))
+            conn.commit()
@@ -0,0 +1,49 @@
+"""
+Unit tests for the in-process metrics.
+Ensures Prometheus rendering, org label bucketing, request-bound stage timings and slow-query throttling.
+"""
+from app.core import metrics as m
+from app.core.config import settings
+
+
+def test_render_histogram_counter_and_collector() -> None:
+    """Buckets are cumulative; stats() fields become gauges or counters."""
+    registry = m.MetricsRegistry()
+    hist = registry.histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    hist.observe(("a",), 0.05)
+    hist.observe(("a",), 0.5)
+    hist.observe(("a",), 5.0)
+    registry.counter("t_total", "test").inc()
+    registry.register_collector(lambda: m.stats_samples("pool", {"size": 3, "acquired": 7, "wait_time_total": 0.5, "backend": "x"}))
+    text = registry.render()
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="a",le="1.0"} 2' in text
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in text and 't_seconds_count{stage="a"} 3' in text
+    assert "t_total 1" in text and "pool_size 3" in text and "pool_acquired_total 7" in text
+    assert "# TYPE pool_wait_time_total counter" in text and "backend" not in text
+
+
+def test_org_label_modes(monkeypatch) -> None:
+    """Buckets are stable and bounded; none drops the org."""
+    monkeypatch.setattr(settings, "METRICS_ORG_LABEL", "bucket")
+    labels = {m.org_label(f"org{i}") for i in range(200)}
+    assert m.org_label("org1") == m.org_label("org1") and len(labels) <= settings.METRICS_ORG_BUCKETS
+    monkeypatch.setattr(settings, "METRICS_ORG_LABEL", "none")
+    assert m.org_label("org1") == ""
+
+
+def test_stage_observed_only_within_request_and_slow_query_throttle() -> None:
+    """Stages outside a request are timed but not recorded; a slow shape is explained once per interval."""
+    with m.stage("unit_stage") as timer:
+        pass
+    assert timer.elapsed >= 0 and m.STAGE_SECONDS.count(("/unit", "unit_stage", "")) == 0
+    m.bind_request("/unit", "org1")
+    with m.stage("unit_stage"):
+        pass
+    assert m.STAGE_SECONDS.count(("/unit", "unit_stage", m.org_label("org1"))) == 1
+    m._request.set(None)
+    log = m.SlowQueryLog(threshold_ms=10, interval=60)
+    assert not log.should_explain("s1", 0.005)
+    assert log.should_explain("s1", 0.02) and not log.should_explain("s1", 0.02)
+    assert log.should_explain("s2", 0.02)
+    assert not m.SlowQueryLog(threshold_ms=0).should_explain("s1", 10.0)
@@ -0,0 +1,49 @@
+"""
+Unit tests for schema migrations and the startup index check.
+Ensures absent and invalid search indexes are reported, and migrations are versioned in order.
+"""
+from app.core.migrations import EXPECTED_INDEXES, MIGRATIONS, missing_indexes
+
+
+class FakeCatalog:
+    """Connection whose pg_index query returns the given valid index names."""
+    def __init__(self, valid) -> None:
+        self.valid = valid
+        self.queries = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def execute(self, query, params=None) -> None:
+        self.queries.append(query)
+
+    def fetchall(self):
+        return [(name,) for name in self.valid]
+
+    def rollback(self) -> None:
+        pass
+
+
+def test_missing_indexes_reports_absent_and_invalid() -> None:
+    """Only valid indexes count as present (an interrupted CONCURRENTLY build is invalid)."""
+    assert missing_indexes(FakeCatalog(list(EXPECTED_INDEXES) + ["employees_pkey"])) == []
+    catalog = FakeCatalog([name for name in EXPECTED_INDEXES if name not in ("ix_employees_org_lastname", "ix_employees_org_fulltext")])
+    assert missing_indexes(catalog) == ["ix_employees_org_lastname", "ix_employees_org_fulltext"]
+    assert "i.indisvalid" in catalog.queries[0]
+    assert missing_indexes(FakeCatalog([])) == list(EXPECTED_INDEXES)
+
+
+def test_migrations_versioned_in_order() -> None:
+    """Versions are 1..n without gaps; concurrent index builds run outside a transaction."""
+    assert [m.version for m in MIGRATIONS] == list(range(1, len(MIGRATIONS) + 1))
+    for migration in MIGRATIONS:
+        concurrent = any("CONCURRENTLY" in statement for statement in migration.statements)
+        assert not (concurrent and migration.transactional)
+        if concurrent:
+            assert all("IF NOT EXISTS" in statement for statement in migration.statements if "CONCURRENTLY" in statement)
@@ -0,0 +1,27 @@
+"""
+Unit tests for output column pushdown into SQL.
+Ensures extra keys and nested paths compile to JSONB path expressions, and the
+search adds only the hidden keys it needs for sorting and cursors.
+"""
+from psycopg2.extensions import adapt
+from app.services.column_config import compile_projection
+from app.services.employee_search import EmployeeSearchService
+
+
+def test_extra_and_nested_keys_compile_to_jsonb_paths() -> None:
+    """Each extra key is one `extra #> path` expression; the path is a text[] parameter."""
+    plan = compile_projection(["badge", "address.city", "address.geo.lat"])
+    assert plan.select == 'extra #> %s AS "badge", extra #> %s AS "address.city", extra #> %s AS "address.geo.lat"'
+    assert plan.params == (["badge"], ["address", "city"], ["address", "geo", "lat"])
+    assert adapt(plan.params[1]).getquoted() == b"ARRAY['address','city']"
+    assert compile_projection(['x" FROM pg_user --', "a..b", "1abc"]).columns == ()
+
+
+def test_select_list_adds_hidden_sort_keys_and_rank() -> None:
+    """id and the sort column are selected but hidden when not requested; relevance only when ranked."""
+    plan = compile_projection(["address.city", "relevance"])
+    select, params, hidden = EmployeeSearchService._select_list(plan, "lastname", ("ts_rank(doc, q)", ["w"]))
+    assert select == 'extra #> %s AS "address.city", ts_rank(doc, q) AS relevance, id, lastname'
+    assert params == [["address", "city"], "w"] and hidden == ("id", "lastname")
+    select, params, hidden = EmployeeSearchService._select_list(compile_projection(["id", "relevance"]), "id")
+    assert select == "id" and params == [] and hidden == ()
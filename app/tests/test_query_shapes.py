@@ -0,0 +1,61 @@
+"""
+Unit tests for query shapes and prepared statements.
+Ensures SQL is reused per shape, placeholders are numbered, and statements are prepared once per connection.
+"""
+import psycopg2
+from app.services.employee_search import EmployeeSearchService
+from app.services.query_shapes import PreparedStatements, compile_prepared, shape_cache
+
+FILTERS = dict(firstname=None, lastname=None, contact=None, department=None, position=None, location=None, status=None)
+
+
+class FakeCursor:
+    def __init__(self, fail_on: str = "") -> None:
+        self.connection = self
+        self.fail_on = fail_on
+        self.statements = []
+
+    def execute(self, query, params=None) -> None:
+        if self.fail_on and query.startswith(self.fail_on):
+            raise psycopg2.ProgrammingError("could not determine data type")
+        self.statements.append(query)
+
+    def rollback(self) -> None:
+        pass
+
+
+def test_compile_prepared_numbers_parameters() -> None:
+    """%s become $n and %% a literal %; the name depends only on the SQL."""
+    prepared = compile_prepared("SELECT id FROM employees WHERE org_id = %s AND lastname %% %s LIMIT %s")
+    assert prepared.prepare.endswith("AS SELECT id FROM employees WHERE org_id = $1 AND lastname % $2 LIMIT $3")
+    assert prepared.execute == f"EXECUTE {prepared.name} (%s, %s, %s)"
+    assert compile_prepared("SELECT 1").name != prepared.name
+
+
+def test_same_shape_reuses_sql_with_new_values() -> None:
+    """Searches differing only in values share the compiled SQL; a new filter is a new shape."""
+    shape_cache.clear()
+    first = EmployeeSearchService._build_search("org1", {**FILTERS, "lastname": "Doe"}, ["id"], 1, 20, "lastname", "asc")
+    hits = shape_cache.hits
+    second = EmployeeSearchService._build_search("org2", {**FILTERS, "lastname": "Roe"}, ["id"], 3, 10, "lastname", "asc")
+    assert shape_cache.hits == hits + 1
+    assert second.query is first.query and second.prepared is first.prepared
+    assert second.params == ["org2", "Roe", "org2", "Roe", 11, 20]
+    third = EmployeeSearchService._build_search("org1", {**FILTERS, "lastname": "Doe", "status": "active"}, ["id"], 1, 20, "lastname", "asc")
+    assert third.query != first.query and "status = %s" in third.query
+
+
+def test_prepared_once_per_connection_and_fallback() -> None:
+    """A statement is prepared on first use only; one that fails to prepare runs unprepared."""
+    statements = PreparedStatements(enabled=True, max_per_connection=1)
+    a, b = compile_prepared("SELECT %s"), compile_prepared("SELECT %s + 1")
+    cur = FakeCursor()
+    statements.execute(cur, "SELECT %s", [1], a)
+    statements.execute(cur, "SELECT %s", [1], a)
+    assert cur.statements == [a.prepare, a.execute, a.execute]
+    statements.execute(cur, "SELECT %s + 1", [1], b)
+    assert cur.statements[3:] == [f"DEALLOCATE {a.name}", b.prepare, b.execute]
+    failing = FakeCursor(fail_on="PREPARE")
+    statements.execute(failing, "SELECT %s", [1], a)
+    statements.execute(failing, "SELECT %s", [1], a)
+    assert failing.statements == ["SELECT %s", "SELECT %s"]
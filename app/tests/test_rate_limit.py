@@ -1,10 +1,10 @@
 """
-Unit tests for RateLimiter (naive in-memory rate limiting).
-Ensures correct behavior for allowed, blocked, and reset scenarios.
+Unit tests for RateLimiter (per-org token buckets).
+Ensures correct behavior for allowed, blocked, reset, override and shared-store scenarios.
 """
 import time
 import pytest
-from app.core.rate_limit import RateLimiter
+from app.core.rate_limit import MemoryBucketStore, RateLimiter, SharedMemoryBucketStore, WINDOW_SECONDS
 
 ORG_ID = "org_test"
 
@@ -35,3 +35,32 @@ def test_rate_limit_resets_next_window() -> None:
     assert limiter.is_allowed(ORG_ID)
     time.sleep(61)  # Wait for next minute window
     assert limiter.is_allowed(ORG_ID)
+
+def test_rate_limit_per_org_override_and_cost() -> None:
+    """Overrides should raise an org's quota; cost should charge several tokens."""
+    limiter = RateLimiter(limit=1, overrides={"org_big": 3})
+    assert limiter.is_allowed("org_big", cost=3)
+    assert not limiter.is_allowed("org_big")
+    assert limiter.is_allowed(ORG_ID)
+    assert limiter.stats()["rejected"] == 1
+
+def test_rate_limit_memory_store_evicts_idle_orgs() -> None:
+    """Idle orgs (whose buckets are full again) should be dropped."""
+    store = MemoryBucketStore(stripes=1)
+    now = time.monotonic()
+    assert store.take(ORG_ID, 1, 1, now)
+    assert not store.take(ORG_ID, 1, 1, now)
+    assert store.take("org_other", 1, 1, now + WINDOW_SECONDS)  # sweeps ORG_ID
+    assert store.stats()["orgs"] == 1 and store.stats()["evictions"] == 1
+
+def test_rate_limit_shared_store_is_shared(tmp_path) -> None:
+    """Two stores on the same file (as in two workers) should share one limit."""
+    path = str(tmp_path / "buckets")
+    first = RateLimiter(limit=2, overrides={}, store=SharedMemoryBucketStore(path, slots=64, stripes=4))
+    second = RateLimiter(limit=2, overrides={}, store=SharedMemoryBucketStore(path, slots=64, stripes=4))
+    assert first.is_allowed(ORG_ID)
+    assert second.is_allowed(ORG_ID)
+    assert not first.is_allowed(ORG_ID)
+    assert second.is_allowed("org_other")
+    with pytest.raises(ValueError):
+        SharedMemoryBucketStore(path, slots=128, stripes=4)
@@ -0,0 +1,29 @@
+"""
+Unit tests for the search response encoder.
+Ensures tuple rows encode like the response model, in both formats and with either JSON backend.
+"""
+import json
+from app.schemas.search import EmployeeSearchResponse
+from app.services import response_encoder
+from app.services.employee_search import SearchResult
+from app.services.response_encoder import ResponseFormat, encode_batch, encode_search
+
+RESULT = SearchResult(("id", "lastname", "extra"), [(1, "Müller", {"badge": 7}), (2, "Doe", None)], 2, "c1")
+
+
+def test_objects_match_response_model_and_columnar_shares_header(monkeypatch) -> None:
+    """Same JSON as the Pydantic model; columnar rows zip back to the same objects."""
+    expected = json.loads(EmployeeSearchResponse(results=RESULT.results, total=2, next_cursor="c1").model_dump_json())
+    assert json.loads(encode_search(RESULT)) == expected
+    columnar = json.loads(encode_search(RESULT, ResponseFormat.COLUMNAR))
+    assert columnar["columns"] == ["id", "lastname", "extra"]
+    assert [dict(zip(columnar["columns"], row)) for row in columnar["rows"]] == expected["results"]
+    monkeypatch.setattr(response_encoder, "orjson", None)
+    assert json.loads(encode_search(RESULT)) == expected and "Müller".encode("utf-8") in encode_search(RESULT)
+
+
+def test_batch_keeps_order_and_errors() -> None:
+    """Failed sub-searches carry only the error."""
+    body = json.loads(encode_batch([RESULT, "Malformed cursor."]))
+    assert body["results"][0]["results"][0] == {"id": 1, "lastname": "Müller", "extra": {"badge": 7}}
+    assert body["results"][1] == {"results": None, "total": None, "next_cursor": None, "error": "Malformed cursor."}
@@ -0,0 +1,32 @@
+"""
+Unit tests for batch search.
+Ensures sub-searches run concurrently within the limit and keep request order and per-item errors.
+"""
+import asyncio
+from app.services.employee_search import SearchResult
+from app.services.employee_service import EmployeeService
+
+
+def test_search_batch_concurrency_order_and_errors(monkeypatch) -> None:
+    """Results keep request order; failures become error messages; concurrency is capped."""
+    running = 0
+    peak = 0
+
+    async def fake_search(org_id, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01 * (5 - kwargs["page"]))  # later pages finish first
+        running -= 1
+        if kwargs["page"] == 2:
+            raise ValueError("Invalid cursor")
+        if kwargs["page"] == 3:
+            return SearchResult((), [], 0, failed=True)
+        return SearchResult(("id",), [(kwargs["page"],)], 1)
+
+    monkeypatch.setattr(EmployeeService, "search_employees_async", staticmethod(fake_search))
+    searches = [{"filters": {}, "page": page} for page in (1, 2, 3, 4)]
+    outcomes = asyncio.run(EmployeeService.search_batch_async("org1", searches, concurrency=2))
+    assert outcomes[0].results == [{"id": 1}] and outcomes[3].results == [{"id": 4}]
+    assert outcomes[1] == "Invalid cursor" and outcomes[2] == "Search failed"
+    assert peak == 2
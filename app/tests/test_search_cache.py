@@ -0,0 +1,57 @@
+"""
+Unit tests for SearchCache (cached search result pages).
+Ensures tenant isolation, generation-based invalidation, and the byte budget.
+"""
+from app.services import search_cache
+from app.services.employee_search import FacetResult, SearchResult
+from app.services.search_cache import CELL_BYTES, SearchCache, estimate_size
+
+ORG_ID = "org_test"
+
+
+def test_search_cache_is_per_org() -> None:
+    """The same search in another org must miss."""
+    cache = SearchCache(ttl=60, max_bytes=10_000)
+    key = cache.make_key(filters={"status": "Active"}, page=1)
+    _, gen = cache.get(ORG_ID, key)
+    cache.set(ORG_ID, key, {"results": [1, 2]}, gen)
+    assert cache.get(ORG_ID, key)[0] == {"results": [1, 2]}
+    assert cache.get("org_other", key)[0] is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_search_cache_invalidate_drops_pages_and_racing_writes() -> None:
+    """A write must invalidate cached pages and any page computed before it."""
+    cache = SearchCache(ttl=60, max_bytes=10_000)
+    _, gen = cache.get(ORG_ID, "k")
+    cache.set(ORG_ID, "k", [1], gen)
+    cache.invalidate(ORG_ID)
+    assert cache.get(ORG_ID, "k")[0] is None
+    cache.set(ORG_ID, "k", [1], gen)  # computed before the write
+    assert cache.get(ORG_ID, "k")[0] is None
+
+
+def test_search_cache_evicts_to_byte_budget() -> None:
+    """Should evict least recently used pages once over max_bytes."""
+    page = SearchResult(("id", "lastname"), [(1, "Smith")], 1)
+    cache = SearchCache(ttl=60, max_bytes=2 * (estimate_size(page) + 1))
+    for key in ("a", "b", "c"):
+        cache.set(ORG_ID, key, page, 0)
+    assert cache.get(ORG_ID, "a")[0] is None
+    assert cache.get(ORG_ID, "c")[0] is not None
+    stats = cache.stats()
+    assert stats["bytes"] <= cache.max_bytes and stats["evictions"] == 1
+
+
+def test_search_cache_sizes_pages_without_serializing(monkeypatch) -> None:
+    """Sizes follow rows x columns (header included) and facet pairs; pages are never JSON-encoded."""
+    def no_dumps(*args, **kwargs):
+        raise AssertionError("page serialized")
+
+    monkeypatch.setattr(search_cache.json, "dumps", no_dumps)
+    page = SearchResult(("id", "lastname", "badge"), [(i, "Smith", None) for i in range(20)], 20)
+    assert estimate_size(page) == 21 * 3 * CELL_BYTES
+    assert estimate_size(FacetResult({"department": [("Sales", 3), ("HR", 1)]}, 4)) == 5 * CELL_BYTES
+    cache = SearchCache(ttl=60, max_bytes=10_000)
+    cache.set(ORG_ID, "k", page, 0)
+    assert cache.stats()["bytes"] == 21 * 3 * CELL_BYTES + 1
@@ -0,0 +1,69 @@
+"""
+Unit tests for moving organizations between shards.
+Ensures an interrupted move finishes clearing its source when re-run, and each
+shard's id sequence is confined to its own range.
+"""
+from contextlib import nullcontext
+from app.core.migrations import ID_RANGE, reserve_id_range
+from app.core.sharding import ShardRouter
+from app.services import shard_rebalance
+
+
+class FakePool:
+    def connection(self):
+        return nullcontext(None)
+
+
+class FakeSequenceConn:
+    """Answers reserve_id_range's catalog queries for a sequence with the given state."""
+    def __init__(self, bounds, last_value, is_called) -> None:
+        self.answers = [("employees_id_seq",), bounds, (last_value, is_called)]
+        self.statements = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def execute(self, query, params=None) -> None:
+        self.statements.append(query)
+
+    def fetchone(self):
+        return self.answers.pop(0)
+
+    def commit(self) -> None:
+        pass
+
+
+def test_rerun_after_switch_clears_recorded_source(monkeypatch) -> None:
+    """Once the directory points at the target, a re-run deletes the rows left on the source."""
+    router = ShardRouter([FakePool(), FakePool()], [None, None], ring_size=1, overrides={}, directory_ttl=None)
+    router._set_directory([("org_moved", 1, "active")])
+    monkeypatch.setattr(router, "refresh", lambda: None)
+    monkeypatch.setattr(shard_rebalance, "_pending_source", lambda conn, org_id: 0)
+    cleared = []
+    monkeypatch.setattr(shard_rebalance, "_clear_source", lambda r, org_id, shard, entry: cleared.append((shard, entry)) or 5)
+    result = shard_rebalance.move_org("org_moved", 1, router, settle=0)
+    assert result["deleted"] == 5 and result["copied"] == 0
+    assert cleared == [(0, (1, "active"))]
+    assert "id" in shard_rebalance.COPY_COLUMNS
+
+
+def test_reserve_id_range_moves_sequence_into_shard_block() -> None:
+    """A shard's sequence restarts at its block, keeps its position inside it, and is left alone once reserved."""
+    conn = FakeSequenceConn((1, 2 ** 63 - 1), 500, True)
+    reserve_id_range(conn, 2)
+    assert conn.statements[-1] == (
+        f"ALTER SEQUENCE employees_id_seq MINVALUE {2 * ID_RANGE} MAXVALUE {3 * ID_RANGE - 1} "
+        f"START WITH {2 * ID_RANGE} RESTART WITH {2 * ID_RANGE}"
+    )
+    conn = FakeSequenceConn((1, 2 ** 63 - 1), 500, True)
+    reserve_id_range(conn, 0)
+    assert conn.statements[-1].endswith("RESTART WITH 501")
+    conn = FakeSequenceConn((ID_RANGE, 2 * ID_RANGE - 1), ID_RANGE + 7, True)
+    reserve_id_range(conn, 1)
+    assert not any(q.startswith("ALTER") for q in conn.statements)
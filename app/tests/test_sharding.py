@@ -0,0 +1,38 @@
+"""
+Unit tests for ShardRouter (org-based shard routing).
+Ensures stable placement, minimal movement on growth, and override precedence.
+"""
+import pytest
+from app.core.sharding import HashRing, OrgMovingError, ShardRouter, parse_shard_overrides
+
+ORGS = [f"org{i}" for i in range(2000)]
+
+
+def test_hash_ring_adding_a_shard_moves_few_orgs() -> None:
+    """Growing from 3 to 4 shards should only move orgs onto the new shard."""
+    before, after = HashRing(3), HashRing(4)
+    moved = [org for org in ORGS if before.shard_for(org) != after.shard_for(org)]
+    assert all(after.shard_for(org) == 3 for org in moved)
+    assert 0.1 < len(moved) / len(ORGS) < 0.4
+
+
+def test_router_precedence_directory_then_pin_then_ring() -> None:
+    """Directory entries beat pins, which beat the ring; moving orgs refuse writes."""
+    router = ShardRouter([None] * 3, [None] * 3, ring_size=2, overrides={"org_pinned": 2}, directory_ttl=None)
+    assert router.shard_for("org_pinned") == 2
+    assert router.shard_for("org1") in (0, 1)
+    router._set_directory([("org_pinned", 1, "active"), ("org1", 2, "moving")])
+    assert router.shard_for("org_pinned") == 1
+    assert router.shard_for("org1") == 2
+    with pytest.raises(OrgMovingError):
+        router.shard_for("org1", write=True)
+
+
+def test_router_rejects_bad_configuration() -> None:
+    """Ring size and pins must refer to configured shards."""
+    with pytest.raises(ValueError):
+        ShardRouter([None], [None], ring_size=2, overrides={})
+    with pytest.raises(ValueError):
+        ShardRouter([None], [None], ring_size=1, overrides={"org": 1})
+    with pytest.raises(ValueError):
+        parse_shard_overrides("org")
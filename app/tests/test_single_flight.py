@@ -0,0 +1,58 @@
+"""
+Unit tests for single-flight search coalescing.
+Ensures identical concurrent calls share one execution per org, waits are bounded and a cancelled leader is not fatal.
+"""
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight
+
+
+def test_identical_concurrent_calls_share_one_execution() -> None:
+    """Same org and key: one execution; another org or a finished flight runs again; errors are shared."""
+    flights = SingleFlight(wait_timeout=1)
+    calls = []
+
+    async def execute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value == "bad":
+            raise ValueError("Invalid cursor")
+        return value
+
+    async def run():
+        same = await asyncio.gather(*(flights.run("org1", "k", lambda: execute("a")) for _ in range(5)))
+        other = await asyncio.gather(flights.run("org1", "k", lambda: execute("b")), flights.run("org2", "k", lambda: execute("c")))
+        errors = await asyncio.gather(*(flights.run("org1", "e", lambda: execute("bad")) for _ in range(3)), return_exceptions=True)
+        return same, other, errors
+
+    same, other, errors = asyncio.run(run())
+    assert same == ["a"] * 5 and other == ["b", "c"]
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert calls == ["a", "b", "c", "bad"]
+    assert flights.stats()["coalesced"] == 6 and flights.stats()["in_flight"] == 0
+
+
+def test_followers_run_themselves_after_timeout_or_cancelled_leader() -> None:
+    """A slow leader only delays followers by wait_timeout; a cancelled leader does not cancel them."""
+    flights = SingleFlight(wait_timeout=0.02)
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        return "leader"
+
+    async def fast():
+        return "own"
+
+    async def run():
+        leader = asyncio.ensure_future(flights.run("org1", "k", slow))
+        await asyncio.sleep(0)
+        timed_out = await flights.run("org1", "k", fast)
+        follower = asyncio.ensure_future(flights.run("org1", "k", fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return timed_out, await follower
+
+    assert asyncio.run(run()) == ("own", "own")
+    assert flights.stats()["timeouts"] == 1
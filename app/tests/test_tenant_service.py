@@ -0,0 +1,83 @@
+"""
+Unit tests for TenantService (cached organizations registry).
+Ensures known tenants are served from the cache, unknown ids are negatively cached,
+uncached lookups are capped, and per-org rate limits and columns are applied from the records.
+"""
+import asyncio
+import pytest
+from app.core.rate_limit import rate_limiter
+from app.models.organization import Organization
+from app.services.column_config import column_config
+from app.services.tenant_service import TenantRegistryUnavailable, TenantService
+
+
+def test_known_tenants_cached_and_unknown_negatively_cached(monkeypatch) -> None:
+    """Only uncached ids are looked up, each at most once per negative TTL; malformed ids never."""
+    service = TenantService(enabled=True, ttl=3600, negative_ttl=60, negative_max_entries=2)
+    service._loaded(None)  # pretend the startup preload ran
+    service._store([Organization("tenant_known", "Known")])
+    fetched = []
+
+    async def fake_fetch(org_id):
+        fetched.append(org_id)
+        return ("tenant_new", "New", None, None, None) if org_id == "tenant_new" else None
+
+    monkeypatch.setattr(service, "_fetch_async", fake_fetch)
+
+    async def run():
+        return [await service.resolve(org_id) for org_id in
+                ("tenant_known", "tenant_made_up", "tenant_made_up", "bad id;", "tenant_new", "tenant_new")]
+
+    known, unknown, unknown_again, malformed, new, new_again = asyncio.run(run())
+    assert known.name == "Known" and new.name == "New" and new_again is new
+    assert unknown is None and unknown_again is None and malformed is None
+    assert fetched == ["tenant_made_up", "tenant_new"]
+    assert service.stats()["rejected"] == 3 and service.validate_org("tenant_new")
+
+
+def test_uncached_lookups_capped(monkeypatch) -> None:
+    """Made-up ids cost at most lookup_rate lookups, one at a time here; a zero rate never looks up."""
+    service = TenantService(enabled=True, ttl=3600, lookup_rate=3, lookup_concurrency=1)
+    service._loaded(None)
+    fetched = []
+
+    async def fake_fetch(org_id):
+        fetched.append(org_id)
+        await asyncio.sleep(0.01)
+        return None
+
+    monkeypatch.setattr(service, "_fetch_async", fake_fetch)
+
+    async def attempt(org_id):
+        try:
+            return await service.resolve(org_id)
+        except TenantRegistryUnavailable:
+            return "throttled"
+
+    async def run():
+        concurrent = await asyncio.gather(attempt("made_up_a"), attempt("made_up_b"))
+        sequential = [await attempt(f"made_up_{i}") for i in range(4)]
+        return concurrent, sequential
+
+    concurrent, sequential = asyncio.run(run())
+    assert concurrent == [None, "throttled"]
+    assert sequential == [None, None, "throttled", "throttled"]
+    assert fetched == ["made_up_a", "made_up_0", "made_up_1"] and service.stats()["throttled"] == 3
+    closed = TenantService(enabled=True, ttl=3600, lookup_rate=0)
+    closed._loaded(None)
+    monkeypatch.setattr(closed, "_fetch_async", pytest.fail)
+    assert asyncio.run(closed.resolve("made_up_c")) is None
+
+
+def test_registry_settings_applied_and_removed() -> None:
+    """A record's rate limit and columns override the defaults until it is gone."""
+    service = TenantService(enabled=True, ttl=3600)
+    service._store([Organization("tenant_custom", "Custom", rate_limit=7, columns={"default": ["id", "lastname"]})])
+    try:
+        assert rate_limiter.limit_for("tenant_custom") == 7
+        assert column_config.projection("tenant_custom").columns == ("id", "lastname")
+    finally:
+        service._store([], replace=True)
+    assert rate_limiter.limit_for("tenant_custom") == rate_limiter.limit
+    assert column_config.projection("tenant_custom").columns != ("id", "lastname")
+    assert service.get("tenant_custom") is None